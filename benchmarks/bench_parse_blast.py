@@ -0,0 +1,78 @@
+"""
+Benchmark: row-wise vs columnar parsing of BLAST/DIAMOND tabular output.
+
+Writes a synthetic "outfmt 6" file and times the previous line-by-line
+parser (``parse_blast_line`` per row) against the columnar
+:func:`src.run_blast.parse_blast_results`, both as a DataFrame and as the
+list-of-dicts consumed by the pipeline.
+
+Usage::
+
+    python benchmarks/bench_parse_blast.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.run_blast import parse_blast_line, parse_blast_results
+
+
+def write_synthetic_tsv(path, rows, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for i in range(rows):
+            length = rng.randint(20, 1200)
+            qstart = rng.randint(1, 50000)
+            f.write(f"contig{i % 5000}\tgene{rng.randint(0, 2000)}\t{rng.uniform(60, 100):.3f}\t{length}\t{qstart}\t{qstart + length - 1}\t1\t{length}\n")
+
+
+def parse_rowwise(path, identity, coverage):
+    results = []
+    with open(path) as f:
+        for line in f:
+            hit = parse_blast_line(line)
+            if hit is not None and hit["identity"] >= identity and hit["length"] >= coverage:
+                results.append(hit)
+    return results
+
+
+def _time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=500000, help="Synthetic hits to generate (default: 500000)")
+    parser.add_argument("--identity", type=float, default=90)
+    parser.add_argument("--coverage", type=int, default=80)
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions; best is reported (default: 3)")
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".tsv")
+    os.close(fd)
+    try:
+        write_synthetic_tsv(path, args.rows)
+        t_rows, rows = _time(lambda: parse_rowwise(path, args.identity, args.coverage), args.repeat)
+        t_frame, frame = _time(lambda: parse_blast_results(path, args.identity, args.coverage, as_frame=True), args.repeat)
+        t_dicts, dicts = _time(lambda: parse_blast_results(path, args.identity, args.coverage), args.repeat)
+        assert len(rows) == len(frame) == len(dicts)
+        print(f"{args.rows} rows, {len(rows)} pass filters")
+        print(f"row-wise parser      : {t_rows:8.3f} s")
+        print(f"columnar (DataFrame) : {t_frame:8.3f} s  ({t_rows / t_frame:5.1f}x)")
+        print(f"columnar (dicts)     : {t_dicts:8.3f} s  ({t_rows / t_dicts:5.1f}x)")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
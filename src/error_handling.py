@@ -13,6 +13,8 @@ CorruptedInputError
     Raised when a FASTA file cannot be parsed or appears corrupted.
 NoHitsFoundError
     Raised when no resistance gene hits are found for a sample.
+SearchFailedError
+    Raised when the similarity search itself fails.
 
 Functions
 ---------
@@ -32,6 +34,10 @@ class NoHitsFoundError(Exception):
     """Raised when no resistance genes are detected."""
     pass
 
+class SearchFailedError(Exception):
+    """Raised when a search tool fails, as opposed to finding nothing."""
+    pass
+
 def safe_fail(message, output_path="output/results.csv"):
     """
     Write a minimal error report and log the error.
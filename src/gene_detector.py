@@ -6,24 +6,95 @@ files, extract best hits per gene, and process directories of FASTA files
 in batch. The functions return normalized hit dictionaries compatible with
 the interpreter and reporting utilities.
 """
-from src.utils import validate_fasta
+from src.utils import validate_fasta, find_fasta_files, fasta_sample_id, open_fasta, estimate_fasta_size, available_cpus
 from src.run_blast import run_blast
 from src.error_handling import NoHitsFoundError, safe_fail
 import os
 import logging
+import functools
+import itertools
+import threading
+import time
 try:
     from src.rich_utils import get_progress
     _HAS_RICH = True
 except Exception:
     _HAS_RICH = False
 
-def detect_genes(input_fasta, db_fasta, identity=90, coverage=80, sample_id=None, output_dir="output", console=None, rich_enabled: bool = True, fail_silently: bool = False):
+# Query IDs in concatenated batch searches are prefixed with "s<index>__"
+_SAMPLE_TAG = "s{index}__"
+
+# Smallest chunk worth a separate search when one input is split across
+# threads (see detect_genes)
+DEFAULT_SHARD_BYTES = 64 * 1024 * 1024
+
+
+def select_best_hits(hits, keys=("gene",), as_frame: bool = False, chunk_size: int = 100000):
+    """
+    Keep the best hit for each gene (or each combination of ``keys``).
+
+    The reduction is vectorized: hits are sorted on the key columns and
+    then by descending ``identity``, ``length`` and ``bitscore`` (when
+    present), and the first row per key is kept. Remaining ties keep the
+    earlier hit. Iterators (e.g. streamed search output) are reduced in
+    chunks so memory is bounded by the number of distinct keys.
+
+    Parameters
+    ----------
+    hits : iterable of dict or pandas.DataFrame
+        Hit records (a list, a streamed iterator or a hit table).
+    keys : sequence of str, optional
+        Columns identifying a group (default: ``("gene",)``). Use
+        ``("sample_id", "gene")`` to reduce hits from several samples.
+    as_frame : bool, optional
+        Return a DataFrame instead of a list of dicts (default: False).
+    chunk_size : int, optional
+        Records consumed per reduction step for non-DataFrame input.
+
+    Returns
+    -------
+    list of dict or pandas.DataFrame
+        One hit per key, ordered by first appearance of the key.
+    """
+    import pandas as pd
+    keys = list(keys)
+    if isinstance(hits, pd.DataFrame):
+        best = _reduce_hit_frame(hits.reset_index(drop=True), keys)
+    else:
+        best = None
+        iterator = iter(hits)
+        while True:
+            chunk = list(itertools.islice(iterator, chunk_size))
+            if not chunk:
+                break
+            frame = pd.DataFrame.from_records(chunk)
+            # Previous winners go first so they keep priority on exact ties
+            best = _reduce_hit_frame(frame if best is None else pd.concat([best, frame], ignore_index=True), keys)
+        if best is None:
+            best = pd.DataFrame(columns=keys)
+    return best if as_frame else best.to_dict("records")
+
+def _reduce_hit_frame(df, keys):
+    # Sort by key, then score columns descending; keep the first row per key
+    if df.empty:
+        return df
+    score_cols = [col for col in ("identity", "length", "bitscore") if col in df.columns]
+    first_seen = df.groupby(keys, sort=False).ngroup().to_numpy()
+    ranked = df.assign(_group=first_seen, _row=range(len(df)))
+    ranked = ranked.sort_values(["_group"] + score_cols + ["_row"], ascending=[True] + [False] * len(score_cols) + [True], kind="mergesort")
+    best = ranked.drop_duplicates("_group", keep="first")
+    return best.drop(columns=["_group", "_row"]).reset_index(drop=True)
+
+def detect_genes(input_fasta, db_fasta, identity=90, coverage=80, sample_id=None, output_dir="output", console=None, rich_enabled: bool = True, fail_silently: bool = False, scratch_dir=None, stream: bool = False, tool=None, cache=None, raw_dir=None, coverage_mode: str = "bp", tool_threads=None, threads: int = 1, shard_bytes: int = DEFAULT_SHARD_BYTES, diamond_options=None):
     """
     Detect resistance genes in a single input FASTA.
 
     The function validates the input and database FASTA files, runs a
     similarity search (via :func:`run_blast`), selects the best hit per
-    detected gene, and annotates each hit with ``sample_id``.
+    detected gene, and annotates each hit with ``sample_id``. With
+    ``threads`` &gt; 1 an input larger than ``shard_bytes`` is split into
+    record-aligned chunks searched concurrently (see
+    :func:`search_sharded`).
 
     Parameters
     ----------
@@ -33,8 +104,9 @@ def detect_genes(input_fasta, db_fasta, identity=90, coverage=80, sample_id=None
         Path to the resistance gene database FASTA.
     identity : float, optional
         Minimum percent identity to accept a hit (default: 90).
-    coverage : int, optional
-        Minimum alignment length/coverage to accept a hit (default: 80).
+    coverage : float, optional
+        Minimum coverage to accept a hit, as alignment length or percent
+        of the reference per ``coverage_mode`` (default: 80).
     sample_id : str, optional
         Identifier to add to returned hit records. When omitted the
         basename of ``input_fasta`` is used.
@@ -48,6 +120,39 @@ def detect_genes(input_fasta, db_fasta, identity=90, coverage=80, sample_id=None
     fail_silently : bool, optional
         When True, write a minimal error report on error and return an
         empty list instead of raising.
+    scratch_dir : str, optional
+        Directory for the search tool's temporary output (see
+        :func:`src.run_blast.make_scratch_file`).
+    stream : bool, optional
+        When True, hits are read from the search tool's stdout as they are
+        produced and reduced on the fly instead of via a scratch file.
+    tool : str, optional
+        Search tool passed to :func:`run_blast` (auto-detected when ``None``).
+    cache : src.result_cache.ResultCache or str, optional
+        Result cache (or its directory) consulted before searching; the
+        best hits of a miss are stored in it once the search completes. A
+        failed search (:class:`~src.error_handling.SearchFailedError`) is
+        never cached.
+    raw_dir : str, optional
+        When given, the search runs without thresholds and every hit is
+        saved to ``<raw_dir>/<sample_id>.npz`` (see
+        :mod:`src.raw_hits`) before the thresholds are applied, so the
+        sample can be re-filtered later without searching again. With a
+        ``cache``, the unfiltered hits are what is cached.
+    coverage_mode : {"bp", "percent"}, optional
+        How ``coverage`` is interpreted (see :func:`run_blast`;
+        default: ``"bp"``).
+    tool_threads : int, optional
+        Threads the search tool may use (see :func:`run_blast`); divided
+        between the chunks of a split input.
+    threads : int, optional
+        Maximum number of chunks searched at once (default: 1, no
+        splitting).
+    shard_bytes : int, optional
+        Minimum estimated input size per chunk (default: 64 MiB).
+    diamond_options : dict, optional
+        DIAMOND tuning (see :func:`src.run_blast.resolve_diamond_options`);
+        the sensitivity is part of the cache key.
 
     Returns
     -------
@@ -72,39 +177,171 @@ def detect_genes(input_fasta, db_fasta, identity=90, coverage=80, sample_id=None
                 validate_fasta(db_fasta)
         except Exception as db_e:
             # If caller requested silent failure for DB issues, write safe-fail and return empty
-            out_name = f"{sample_id if sample_id else os.path.splitext(os.path.basename(input_fasta))[0]}_results.csv"
+            out_name = f"{sample_id if sample_id else fasta_sample_id(input_fasta)}_results.csv"
             out_path = os.path.join(output_dir, out_name)
             safe_fail(str(db_e), output_path=out_path)
             return []
 
-        hits = run_blast(input_fasta, db_fasta, identity, coverage, console=console, rich_enabled=rich_enabled)
-        if not hits:
+        cached = cache_key = None
+        if cache is not None:
+            from src.result_cache import ResultCache
+            from src.run_blast import resolve_search_tool
+            cache = ResultCache(cache) if isinstance(cache, str) else cache
+            resolved = tool or resolve_search_tool() or "mock"
+            # Raw mode caches the unfiltered hits, which do not depend on the thresholds
+            sensitivity = (diamond_options or {}).get("sensitivity") if resolved == "diamond" else None
+            cache_key = cache.key(input_fasta, db_fasta, resolved, identity, coverage, coverage_mode=coverage_mode, sensitivity=sensitivity) if raw_dir is None else cache.key(input_fasta, db_fasta, resolved, 0, 0, raw=True, sensitivity=sensitivity)
+            cached = cache.get(cache_key)
+        shards = min(int(threads or 1), estimate_fasta_size(input_fasta) // max(1, int(shard_bytes)))
+        search_options = dict(scratch_dir=scratch_dir, stream=stream, tool=tool, tool_threads=tool_threads, diamond_options=diamond_options)
+        if shards > 1:
+            search = functools.partial(search_sharded, input_fasta, db_fasta, shards=shards, **search_options)
+        else:
+            search = functools.partial(run_blast, input_fasta, db_fasta, console=console, rich_enabled=rich_enabled, **search_options)
+        if raw_dir is not None:
+            # Search unfiltered, keep every hit, then apply the thresholds
+            from src.raw_hits import save_raw_hits, filter_hits
+            from src.run_blast import HIT_COLUMNS, get_reference_lengths
+            name = sample_id if sample_id else os.path.basename(input_fasta)
+            hits = cached if cached is not None else search(0, 0)
+            raw = save_raw_hits(hits, os.path.join(raw_dir, f"{name}.npz"), name, source_file=os.path.relpath(input_fasta), ref_lengths=get_reference_lengths(db_fasta))
+            if cache_key is not None and cached is None:
+                cache.put(cache_key, raw[HIT_COLUMNS].to_dict("records"))
+            best_hits = select_best_hits(filter_hits(raw, identity, coverage, coverage_mode=coverage_mode)[HIT_COLUMNS])
+        elif cached is not None:
+            best_hits = cached
+        else:
+            hits = search(identity, coverage, coverage_mode=coverage_mode)
+            best_hits = select_best_hits(hits)
+            if cache_key is not None:
+                cache.put(cache_key, best_hits)
+        if not best_hits:
             raise NoHitsFoundError("No resistance genes detected.")
-        best_hits = {}
-        for hit in hits:
-            gene = hit["gene"]
-            if gene not in best_hits or hit["identity"] > best_hits[gene]["identity"]:
-                best_hits[gene] = hit
-        for hit in best_hits.values():
+        for hit in best_hits:
             hit["sample_id"] = sample_id if sample_id else os.path.basename(input_fasta)
         logging.info(f"Detected {len(best_hits)} resistance genes for sample {sample_id if sample_id else input_fasta}.")
-        return list(best_hits.values())
+        return best_hits
     except Exception as e:
         if fail_silently:
-            out_name = f"{sample_id if sample_id else os.path.splitext(os.path.basename(input_fasta))[0]}_results.csv"
+            out_name = f"{sample_id if sample_id else fasta_sample_id(input_fasta)}_results.csv"
             out_path = os.path.join(output_dir, out_name)
             safe_fail(str(e), output_path=out_path)
             return []
         else:
             raise
 
-def batch_detect_genes(input_folder, db_fasta, identity=90, coverage=80, threads: int = 1, output_dir: str = "output", write_per_sample: bool = True, console=None, rich_enabled: bool = True):
+def split_fasta(input_fasta, n_chunks, scratch_dir=None):
+    """
+    Split a FASTA file into record-aligned chunks of similar size.
+
+    The input (plain or compressed) is read once; a new chunk starts at
+    the first record header after the current chunk reaches its share of
+    the bytes, so no record is cut. Chunks are scratch files owned by the
+    caller.
+
+    Parameters
+    ----------
+    input_fasta : str
+        FASTA file to split.
+    n_chunks : int
+        Number of chunks wanted; fewer are produced when the input has
+        fewer records or a few records dominate its size.
+    scratch_dir : str, optional
+        Directory for the chunk files (see
+        :func:`src.run_blast.make_scratch_file`).
+
+    Returns
+    -------
+    list of str
+        Paths of the non-empty chunk files, in input order.
+    """
+    from src.run_blast import make_scratch_file
+    target = max(1, estimate_fasta_size(input_fasta) // max(1, int(n_chunks)))
+    chunks = []
+    out = None
+    written = 0
+    try:
+        with open_fasta(input_fasta, "rb") as fh:
+            for line in fh:
+                if line.startswith(b">") and (out is None or (written >= target and len(chunks) < n_chunks)):
+                    if out is not None:
+                        out.close()
+                    chunks.append(make_scratch_file(input_fasta, scratch_dir=scratch_dir, suffix=f".part{len(chunks)}.fasta"))
+                    out = open(chunks[-1], "wb")
+                    written = 0
+                if out is not None:
+                    out.write(line)
+                    written += len(line)
+    except Exception:
+        _remove_files(chunks)
+        raise
+    finally:
+        if out is not None:
+            out.close()
+    return chunks
+
+def search_sharded(input_fasta, db_fasta, identity=90, coverage=80, shards=2, scratch_dir=None, tool_threads=None, **kwargs):
+    """
+    Search one large query FASTA as parallel record-aligned chunks.
+
+    The input is split with :func:`split_fasta`, each chunk is searched by
+    :func:`run_blast` in its own thread, and the hits are concatenated for
+    the usual best-hit selection. Records are never cut, so every hit is
+    identical to one from an unsplit search.
+
+    Parameters
+    ----------
+    input_fasta : str
+        Query FASTA path.
+    db_fasta : str
+        Path to the resistance gene database FASTA.
+    identity : float, optional
+        Minimum percent identity to accept a hit (default: 90).
+    coverage : float, optional
+        Minimum coverage to accept a hit (default: 80).
+    shards : int, optional
+        Number of chunks searched concurrently (default: 2).
+    scratch_dir : str, optional
+        Directory for the chunk files and search output.
+    tool_threads : int, optional
+        Search-tool threads shared between the chunks.
+    **kwargs
+        Further :func:`run_blast` options (``tool``, ``stream``,
+        ``coverage_mode``, ``diamond_options``).
+
+    Returns
+    -------
+    list of dict
+        Hits from all chunks.
+    """
+    import concurrent.futures
+    chunks = split_fasta(input_fasta, shards, scratch_dir=scratch_dir)
+    per_chunk = max(1, tool_threads // len(chunks)) if tool_threads and chunks else None
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(chunks))) as ex:
+            parts = list(ex.map(lambda chunk: list(run_blast(chunk, db_fasta, identity, coverage, scratch_dir=scratch_dir, tool_threads=per_chunk, **kwargs)), chunks))
+    finally:
+        _remove_files(chunks)
+    logging.info(f"Searched {input_fasta} as {len(chunks)} chunks")
+    return [hit for part in parts for hit in part]
+
+def _remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def batch_detect_genes(input_folder, db_fasta, identity=90, coverage=80, threads: int = 1, output_dir: str = "output", write_per_sample: bool = True, console=None, rich_enabled: bool = True, scratch_dir=None, stream: bool = False, tool=None, concat: bool = False, concat_batch: int = 256, executor: str = "thread", chunksize: int = 1, on_result=None, keep_hits: bool = True, skip=None, cache=None, raw_dir=None, coverage_mode: str = "bp", timings=None, cpus=None, tool_threads=None, diamond_options=None):
     """
     Process all FASTA files under ``input_folder`` and return hits per sample.
 
-    The function walks the directory tree, validates FASTA files, and
-    dispatches processing either sequentially or using a thread pool when
-    ``threads`` &gt; 1. Returned structure is a mapping ``{sample_id: hits}``.
+    The function walks the directory tree for FASTA files (``.fasta``,
+    ``.fa``, ``.fna``, ``.fas``, optionally gzip/bgzip/zstd-compressed; see
+    :func:`src.utils.find_fasta_files`), validates them, and dispatches
+    processing largest file first, either sequentially or using a thread
+    or process pool when ``threads`` &gt; 1. Returned structure is a mapping
+    ``{sample_id: hits}``.
 
     Parameters
     ----------
@@ -117,7 +354,8 @@ def batch_detect_genes(input_folder, db_fasta, identity=90, coverage=80, threads
     coverage : int, optional
         Minimum alignment coverage (default: 80).
     threads : int, optional
-        Number of worker threads for concurrent processing (default: 1).
+        Number of concurrent workers (threads or processes, see
+        ``executor``) (default: 1).
     output_dir : str, optional
         Directory to write per-sample outputs and logs (default: ``output``).
     write_per_sample : bool, optional
@@ -126,59 +364,402 @@ def batch_detect_genes(input_folder, db_fasta, identity=90, coverage=80, threads
         Console-like object for progress/status messages.
     rich_enabled : bool, optional
         Whether to use Rich-based progress when available.
+    scratch_dir : str, optional
+        Directory for per-search temporary output. Every search gets its
+        own file, so worker threads never share scratch output.
+    stream : bool, optional
+        Stream search output through a pipe (see :func:`detect_genes`).
+    tool : str, optional
+        Search tool passed to :func:`run_blast` (auto-detected when ``None``).
+    concat : bool, optional
+        When True, search groups of samples with one tool invocation each
+        (see :func:`search_concatenated`). Ignored for the mock search.
+    concat_batch : int, optional
+        Maximum number of samples per concatenated search (default: 256).
+    executor : str, optional
+        Pool backend when ``threads`` &gt; 1: ``'thread'`` (default) or
+        ``'process'``. Processes parallelize the in-Python work that the
+        GIL serializes under threads.
+    chunksize : int, optional
+        Number of work items sent to a worker process at a time
+        (process backend only, default: 1).
+    on_result : callable, optional
+        ``on_result(sample_id, hits, error)`` is called in the calling
+        thread as soon as each sample completes, e.g. to flush its rows to
+        disk. ``error`` is ``None`` when the search completed (with or
+        without hits) and a message when the sample could not be searched
+        (invalid input or database, failed search tool).
+    keep_hits : bool, optional
+        When False, hits are handed to ``on_result`` only and the returned
+        mapping holds empty lists, keeping memory flat (default: True).
+    skip : callable, optional
+        ``skip(fasta_path)`` returning True leaves that file out of the
+        run, e.g. because a previous run already completed it.
+    cache : src.result_cache.ResultCache or str, optional
+        Result cache passed to :func:`detect_genes` for each sample. Not
+        consulted by concatenated searches. With the process executor
+        each worker tracks only its own writes, so the cache is trimmed
+        once more after the batch.
+    raw_dir : str, optional
+        Directory receiving each sample's unfiltered hits (see
+        :func:`detect_genes`); disables ``concat``.
+    coverage_mode : {"bp", "percent"}, optional
+        How ``coverage`` is interpreted (default: ``"bp"``).
+    timings : dict, optional
+        Filled with ``{sample_id: {"seconds", "tool_threads",
+        "input_bytes"}}`` for every processed sample. Samples searched
+        together (``concat``) share their group's wall time.
+    cpus : int, optional
+        CPUs available to DIAMOND/BLAST+ searches in total (default: all
+        CPUs this process may use, see :func:`src.utils.available_cpus`).
+    tool_threads : int, optional
+        Fixed search-tool threads per search; disables the adaptive
+        budget.
+    diamond_options : dict, optional
+        DIAMOND tuning passed to every search (see
+        :func:`src.run_blast.resolve_diamond_options`).
 
     Returns
     -------
     dict
         Mapping of sample identifier to list of hit dictionaries.
+
+    Notes
+    -----
+    With DIAMOND/BLAST+ and the thread backend, ``cpus`` are shared
+    between the ``threads`` concurrent searches through a
+    :class:`CpuBudget`: each search gets at least an even share and more
+    in proportion to its part of the outstanding input, so a dominant
+    sample runs with more tool threads from the start and the last
+    searches absorb capacity freed by finished workers. Worker processes
+    cannot share a budget and get ``cpus // threads`` each. Wall times
+    are logged per sample.
     """
-    import os
-    import glob
-    from src.utils import validate_fasta
     results = {}
-    # Recursively find all .fasta files
-    fasta_files = [y for x in os.walk(input_folder) for y in glob.glob(os.path.join(x[0], '*.fasta'))]
+    # Recursively find all FASTA files (plain or compressed), largest first
+    fasta_files = find_fasta_files(input_folder)
+    if skip is not None:
+        fasta_files = [f for f in fasta_files if not skip(f)]
 
-    def _process(fasta):
-        sample_id = os.path.splitext(os.path.basename(fasta))[0]
-        try:
-            validate_fasta(fasta)
-            hits = detect_genes(fasta, db_fasta, identity, coverage, sample_id=sample_id, output_dir=output_dir, console=None, rich_enabled=rich_enabled, fail_silently=True)
-            for hit in hits:
-                hit['source_file'] = os.path.relpath(fasta)
-            return sample_id, hits
-        except Exception as e:
-            import logging
-            logging.warning(f"Skipping file {fasta}: {e}")
-            return sample_id, []
+    if executor not in ("thread", "process"):
+        raise ValueError(f"Unknown executor backend: {executor!r} (expected 'thread' or 'process')")
+    from src.run_blast import resolve_search_tool
+    if executor == "process" and threads and threads > 1:
+        # Resolve the tool and build the database once in the parent so
+        # worker processes neither rescan PATH nor race makedb
+        from src.run_blast import prepare_database
+        tool = tool or resolve_search_tool()
+        if tool in ("diamond", "blastn", "blastp"):
+            try:
+                prepare_database(db_fasta, tool)
+            except Exception as e:
+                logging.warning(f"Database preparation failed: {e}")
+
+    options = dict(output_dir=output_dir, scratch_dir=scratch_dir, stream=stream, tool=tool, coverage_mode=coverage_mode, diamond_options=diamond_options)
+    _process = functools.partial(_process_sample, db_fasta=db_fasta, identity=identity, coverage=coverage, rich_enabled=rich_enabled, cache=cache, raw_dir=raw_dir, **options)
+    _process_group = functools.partial(search_concatenated, db_fasta=db_fasta, identity=identity, coverage=coverage, **options)
+
+    if concat and raw_dir is not None:
+        logging.info("Raw hits are kept per sample; processing samples individually.")
+        concat = False
+    if concat:
+        if (tool or resolve_search_tool()) in ("diamond", "blastn", "blastp", "kmer"):
+            batch = max(1, int(concat_batch))
+            work = [fasta_files[i:i + batch] for i in range(0, len(fasta_files), batch)]
+            worker = _process_group
+        else:
+            # The mock search ignores the query, so hits cannot be demultiplexed
+            logging.info("Concatenated search needs a real search tool; processing samples individually.")
+            concat = False
+    if not concat:
+        work = fasta_files
+        worker = _process
+
+    sizes = {f: estimate_fasta_size(f) for f in fasta_files}
+    budget = None
+    workers = max(1, int(threads or 1))
+    if not tool_threads and (tool or resolve_search_tool()) in ("diamond", "blastn", "blastp"):
+        cpus = max(1, int(cpus or available_cpus()))
+        if executor == "thread" or workers == 1:
+            budget = CpuBudget(cpus, sum(sizes.values()), workers=workers)
+        else:
+            tool_threads = max(1, cpus // workers)
+    worker = functools.partial(_run_timed, worker, budget=budget, sizes=sizes, tool_threads=tool_threads)
+    input_files = {fasta_sample_id(f): f for f in fasta_files}
+
+    def _collect(outcome):
+        # Runs in the calling thread as each work item completes
+        pairs, seconds, tool_threads = outcome
+        for sample_id, hits, error in pairs:
+            if on_result is not None:
+                on_result(sample_id, hits, error)
+            results[sample_id] = hits if keep_hits else []
+            if timings is not None:
+                timings[sample_id] = {"seconds": round(seconds, 3), "tool_threads": tool_threads, "input_bytes": sizes.get(input_files.get(sample_id), 0)}
+        return pairs
 
     # If rich progress is available and console provided, show progress
     progress_ctor = get_progress(rich_enabled=rich_enabled) if _HAS_RICH else None
-    if threads and threads > 1:
+    if threads and threads > 1 and executor == "process":
+        import concurrent.futures
+        # Processes sidestep the GIL for in-Python work (validation, k-mer
+        # search, parsing); map() batches items per worker via chunksize
+        with concurrent.futures.ProcessPoolExecutor(max_workers=threads) as ex:
+            completed = ex.map(worker, work, chunksize=max(1, int(chunksize)))
+            if progress_ctor and console is not None:
+                with progress_ctor as progress:
+                    task = progress.add_task("Processing FASTA files...", total=len(fasta_files))
+                    for outcome in completed:
+                        progress.advance(task, len(_collect(outcome)))
+            else:
+                for outcome in completed:
+                    _collect(outcome)
+        if cache is not None and not concat:
+            from src.result_cache import ResultCache
+            (ResultCache(cache) if isinstance(cache, str) else cache).evict()
+    elif threads and threads > 1:
         import concurrent.futures
         with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as ex:
-            future_to_fasta = {ex.submit(_process, f): f for f in fasta_files}
+            future_to_item = {ex.submit(worker, item): item for item in work}
             if progress_ctor and console is not None:
                 with progress_ctor as progress:
-                    task = progress.add_task("Processing FASTA files...", total=len(future_to_fasta))
-                    for fut in concurrent.futures.as_completed(future_to_fasta):
-                        sample_id, hits = fut.result()
-                        results[sample_id] = hits
-                        progress.advance(task)
+                    task = progress.add_task("Processing FASTA files...", total=len(fasta_files))
+                    for fut in concurrent.futures.as_completed(future_to_item):
+                        progress.advance(task, len(_collect(fut.result())))
             else:
-                for fut in concurrent.futures.as_completed(future_to_fasta):
-                    sample_id, hits = fut.result()
-                    results[sample_id] = hits
+                for fut in concurrent.futures.as_completed(future_to_item):
+                    _collect(fut.result())
     else:
         if progress_ctor and console is not None:
             with progress_ctor as progress:
-                for fasta in progress.track(fasta_files, description="Processing FASTA files..."):
-                    sample_id, hits = _process(fasta)
-                    results[sample_id] = hits
+                for item in progress.track(work, description="Processing FASTA files..."):
+                    _collect(worker(item))
         else:
-            for fasta in fasta_files:
-                sample_id, hits = _process(fasta)
-                results[sample_id] = hits
+            for item in work:
+                _collect(worker(item))
 
     # Return results dict; caller may write per-sample CSVs
     return results
+
+class CpuBudget:
+    """
+    Share a fixed number of CPUs between concurrent searches.
+
+    A search asks for CPUs in proportion to its share of the work that has
+    not finished yet and receives what is free at that moment, at least
+    one (waiting while none is free). While many samples are queued each
+    search runs single-threaded; a sample that dominates the remaining
+    input, or one of the last searches of a batch, gets the idle capacity
+    as tool threads.
+
+    Parameters
+    ----------
+    cpus : int
+        Total CPUs available to searches.
+    total_work : float
+        Sum of the work estimates (e.g. input bytes) of all searches.
+    workers : int, optional
+        Maximum number of concurrent searches; each is offered at least
+        ``cpus // workers`` CPUs (default: ``cpus``, i.e. one each).
+    """
+
+    def __init__(self, cpus, total_work, workers=None):
+        self.cpus = max(1, int(cpus))
+        self.even_share = max(1, self.cpus // max(1, int(workers or self.cpus)))
+        self._free = self.cpus
+        self._outstanding = float(total_work)
+        self._cond = threading.Condition()
+
+    def acquire(self, work):
+        """
+        Reserve CPUs for a search.
+
+        Parameters
+        ----------
+        work : float
+            Work estimate of the search.
+
+        Returns
+        -------
+        int
+            Number of CPUs reserved; pass it back to :meth:`release`.
+        """
+        with self._cond:
+            while self._free < 1:
+                self._cond.wait()
+            share = self.cpus * work / self._outstanding if self._outstanding > 0 else self.cpus
+            n = max(1, min(self._free, max(self.even_share, int(round(share)))))
+            self._free -= n
+            return n
+
+    def release(self, cpus, work):
+        """
+        Return CPUs reserved by :meth:`acquire` once a search finishes.
+
+        Parameters
+        ----------
+        cpus : int
+            CPUs reserved for the search.
+        work : float
+            The search's work estimate, now complete.
+
+        Returns
+        -------
+        None
+        """
+        with self._cond:
+            self._free += cpus
+            self._outstanding -= work
+            self._cond.notify_all()
+
+def _run_timed(worker, item, budget=None, sizes=None, tool_threads=None):
+    # Run one batch work item, reserving tool threads from the budget
+    files = item if isinstance(item, list) else [item]
+    work = sum((sizes or {}).get(f, 0) for f in files)
+    if budget is not None:
+        tool_threads = budget.acquire(work)
+    start = time.perf_counter()
+    try:
+        pairs = worker(item, tool_threads=tool_threads)
+    finally:
+        if budget is not None:
+            budget.release(tool_threads, work)
+    seconds = time.perf_counter() - start
+    threads_note = f" with {tool_threads} search threads" if tool_threads else ""
+    logging.info(f"Processed {', '.join(pair[0] for pair in pairs)} in {seconds:.2f} s{threads_note}")
+    return pairs, seconds, tool_threads
+
+def _process_sample(fasta, db_fasta, identity, coverage, output_dir, rich_enabled, scratch_dir, stream, tool, cache=None, raw_dir=None, coverage_mode="bp", tool_threads=None, diamond_options=None):
+    # Batch worker for one file; module-level so process pools can pickle it.
+    # Returns [(sample_id, hits, error)] where error is None unless the
+    # sample could not be searched ("no hits" is a completed search)
+    sample_id = fasta_sample_id(fasta)
+    try:
+        validate_fasta(fasta)
+    except Exception as e:
+        logging.warning(f"Skipping file {fasta}: {e}")
+        return [(sample_id, [], str(e))]
+    out_path = os.path.join(output_dir, f"{sample_id}_results.csv")
+    try:
+        # Checked here so detect_genes cannot turn a bad database into "no hits"
+        validate_fasta(db_fasta)
+        hits = detect_genes(fasta, db_fasta, identity, coverage, sample_id=sample_id, output_dir=output_dir, console=None, rich_enabled=rich_enabled, fail_silently=False, scratch_dir=scratch_dir, stream=stream, tool=tool, cache=cache, raw_dir=raw_dir, coverage_mode=coverage_mode, tool_threads=tool_threads, diamond_options=diamond_options)
+    except NoHitsFoundError as e:
+        safe_fail(str(e), output_path=out_path)
+        return [(sample_id, [], None)]
+    except Exception as e:
+        safe_fail(str(e), output_path=out_path)
+        return [(sample_id, [], str(e))]
+    for hit in hits:
+        hit['source_file'] = os.path.relpath(fasta)
+    return [(sample_id, hits, None)]
+
+def search_concatenated(fasta_files, db_fasta, identity=90, coverage=80, output_dir="output", scratch_dir=None, stream: bool = False, tool=None, coverage_mode: str = "bp", tool_threads=None, diamond_options=None):
+    """
+    Search several samples with a single search-tool invocation.
+
+    Valid input files are concatenated into one scratch query FASTA whose
+    sequence IDs are tagged with the sample's position, the search runs
+    once, and hits are demultiplexed back to their samples before the
+    per-sample best-hit selection. This pays the tool start-up and
+    database load cost once per group instead of once per file.
+
+    Parameters
+    ----------
+    fasta_files : list of str
+        Input FASTA paths; each file is one sample.
+    db_fasta : str
+        Path to the resistance gene database FASTA.
+    identity : float, optional
+        Minimum percent identity to accept a hit (default: 90).
+    coverage : int, optional
+        Minimum alignment length/coverage to accept a hit (default: 80).
+    output_dir : str, optional
+        Directory for safe-fail reports of samples that fail (default: ``output``).
+    scratch_dir : str, optional
+        Directory for the concatenated query and search output.
+    stream : bool, optional
+        Stream search output through a pipe (see :func:`detect_genes`).
+    tool : str, optional
+        Search tool passed to :func:`run_blast` (auto-detected when ``None``).
+    coverage_mode : {"bp", "percent"}, optional
+        How ``coverage`` is interpreted (default: ``"bp"``).
+    tool_threads : int, optional
+        Threads the search tool may use (see :func:`run_blast`).
+    diamond_options : dict, optional
+        DIAMOND tuning (see :func:`src.run_blast.resolve_diamond_options`).
+
+    Returns
+    -------
+    list of tuple
+        ``(sample_id, hits, error)`` tuples, one per input file; ``error``
+        is ``None`` unless the sample could not be searched.
+    """
+    from src.run_blast import make_scratch_file
+    samples = [fasta_sample_id(f) for f in fasta_files]
+    per_sample = {sample_id: [] for sample_id in samples}
+    errors = {}
+
+    def _fail_all(message, indices, failed=True):
+        for i in indices:
+            safe_fail(message, output_path=os.path.join(output_dir, f"{samples[i]}_results.csv"))
+            if failed:
+                errors[samples[i]] = message
+
+    def _outcome():
+        return [(sample_id, per_sample[sample_id], errors.get(sample_id)) for sample_id in samples]
+
+    try:
+        validate_fasta(db_fasta)
+    except Exception as db_e:
+        _fail_all(str(db_e), range(len(samples)))
+        return _outcome()
+
+    valid = []
+    for i, fasta in enumerate(fasta_files):
+        try:
+            validate_fasta(fasta)
+            valid.append(i)
+        except Exception as e:
+            logging.warning(f"Skipping file {fasta}: {e}")
+            errors[samples[i]] = str(e)
+    if not valid:
+        return _outcome()
+
+    query = make_scratch_file("batch", scratch_dir=scratch_dir, suffix=".fasta")
+    try:
+        with open(query, "w") as out:
+            for i in valid:
+                tag = _SAMPLE_TAG.format(index=i)
+                with open_fasta(fasta_files[i]) as fh:
+                    for line in fh:
+                        out.write(">" + tag + line[1:] if line.startswith(">") else line)
+                out.write("\n")
+        grouped = {i: [] for i in valid}
+        for hit in run_blast(query, db_fasta, identity, coverage, scratch_dir=scratch_dir, stream=stream, tool=tool, coverage_mode=coverage_mode, tool_threads=tool_threads, diamond_options=diamond_options):
+            tag, sep, original = hit["query"].partition("__")
+            if not sep or not tag[1:].isdigit() or int(tag[1:]) not in grouped:
+                continue
+            hit["query"] = original
+            grouped[int(tag[1:])].append(hit)
+    except Exception as e:
+        _fail_all(str(e), valid)
+        return _outcome()
+    finally:
+        try:
+            os.remove(query)
+        except OSError:
+            pass
+
+    # One cross-sample reduction keyed on (sample, gene) instead of one per sample
+    best_hits = select_best_hits((dict(hit, _sample=i) for i, hits in grouped.items() for hit in hits), keys=("_sample", "gene"))
+    for hit in best_hits:
+        i = hit.pop("_sample")
+        hit["sample_id"] = samples[i]
+        hit["source_file"] = os.path.relpath(fasta_files[i])
+        per_sample[samples[i]].append(hit)
+    for i in valid:
+        if not per_sample[samples[i]]:
+            _fail_all("No resistance genes detected.", [i], failed=False)
+        logging.info(f"Detected {len(per_sample[samples[i]])} resistance genes for sample {samples[i]}.")
+    return _outcome()
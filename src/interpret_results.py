@@ -8,7 +8,7 @@ and prints a human-friendly summary table (optionally using Rich).
 
 import os
 import logging
-import pandas as pd
+import threading
 from src.utils import read_gene_class_map, format_table
 try:
     from rich.table import Table
@@ -17,6 +17,16 @@ try:
 except Exception:
     _HAS_RICH = False
 
+# Column order of every results CSV
+REPORT_COLUMNS = ["sample_id", "gene", "identity", "coverage", "antibiotic_class", "source_file"]
+# Combined report formats accepted by write_report and StreamingReportWriter
+REPORT_FORMATS = ("csv", "parquet", "both")
+PARQUET_COMPRESSION = "zstd"
+# Rows printed by write_report before it switches to a summarized view
+DEFAULT_CONSOLE_ROWS = 50
+# Arrow types of the numeric report columns; all other columns are text
+_NUMERIC_COLUMNS = {"identity": "float64", "coverage": "int64"}
+
 def interpret_hits(hits, map_path):
     """
     Map gene hit records to antibiotic classes using a CSV mapping.
@@ -27,7 +37,8 @@ def interpret_hits(hits, map_path):
         Hit dictionaries produced by the detection stage (must include
         at least keys ``gene`` and optionally ``sample_id`` and ``length``).
     map_path : str
-        Path to a CSV file containing columns ``gene`` and ``class``.
+        Path to a CSV file containing columns ``gene`` and ``class``. The
+        parsed map is memoized by :func:`src.utils.read_gene_class_map`.
 
     Returns
     -------
@@ -39,25 +50,338 @@ def interpret_hits(hits, map_path):
     results = []
     for hit in hits:
         gene = hit["gene"]
+        antibiotic_class = gene_class.get(gene, "Unknown")
         results.append({
             "sample_id": hit.get("sample_id", "sample"),
             "gene": gene,
             "identity": hit["identity"],
             "coverage": hit["length"],
-            "antibiotic_class": gene_class.get(gene, "Unknown"),
-            "class": gene_class.get(gene, "Unknown"),
+            "antibiotic_class": antibiotic_class,
+            "class": antibiotic_class,
             "source_file": hit.get("source_file", "")
         })
     return results
 
-def write_report(results, output_path="output/results.csv", save: bool = True, console=None, rich_enabled: bool = True):
+def interpret_batch(hits, map_path):
+    """
+    Annotate the hits of many samples as a single table.
+
+    The class map is joined once against the whole hit table with a
+    vectorized lookup, instead of one :func:`interpret_hits` call per
+    sample. The output frame feeds both the per-sample reports
+    (:func:`write_sample_reports`) and the combined report.
+
+    Parameters
+    ----------
+    hits : pandas.DataFrame or iterable of dict
+        Hit records from all samples, with at least ``gene``,
+        ``identity`` and ``length`` and optionally ``sample_id`` and
+        ``source_file``.
+    map_path : str
+        Path to a CSV file containing columns ``gene`` and ``class``.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Columns :data:`REPORT_COLUMNS` plus ``class`` (an alias of
+        ``antibiotic_class``), one row per input hit.
+    """
+    import pandas as pd
+    gene_class = read_gene_class_map(map_path)
+    df = hits if isinstance(hits, pd.DataFrame) else pd.DataFrame.from_records(list(hits))
+    n = len(df)
+
+    def _column(name, default):
+        return df[name].fillna(default) if name in df.columns else pd.Series([default] * n, index=df.index, dtype=object)
+
+    genes = _column("gene", "")
+    classes = genes.map(gene_class).fillna("Unknown")
+    return pd.DataFrame({
+        "sample_id": _column("sample_id", "sample"),
+        "gene": genes,
+        "identity": _column("identity", float("nan")),
+        "coverage": _column("length", 0),
+        "antibiotic_class": classes,
+        "class": classes,
+        "source_file": _column("source_file", ""),
+    }).reset_index(drop=True)
+
+def write_sample_reports(results, output_dir, sample_ids=None):
+    """
+    Write one ``<sample_id>_results.csv`` per sample from a combined table.
+
+    Parameters
+    ----------
+    results : pandas.DataFrame
+        Interpreted results for all samples (see :func:`interpret_batch`).
+    output_dir : str
+        Directory receiving the per-sample CSV files.
+    sample_ids : iterable of str, optional
+        Samples to write. Samples without rows get a header-only CSV. By
+        default every ``sample_id`` present in ``results`` is written.
+
+    Returns
+    -------
+    None
+    """
+    import pandas as pd
+    groups = dict(tuple(results.groupby("sample_id", sort=False))) if not results.empty else {}
+    empty = pd.DataFrame(columns=REPORT_COLUMNS)
+    os.makedirs(output_dir, exist_ok=True)
+    for sample_id in (sample_ids if sample_ids is not None else groups.keys()):
+        frame = groups.get(sample_id, empty)
+        frame.to_csv(os.path.join(output_dir, f"{sample_id}_results.csv"), index=False, columns=REPORT_COLUMNS)
+    logging.info("Per-sample results written to %s", output_dir)
+
+class StreamingReportWriter:
+    """
+    Append interpreted rows to the combined report as samples complete.
+
+    Rows are written to ``<path>.partial`` files, with the CSV header
+    emitted exactly once when the writer is opened, and each sample is
+    flushed (one Parquet row group per sample) so a crash leaves all
+    completed samples on disk. Calling :meth:`finalize` atomically renames
+    the partial files into place. Used as a context manager, the files are
+    finalized on success and left as ``.partial`` if an exception escapes.
+
+    Parameters
+    ----------
+    output_path : str
+        Final path of the combined CSV.
+    columns : list of str, optional
+        Column order (default: :data:`REPORT_COLUMNS`).
+    fmt : {"csv", "parquet", "both"}, optional
+        Output format (default: ``"csv"``); see :func:`report_paths`.
+    """
+
+    def __init__(self, output_path, columns=None, fmt="csv"):
+        import pandas as pd
+        self.output_path = output_path
+        self.paths = report_paths(output_path, fmt)
+        self.partial_path = self.paths.get("csv", self.paths.get("parquet")) + ".partial"
+        self.columns = list(columns or REPORT_COLUMNS)
+        self.rows = 0
+        self.sample_rows = {}
+        self._lock = threading.Lock()
+        self._fh = None
+        self._parquet = None
+        outdir = os.path.dirname(output_path)
+        if outdir:
+            os.makedirs(outdir, exist_ok=True)
+        if "csv" in self.paths:
+            self._fh = open(self.paths["csv"] + ".partial", "w", newline="")
+            pd.DataFrame(columns=self.columns).to_csv(self._fh, index=False)
+            self._fh.flush()
+        if "parquet" in self.paths:
+            pq = _require_pyarrow()
+            self._schema = _parquet_schema(self.columns)
+            self._parquet = pq.ParquetWriter(self.paths["parquet"] + ".partial", self._schema, compression=PARQUET_COMPRESSION)
+
+    def write(self, results, sample_id=None):
+        """
+        Append rows and flush them to disk.
+
+        Parameters
+        ----------
+        results : pandas.DataFrame or list of dict
+            Interpreted rows (typically one sample's).
+        sample_id : str, optional
+            Sample the rows belong to; recorded with a zero count when
+            ``results`` is empty.
+
+        Returns
+        -------
+        None
+        """
+        import pandas as pd
+        df = results if isinstance(results, pd.DataFrame) else pd.DataFrame(results, columns=self.columns)
+        with self._lock:
+            if not df.empty:
+                if self._fh is not None:
+                    df.to_csv(self._fh, header=False, index=False, columns=self.columns)
+                    self._fh.flush()
+                if self._parquet is not None:
+                    self._parquet.write_table(_to_arrow(df, self.columns, self._schema))
+                for sid, count in df["sample_id"].value_counts(sort=False).items():
+                    self.sample_rows[sid] = self.sample_rows.get(sid, 0) + int(count)
+            elif sample_id is not None:
+                self.sample_rows.setdefault(sample_id, 0)
+            self.rows += len(df)
+
+    def finalize(self):
+        """
+        Close the partial files and atomically move them into place.
+
+        Returns
+        -------
+        str
+            The final output path (the CSV path unless only Parquet was
+            requested).
+        """
+        self.close()
+        with self._lock:
+            for path in self.paths.values():
+                os.replace(path + ".partial", path)
+                logging.info("Results written to %s", path)
+        return self.paths.get("csv", self.paths.get("parquet"))
+
+    def close(self):
+        """
+        Close the partial files without finalizing them.
+
+        Returns
+        -------
+        None
+        """
+        with self._lock:
+            if self._fh is not None and not self._fh.closed:
+                self._fh.close()
+            if self._parquet is not None:
+                self._parquet.close()
+                self._parquet = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.finalize()
+        else:
+            self.close()
+        return False
+
+def report_paths(output_path, fmt="csv"):
+    """
+    Map an output format to the combined report file(s) it produces.
+
+    Parameters
+    ----------
+    output_path : str
+        Combined report path as given on the command line (normally
+        ending in ``.csv``).
+    fmt : {"csv", "parquet", "both"}, optional
+        Output format (default: ``"csv"``). Parquet output is written next
+        to the CSV path with a ``.parquet`` extension.
+
+    Returns
+    -------
+    dict
+        ``{"csv": path}`` and/or ``{"parquet": path}``.
+    """
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"Unknown report format {fmt!r}; expected one of {', '.join(REPORT_FORMATS)}")
+    paths = {}
+    if fmt in ("csv", "both"):
+        paths["csv"] = output_path
+    if fmt in ("parquet", "both"):
+        paths["parquet"] = os.path.splitext(output_path)[0] + ".parquet"
+    return paths
+
+def parquet_available():
+    """
+    Return whether Parquet output is supported (``pyarrow`` is installed).
+
+    Returns
+    -------
+    bool
+        ``True`` if ``pyarrow`` can be imported.
+    """
+    try:
+        _require_pyarrow()
+    except ImportError:
+        return False
+    return True
+
+def _require_pyarrow():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet output requires pyarrow; install it with 'pip install pyarrow' or use --format csv") from e
+    return pq
+
+def _parquet_schema(columns):
+    # Text columns are dictionary-encoded: sample ids, genes and classes repeat heavily
+    import pyarrow as pa
+    text = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([(col, pa.type_for_alias(_NUMERIC_COLUMNS[col]) if col in _NUMERIC_COLUMNS else text) for col in columns])
+
+def _to_arrow(df, columns, schema):
+    import pandas as pd
+    import pyarrow as pa
+    data = {}
+    for col in columns:
+        if col == "identity":
+            data[col] = pd.to_numeric(df[col], errors="coerce") if col in df.columns else float("nan")
+        elif col in _NUMERIC_COLUMNS:
+            data[col] = pd.to_numeric(df[col], errors="coerce").fillna(0) if col in df.columns else 0
+        else:
+            data[col] = df[col].fillna("").astype(str) if col in df.columns else ""
+    frame = pd.DataFrame(data, index=df.index)
+    return pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+
+def write_parquet(results, output_path, columns=None):
+    """
+    Write interpreted results as a compressed, dictionary-encoded Parquet file.
+
+    Parameters
+    ----------
+    results : pandas.DataFrame or list of dict
+        Interpreted results (see :func:`interpret_batch`).
+    output_path : str
+        Destination ``.parquet`` path.
+    columns : list of str, optional
+        Column order (default: :data:`REPORT_COLUMNS`).
+
+    Returns
+    -------
+    None
+    """
+    import pandas as pd
+    pq = _require_pyarrow()
+    columns = list(columns or REPORT_COLUMNS)
+    df = results if isinstance(results, pd.DataFrame) else pd.DataFrame(results, columns=columns)
+    outdir = os.path.dirname(output_path)
+    if outdir:
+        os.makedirs(outdir, exist_ok=True)
+    schema = _parquet_schema(columns)
+    pq.write_table(_to_arrow(df, columns, schema), output_path, compression=PARQUET_COMPRESSION)
+    logging.info("Results written to %s", output_path)
+
+def read_report(output_path, fmt="csv"):
+    """
+    Load a combined report written by :func:`write_report`.
+
+    The Parquet file is preferred when the format produced one, so typed
+    columns are read back without re-parsing CSV text.
+
+    Parameters
+    ----------
+    output_path : str
+        Combined report path as passed to :func:`write_report`.
+    fmt : {"csv", "parquet", "both"}, optional
+        Format the report was written in (default: ``"csv"``).
+
+    Returns
+    -------
+    pandas.DataFrame
+        The combined results.
+    """
+    import pandas as pd
+    paths = report_paths(output_path, fmt)
+    if "parquet" in paths:
+        _require_pyarrow()
+        return pd.read_parquet(paths["parquet"])
+    return pd.read_csv(paths["csv"])
+
+def write_report(results, output_path="output/results.csv", save: bool = True, console=None, rich_enabled: bool = True, fmt: str = "csv", max_rows: int = DEFAULT_CONSOLE_ROWS, full_table: bool = False):
     """
     Write interpreted results to CSV and print a summary table.
 
     Parameters
     ----------
-    results : list of dict
-        Interpreted result dictionaries (see :func:`interpret_hits`).
+    results : list of dict or pandas.DataFrame
+        Interpreted results (see :func:`interpret_hits` and
+        :func:`interpret_batch`).
     output_path : str, optional
         Destination CSV path for the combined results (default: ``output/results.csv``).
     save : bool, optional
@@ -67,21 +391,41 @@ def write_report(results, output_path="output/results.csv", save: bool = True, c
         available, a console will be created.
     rich_enabled : bool, optional
         Whether to use Rich-based formatting when available (default: True).
+    fmt : {"csv", "parquet", "both"}, optional
+        Combined report format (default: ``"csv"``); see :func:`report_paths`.
+    max_rows : int, optional
+        When there are more results than this, the console shows only the
+        top ``max_rows`` hits by identity followed by per-class and
+        per-sample counts (default: 50). The saved files always hold every
+        row.
+    full_table : bool, optional
+        Print every row regardless of ``max_rows`` (default: False).
 
     Returns
     -------
     None
     """
     import pandas as pd
-    columns = ["sample_id", "gene", "identity", "coverage", "antibiotic_class", "source_file"]
-    df = pd.DataFrame(results, columns=columns) if len(results) > 0 else pd.DataFrame(columns=columns)
+    columns = REPORT_COLUMNS
+    paths = report_paths(output_path, fmt)
+    if isinstance(results, pd.DataFrame):
+        df = results.reindex(columns=columns)
+    else:
+        df = pd.DataFrame(results, columns=columns) if len(results) > 0 else pd.DataFrame(columns=columns)
     if save:
         # Ensure directory exists
         outdir = os.path.dirname(output_path)
         if outdir:
             os.makedirs(outdir, exist_ok=True)
-        df.to_csv(output_path, index=False)
-        logging.info("Results written to %s", output_path)
+        if "csv" in paths:
+            df.to_csv(output_path, index=False)
+            logging.info("Results written to %s", output_path)
+        if "parquet" in paths:
+            write_parquet(df, paths["parquet"], columns=columns)
+    # Large result sets are summarized: top rows plus aggregate counts
+    truncated = not full_table and len(df) > max_rows
+    shown = df.sort_values(["identity", "coverage"], ascending=False, kind="stable").head(max_rows) if truncated else df
+    note = f"Showing top {max_rows} of {len(df)} hits by identity; use --full-table to print every row."
     # If rich is requested and available, use Rich Table; otherwise plain text
     if rich_enabled and _HAS_RICH:
         if console is None:
@@ -96,12 +440,11 @@ def write_report(results, output_path="output/results.csv", save: bool = True, c
             if df.empty:
                 console.print("No resistance genes detected in any sample.")
             else:
-                table = Table(show_header=True, header_style="bold magenta")
-                for col in columns:
-                    table.add_column(col)
-                for _, row in df.iterrows():
-                    table.add_row(*[str(row[col]) if not pd.isna(row[col]) else "" for col in columns])
-                console.print(table)
+                console.print(_rich_table(shown))
+                if truncated:
+                    console.print(note)
+                    for title, counts in zip(("Hits per antibiotic class", "Hits per sample"), report_counts(df)):
+                        console.print(_rich_table(counts, title=title))
             return
 
     # Fallback plain text output
@@ -109,4 +452,42 @@ def write_report(results, output_path="output/results.csv", save: bool = True, c
     if df.empty:
         print("No resistance genes detected in any sample.")
     else:
-        print(df.to_string(index=False, columns=columns))
+        print(shown.to_string(index=False, columns=columns))
+        if truncated:
+            print(note)
+            for title, counts in zip(("Hits per antibiotic class", "Hits per sample"), report_counts(df)):
+                print(f"\n{title}:")
+                print(counts.to_string(index=False))
+
+def report_counts(results):
+    """
+    Aggregate hit counts per antibiotic class and per sample.
+
+    Parameters
+    ----------
+    results : pandas.DataFrame
+        Interpreted results with columns :data:`REPORT_COLUMNS`.
+
+    Returns
+    -------
+    tuple of pandas.DataFrame
+        ``(by_class, by_sample)``: ``by_class`` has columns
+        ``antibiotic_class``, ``hits``, ``samples`` and ``genes``;
+        ``by_sample`` has ``sample_id``, ``hits``, ``genes`` and
+        ``classes``. Both are ordered by descending ``hits``.
+    """
+    by_class = results.groupby("antibiotic_class", sort=False, observed=True).agg(
+        hits=("gene", "size"), samples=("sample_id", "nunique"), genes=("gene", "nunique"))
+    by_sample = results.groupby("sample_id", sort=False, observed=True).agg(
+        hits=("gene", "size"), genes=("gene", "nunique"), classes=("antibiotic_class", "nunique"))
+    return tuple(t.reset_index().sort_values("hits", ascending=False, kind="stable") for t in (by_class, by_sample))
+
+def _rich_table(df, title=None):
+    # Build all cell strings column-wise rather than row by row
+    table = Table(show_header=True, header_style="bold magenta", title=title)
+    for col in df.columns:
+        table.add_column(str(col))
+    cells = df.astype(object).where(df.notna(), "").astype(str)
+    for row in cells.itertuples(index=False, name=None):
+        table.add_row(*row)
+    return table
@@ -0,0 +1,315 @@
+"""
+Built-in k-mer search engine for nucleotide queries.
+
+Provides a dependency-light alternative to DIAMOND/BLAST+ for machines
+where neither tool is installed. Database sequences are indexed as
+2-bit packed k-mers held in sorted NumPy arrays; query k-mers are looked
+up with a binary search (seeding), seeds are grouped by diagonal, and
+diagonals holding at least two non-overlapping seeds (a two-hit filter,
+as in BLAST) are extended into ungapped local alignments, the best few
+per database gene (extension). Hits are returned in the same normalized format
+as :func:`src.run_blast.parse_blast_results`.
+"""
+import logging
+import numpy as np
+
+DEFAULT_K = 11
+MATCH_SCORE = 2
+MISMATCH_SCORE = -3
+# Diagonals extended per database gene and query strand, most seeds first
+MAX_EXTENSIONS_PER_REF = 8
+
+# Byte -> 2-bit nucleotide code; 4 marks ambiguous/invalid characters
+_ENCODE = np.full(256, 4, dtype=np.uint8)
+for _code, _bases in enumerate((b"Aa", b"Cc", b"Gg", b"TtUu")):
+    for _b in _bases:
+        _ENCODE[_b] = _code
+
+
+def encode_sequence(seq):
+    """
+    Encode a nucleotide sequence as an array of 2-bit codes.
+
+    Parameters
+    ----------
+    seq : str or bytes
+        Nucleotide sequence.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``uint8`` array with values 0-3 for A/C/G/T and 4 for any other
+        character (e.g. ``N``).
+    """
+    if isinstance(seq, str):
+        seq = seq.encode("ascii", errors="replace")
+    return _ENCODE[np.frombuffer(seq, dtype=np.uint8)]
+
+
+def reverse_complement_codes(codes):
+    """
+    Return the reverse complement of an encoded sequence.
+
+    Parameters
+    ----------
+    codes : numpy.ndarray
+        Encoded sequence from :func:`encode_sequence`.
+
+    Returns
+    -------
+    numpy.ndarray
+        Encoded reverse complement; invalid positions stay invalid.
+    """
+    rc = codes[::-1].copy()
+    valid = rc < 4
+    rc[valid] = 3 - rc[valid]
+    return rc
+
+
+def pack_kmers(codes, k=DEFAULT_K):
+    """
+    Pack all valid k-mers of an encoded sequence into 64-bit integers.
+
+    Parameters
+    ----------
+    codes : numpy.ndarray
+        Encoded sequence from :func:`encode_sequence`.
+    k : int, optional
+        k-mer size, at most 32 (default: 11).
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        ``(kmers, positions)`` where ``kmers`` are ``uint64`` packed values
+        and ``positions`` the 0-based start offsets. Windows overlapping an
+        invalid character are skipped.
+    """
+    if not 0 < k <= 32:
+        raise ValueError(f"k must be between 1 and 32, got {k}")
+    n = len(codes) - k + 1
+    if n <= 0:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+    bits = (codes & 3).astype(np.uint64)
+    kmers = np.zeros(n, dtype=np.uint64)
+    for j in range(k):
+        kmers = (kmers << np.uint64(2)) | bits[j:j + n]
+    invalid = np.concatenate(([0], np.cumsum(codes > 3)))
+    ok = (invalid[k:] - invalid[:n]) == 0
+    return kmers[ok], np.nonzero(ok)[0]
+
+
+class KmerIndex:
+    """
+    Sorted k-mer index over a set of database sequences.
+
+    Parameters
+    ----------
+    records : iterable of tuple
+        ``(identifier, sequence)`` pairs.
+    k : int, optional
+        k-mer size (default: 11).
+    """
+
+    def __init__(self, records, k=DEFAULT_K):
+        self.k = k
+        self.ids = []
+        self.seqs = []
+        kmer_parts, ref_parts, pos_parts = [], [], []
+        for ref, (rec_id, seq) in enumerate(records):
+            codes = encode_sequence(seq)
+            kmers, pos = pack_kmers(codes, k)
+            self.ids.append(rec_id)
+            self.seqs.append(codes)
+            kmer_parts.append(kmers)
+            ref_parts.append(np.full(len(kmers), ref, dtype=np.int64))
+            pos_parts.append(pos)
+        kmers = np.concatenate(kmer_parts) if kmer_parts else np.empty(0, dtype=np.uint64)
+        order = np.argsort(kmers, kind="stable")
+        self._kmers = kmers[order]
+        self._refs = np.concatenate(ref_parts)[order] if ref_parts else np.empty(0, dtype=np.int64)
+        self._pos = np.concatenate(pos_parts)[order] if pos_parts else np.empty(0, dtype=np.int64)
+
+    @classmethod
+    def from_fasta(cls, db_fasta, k=DEFAULT_K):
+        """
+        Build an index from a FASTA file.
+
+        Parameters
+        ----------
+        db_fasta : str
+            Path to the database FASTA.
+        k : int, optional
+            k-mer size (default: 11).
+
+        Returns
+        -------
+        KmerIndex
+            The populated index.
+        """
+        from Bio import SeqIO
+        return cls(((rec.id, str(rec.seq)) for rec in SeqIO.parse(db_fasta, "fasta")), k=k)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def seeds(self, kmers, positions):
+        """
+        Find all database occurrences of the given query k-mers.
+
+        Parameters
+        ----------
+        kmers : numpy.ndarray
+            Packed query k-mers from :func:`pack_kmers`.
+        positions : numpy.ndarray
+            Query offsets of ``kmers``.
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            ``(query_pos, ref, ref_pos)`` arrays, one entry per seed.
+        """
+        lo = np.searchsorted(self._kmers, kmers, side="left")
+        hi = np.searchsorted(self._kmers, kmers, side="right")
+        counts = hi - lo
+        total = int(counts.sum())
+        if total == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, empty
+        # Expand each [lo, hi) range into explicit index positions
+        starts = np.repeat(lo - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+        idx = starts + np.arange(total)
+        return np.repeat(positions, counts), self._refs[idx], self._pos[idx]
+
+
+def _extend(qcodes, scodes, diag):
+    # Ungapped extension along one diagonal: maximum-scoring segment of the overlap
+    q0 = max(0, -diag)
+    q1 = min(len(qcodes), len(scodes) - diag)
+    if q1 <= q0:
+        return None
+    q = qcodes[q0:q1]
+    matches = (q == scodes[q0 + diag:q1 + diag]) & (q < 4)
+    scores = np.where(matches, MATCH_SCORE, MISMATCH_SCORE)
+    cum = np.concatenate(([0], np.cumsum(scores)))
+    running_min = np.minimum.accumulate(cum)
+    end = int(np.argmax(cum - running_min))
+    start = int(np.argmin(cum[:end + 1]))
+    if end <= start:
+        return None
+    n_match = int(matches[start:end].sum())
+    return q0 + start, q0 + end, n_match, int(cum[end] - cum[start])
+
+
+def _search_strand(index, qcodes):
+    # Best-scoring alignment per database gene for one query strand
+    kmers, positions = pack_kmers(qcodes, index.k)
+    qpos, refs, spos = index.seeds(kmers, positions)
+    if len(refs) == 0:
+        return {}
+    diags = spos - qpos
+    order = np.lexsort((qpos, diags, refs))
+    refs, diags, qpos = refs[order], diags[order], qpos[order]
+    starts = np.flatnonzero(np.concatenate(([True], (refs[1:] != refs[:-1]) | (diags[1:] != diags[:-1]))))
+    ends = np.append(starts[1:], len(refs))
+    refs, diags, counts = refs[starts], diags[starts], ends - starts
+    # Two-hit filter: seeds spanning at least k query bases (less when the
+    # gene or query is too short to hold two non-overlapping k-mers), so
+    # isolated random k-mer matches are never extended
+    ref_lens = np.array([len(s) for s in index.seqs], dtype=np.int64)[refs]
+    min_span = np.maximum(0, np.minimum(index.k, np.minimum(ref_lens, len(qcodes)) - index.k))
+    keep = (qpos[ends - 1] - qpos[starts]) >= min_span
+    refs, diags, counts = refs[keep], diags[keep], counts[keep]
+    # Most seeds first within each gene; extend only the top diagonals of each
+    order = np.lexsort((-counts, refs))
+    refs, diags, counts = refs[order], diags[order], counts[order]
+    first = np.searchsorted(refs, refs, side="left")
+    keep = (np.arange(len(refs)) - first) < MAX_EXTENSIONS_PER_REF
+    refs, diags, counts = refs[keep], diags[keep], counts[keep]
+    best = {}
+    # Visit diagonals with the most seeds first; keep the best-scoring one per gene
+    for i in np.argsort(-counts, kind="stable"):
+        ref, diag = int(refs[i]), int(diags[i])
+        ext = _extend(qcodes, index.seqs[ref], diag)
+        if ext is not None and (ref not in best or ext[3] > best[ref][0][3]):
+            best[ref] = (ext, diag)
+    return best
+
+
+def _iter_records(fasta):
+    # Stream records from a plain or compressed FASTA
+    from Bio import SeqIO
+    from src.utils import open_fasta
+    with open_fasta(fasta) as handle:
+        yield from SeqIO.parse(handle, "fasta")
+
+
+def kmer_search(query_fasta, db_fasta, identity=0, coverage=0, max_targets=10, k=DEFAULT_K, index=None):
+    """
+    Search nucleotide queries against a database with the built-in engine.
+
+    Parameters
+    ----------
+    query_fasta : str
+        Path to the query FASTA, optionally compressed (see
+        :func:`src.utils.open_fasta`).
+    db_fasta : str
+        Path to the database FASTA (ignored when ``index`` is given).
+    identity : float, optional
+        Minimum percent identity for reported hits (default: 0).
+    coverage : int, optional
+        Minimum alignment length for reported hits (default: 0).
+    max_targets : int, optional
+        Maximum number of hits reported per query sequence (default: 10).
+    k : int, optional
+        Seed k-mer size (default: 11).
+    index : KmerIndex, optional
+        Pre-built index to reuse across searches.
+
+    Returns
+    -------
+    list of dict
+        Hits with keys ``query``, ``gene``, ``identity``, ``length``,
+        ``qstart``, ``qend``, ``sstart``, ``send`` (1-based, inclusive).
+        Minus-strand hits have ``sstart`` greater than ``send`` as in
+        BLAST+ output.
+    """
+    if index is None:
+        index = KmerIndex.from_fasta(db_fasta, k=k)
+    results = []
+    for record in _iter_records(query_fasta):
+        fwd = encode_sequence(str(record.seq))
+        qlen = len(fwd)
+        candidates = []
+        for strand, codes in (("+", fwd), ("-", reverse_complement_codes(fwd))):
+            for ref, ((a, b, n_match, score), diag) in _search_strand(index, codes).items():
+                if strand == "+":
+                    coords = (a + 1, b, a + diag + 1, b + diag)
+                else:
+                    # Map reverse-complement coordinates back onto the forward query
+                    coords = (qlen - b + 1, qlen - a, b + diag, a + diag + 1)
+                candidates.append((score, ref, n_match, b - a, coords))
+        candidates.sort(key=lambda c: -c[0])
+        seen = set()
+        n_reported = 0
+        for score, ref, n_match, length, (qstart, qend, sstart, send) in candidates:
+            if ref in seen:
+                continue
+            seen.add(ref)
+            pident = round(100.0 * n_match / length, 3)
+            if pident < identity or length < coverage:
+                continue
+            results.append({
+                "query": record.id,
+                "gene": index.ids[ref],
+                "identity": pident,
+                "length": length,
+                "qstart": qstart,
+                "qend": qend,
+                "sstart": sstart,
+                "send": send
+            })
+            n_reported += 1
+            if n_reported >= max_targets:
+                break
+    logging.info(f"k-mer search completed: {len(results)} hits")
+    return results
@@ -7,14 +7,27 @@ reporting and optional plotting.
 """
 
 import os
+import sys
 import logging
 import argparse
-from src.gene_detector import detect_genes, batch_detect_genes
-from src.interpret_results import interpret_hits, write_report
-from src.utils import setup_logging
+
+if __package__ in (None, ""):
+    # Running as a script (python src/main.py): make the ``src`` package importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.gene_detector import detect_genes, batch_detect_genes, select_best_hits, DEFAULT_SHARD_BYTES
+from src.interpret_results import interpret_hits, interpret_batch, write_report, write_sample_reports, read_report, parquet_available, StreamingReportWriter, DEFAULT_CONSOLE_ROWS
+from src.utils import setup_logging, fasta_sample_id, find_fasta_files, available_cpus
+from src.run_blast import resolve_diamond_options, DIAMOND_PROFILES, DIAMOND_SENSITIVITIES
 from src.rich_utils import get_console, get_progress, setup_rich_logging
 
 
+# Per-sample timing table written by --timings
+TIMINGS_NAME = "timings.tsv"
+DEFAULT_SHARD_MB = DEFAULT_SHARD_BYTES // (1024 * 1024)
+DEFAULT_GENE_MAP = "AntibioticResistanceGeneDetector/data/gene_class_map.csv"
+
+
 def run_pipeline(args, progress=None):
     """
     Execute the detection pipeline using a parsed arguments namespace.
@@ -49,7 +62,8 @@ def run_pipeline(args, progress=None):
     _p("Loading input sequences")
 
     # Validate input
-    if not os.path.exists(args.input):
+    refilter = getattr(args, 'refilter', False)
+    if not refilter and not os.path.exists(args.input):
         raise FileNotFoundError(f"Input path not found: {args.input}")
 
     # Ensure outdir exists and writable
@@ -64,24 +78,52 @@ def run_pipeline(args, progress=None):
     except Exception as e:
         raise PermissionError(f"Cannot write to output directory {outdir}: {e}")
 
-    is_dir = os.path.isdir(args.input)
+    is_dir = not refilter and os.path.isdir(args.input)
+    diamond_options = resolve_diamond_options(getattr(args, 'diamond_profile', None), sensitivity=getattr(args, 'diamond_sensitivity', None), block_size=getattr(args, 'block_size', None), index_chunks=getattr(args, 'index_chunks', None))
+    raw_dir = None
+    if getattr(args, 'keep_raw', False) and not refilter:
+        from src.raw_hits import RAW_DIRNAME, write_run_samples
+        raw_dir = os.path.join(outdir, RAW_DIRNAME)
+        # Refiltering reads only this run's samples, not leftovers in the outdir
+        write_run_samples(raw_dir, [fasta_sample_id(f) for f in (find_fasta_files(args.input) if is_dir else [args.input])])
+    cache = None
+    if getattr(args, 'cache_dir', None):
+        from src.result_cache import ResultCache, DEFAULT_MAX_BYTES
+        cache = ResultCache(args.cache_dir, max_bytes=getattr(args, 'cache_size', None) or DEFAULT_MAX_BYTES)
 
-    if is_dir:
+    if refilter:
+        # Re-apply thresholds to the hits kept by an earlier --keep-raw run
+        from src.raw_hits import refilter_hits, RAW_DIRNAME
+        _p("Filtering hits")
+        best_hits, sample_ids = refilter_hits(os.path.join(outdir, RAW_DIRNAME), args.identity, args.coverage, coverage_mode=getattr(args, 'coverage_mode', 'bp'))
+        combined_results = _write_batch_reports(best_hits, sample_ids, args, outdir, _p, console=console, rich_enabled=rich_flag)
+    elif is_dir:
         # Batch mode
         _p("Running BLAST search")
-        batch_results = batch_detect_genes(args.input, args.db, args.identity, args.coverage, threads=args.threads, output_dir=outdir, write_per_sample=not args.summary, console=console, rich_enabled=rich_flag)
-        all_results = []
-        for sample_id, hits in batch_results.items():
+        batch_kwargs = dict(threads=args.threads, output_dir=outdir, write_per_sample=not args.summary, console=console, rich_enabled=rich_flag, scratch_dir=getattr(args, 'tmpdir', None), stream=getattr(args, 'stream', False), tool=getattr(args, 'tool', None), concat=getattr(args, 'concat', False), concat_batch=getattr(args, 'concat_batch', 256), executor=getattr(args, 'executor', 'thread'), chunksize=getattr(args, 'chunksize', 1), cache=cache, raw_dir=raw_dir, coverage_mode=getattr(args, 'coverage_mode', 'bp'), cpus=getattr(args, 'cpus', None), tool_threads=getattr(args, 'tool_threads', None), diamond_options=diamond_options)
+        timings = batch_kwargs['timings'] = {} if getattr(args, 'timings', False) else None
+        if getattr(args, 'stream_report', False) or getattr(args, 'resume', False):
+            combined_results = _run_streaming_batch(args, outdir, batch_kwargs, _p, console=console, rich_enabled=rich_flag)
+        else:
+            manifest = _open_manifest(args, outdir, batch_kwargs) if not args.summary else None
+            inputs = {fasta_sample_id(f): f for f in find_fasta_files(args.input)} if manifest is not None else {}
+
+            def _record(sample_id, hits, error=None):
+                # Write each report as its sample completes and record it, so
+                # a run that crashes part-way can be continued with --resume
+                if manifest is None or error is not None or sample_id not in inputs:
+                    return
+                results_df = interpret_batch(select_best_hits(hits, keys=("sample_id", "gene"), as_frame=True), args.map)
+                write_sample_reports(results_df, outdir, sample_ids=[sample_id])
+                manifest.record(sample_id, inputs[sample_id], f"{sample_id}_results.csv", len(results_df))
+            batch_results = batch_detect_genes(args.input, args.db, args.identity, args.coverage, on_result=_record, **batch_kwargs)
             _p("Filtering hits")
-            results = interpret_hits(hits, args.map)
-            out_path = os.path.join(outdir, f"{sample_id}_results.csv")
-            # Save per-sample unless summary mode
-            write_report(results, out_path, save=not args.summary, console=console, rich_enabled=rich_flag)
-            all_results.extend(results)
-        # Combined report
-        _p("Building summary")
-        write_report(all_results, os.path.join(outdir, args.output_name), save=not args.summary, console=console, rich_enabled=rich_flag)
-        combined_results = all_results
+            # One cross-sample table: best hit per (sample, gene), annotated in a single join
+            best_hits = select_best_hits((hit for hits in batch_results.values() for hit in hits), keys=("sample_id", "gene"), as_frame=True)
+            recorded = [s for s in batch_results if manifest is not None and s in manifest.entries]
+            combined_results = _write_batch_reports(best_hits, batch_results.keys(), args, outdir, _p, console=console, rich_enabled=rich_flag, written=recorded)
+        if timings is not None:
+            _write_timings(timings, os.path.join(outdir, TIMINGS_NAME))
     else:
         # Single-file mode
         # Validate FASTA readability
@@ -99,11 +141,11 @@ def run_pipeline(args, progress=None):
                 console.print("Input FASTA invalid.") if console is not None else print("Input FASTA invalid.")
                 return []
         _p("Running BLAST search")
-        hits = detect_genes(args.input, args.db, args.identity, args.coverage, output_dir=outdir, console=console, rich_enabled=rich_flag, fail_silently=True)
+        hits = detect_genes(args.input, args.db, args.identity, args.coverage, output_dir=outdir, console=console, rich_enabled=rich_flag, fail_silently=True, scratch_dir=getattr(args, 'tmpdir', None), stream=getattr(args, 'stream', False), tool=getattr(args, 'tool', None), cache=cache, raw_dir=raw_dir, coverage_mode=getattr(args, 'coverage_mode', 'bp'), tool_threads=getattr(args, 'tool_threads', None) or getattr(args, 'cpus', None) or available_cpus(), threads=getattr(args, 'threads', 1), shard_bytes=int(getattr(args, 'shard_size', DEFAULT_SHARD_MB) * 1024 * 1024), diamond_options=diamond_options)
         _p("Filtering hits")
         results = interpret_hits(hits, args.map)
         _p("Building summary")
-        write_report(results, os.path.join(outdir, args.output_name), save=not args.summary, console=console, rich_enabled=rich_flag)
+        write_report(results, os.path.join(outdir, args.output_name), save=not args.summary, console=console, rich_enabled=rich_flag, fmt=getattr(args, 'format', 'csv'), max_rows=getattr(args, 'max_rows', DEFAULT_CONSOLE_ROWS), full_table=getattr(args, 'full_table', False))
         combined_results = results
 
     # Generate plots if requested
@@ -122,6 +164,193 @@ def run_pipeline(args, progress=None):
     return combined_results
 
 
+def _write_timings(timings, path):
+    """
+    Write per-sample wall times collected by ``batch_detect_genes``.
+
+    Parameters
+    ----------
+    timings : dict
+        ``{sample_id: {"seconds", "tool_threads", "input_bytes"}}``.
+    path : str
+        Destination TSV, slowest sample first.
+
+    Returns
+    -------
+    None
+    """
+    import csv
+    with open(path, "w", newline="") as fh:
+        writer = csv.writer(fh, delimiter="\t")
+        writer.writerow(["sample_id", "seconds", "tool_threads", "input_bytes"])
+        for sample_id, t in sorted(timings.items(), key=lambda item: -item[1]["seconds"]):
+            writer.writerow([sample_id, t["seconds"], t["tool_threads"] or "", t["input_bytes"]])
+    logging.info(f"Per-sample timings written to {path}")
+
+
+def _write_batch_reports(best_hits, sample_ids, args, outdir, _p, console=None, rich_enabled: bool = True, written=()):
+    """
+    Annotate the best hits of many samples and write their reports.
+
+    Parameters
+    ----------
+    best_hits : pandas.DataFrame
+        Best hit per ``(sample_id, gene)``.
+    sample_ids : iterable of str
+        Samples processed; those without hits get header-only reports.
+    args : argparse.Namespace or similar
+        Pipeline arguments (see :func:`run_pipeline`).
+    outdir : str
+        Output directory.
+    _p : callable
+        Stage progress callback.
+    console : Console-like, optional
+        Console for the summary table.
+    rich_enabled : bool, optional
+        Whether Rich output is enabled.
+    written : iterable of str, optional
+        Samples whose per-sample reports were already written as they
+        completed.
+
+    Returns
+    -------
+    list of dict
+        The combined interpreted rows.
+    """
+    results_df = interpret_batch(best_hits, args.map)
+    # Save per-sample unless summary mode
+    if not args.summary:
+        written = set(written)
+        write_sample_reports(results_df, outdir, sample_ids=[s for s in sample_ids if s not in written])
+    # Combined report
+    _p("Building summary")
+    write_report(results_df, os.path.join(outdir, args.output_name), save=not args.summary, console=console, rich_enabled=rich_enabled, fmt=getattr(args, 'format', 'csv'), max_rows=getattr(args, 'max_rows', DEFAULT_CONSOLE_ROWS), full_table=getattr(args, 'full_table', False))
+    return results_df.to_dict("records")
+
+
+def _open_manifest(args, outdir, batch_kwargs):
+    """
+    Open the run manifest of a batch with the current run parameters.
+
+    Parameters
+    ----------
+    args : argparse.Namespace or similar
+        Pipeline arguments (see :func:`run_pipeline`).
+    outdir : str
+        Output directory holding ``manifest.jsonl``.
+    batch_kwargs : dict
+        Keyword arguments passed to ``batch_detect_genes``.
+
+    Returns
+    -------
+    src.manifest.RunManifest
+        The manifest.
+    """
+    from src.manifest import RunManifest, run_parameters
+    from src.run_blast import resolve_search_tool
+    tool = batch_kwargs.get('tool') or resolve_search_tool()
+    sensitivity = (batch_kwargs.get('diamond_options') or {}).get('sensitivity') if tool == 'diamond' else None
+    return RunManifest(outdir, run_parameters(args.db, args.identity, args.coverage, tool=tool, coverage_mode=batch_kwargs.get('coverage_mode', 'bp'), sensitivity=sensitivity, gene_map=args.map))
+
+
+def _run_streaming_batch(args, outdir, batch_kwargs, _p, console=None, rich_enabled: bool = True):
+    """
+    Batch mode that flushes each sample's rows as soon as it completes.
+
+    Each sample is reduced, annotated and appended to the combined CSV by
+    a :class:`~src.interpret_results.StreamingReportWriter` from the
+    ``batch_detect_genes`` completion callback, so hits are not retained
+    in memory and completed samples survive a crash (in
+    ``<output>.partial``). The combined file is renamed into place once
+    all samples are done.
+
+    Every written per-sample report is recorded in a
+    :class:`~src.manifest.RunManifest`. With ``args.resume`` set, samples
+    whose manifest entry matches the current input, database and
+    thresholds are not searched again; their saved reports are copied
+    into the combined output instead.
+
+    Parameters
+    ----------
+    args : argparse.Namespace or similar
+        Pipeline arguments (see :func:`run_pipeline`).
+    outdir : str
+        Output directory.
+    batch_kwargs : dict
+        Keyword arguments forwarded to :func:`batch_detect_genes`.
+    _p : callable
+        Stage progress callback.
+    console : Console-like, optional
+        Console for the closing summary.
+    rich_enabled : bool, optional
+        Whether Rich output is enabled.
+
+    Returns
+    -------
+    list of dict
+        The combined rows, read back from disk only when plots are
+        requested; otherwise an empty list (the rows are on disk).
+    """
+    combined_path = os.path.join(outdir, args.output_name)
+    fmt = getattr(args, 'format', 'csv')
+    writer = StreamingReportWriter(combined_path, fmt=fmt) if not args.summary else None
+    sample_rows = {}
+    manifest = None
+    inputs = {}
+    resumed = []
+    if writer is not None:
+        manifest = _open_manifest(args, outdir, batch_kwargs)
+    elif getattr(args, 'resume', False):
+        logging.warning("--resume needs per-sample reports; ignored in summary mode.")
+
+    def _skip(fasta):
+        # Called once per discovered input before any search starts
+        sample_id = fasta_sample_id(fasta)
+        inputs[sample_id] = fasta
+        entry = manifest.lookup(fasta) if manifest is not None and getattr(args, 'resume', False) else None
+        if entry is None:
+            return False
+        import pandas as pd
+        report = pd.read_csv(os.path.join(outdir, entry["output"]))
+        sample_rows[sample_id] = len(report)
+        writer.write(report, sample_id=sample_id)
+        resumed.append(sample_id)
+        return True
+
+    def _on_result(sample_id, hits, error=None):
+        _p("Filtering hits")
+        best_hits = select_best_hits(hits, keys=("sample_id", "gene"), as_frame=True)
+        results_df = interpret_batch(best_hits, args.map)
+        sample_rows[sample_id] = len(results_df)
+        if writer is not None:
+            write_sample_reports(results_df, outdir, sample_ids=[sample_id])
+            writer.write(results_df, sample_id=sample_id)
+            # Failed samples are left out of the manifest so --resume retries them
+            if sample_id in inputs and error is None:
+                manifest.record(sample_id, inputs[sample_id], f"{sample_id}_results.csv", len(results_df))
+
+    try:
+        batch_detect_genes(args.input, args.db, args.identity, args.coverage, on_result=_on_result, keep_hits=False, skip=_skip, **batch_kwargs)
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        raise
+    _p("Building summary")
+    if writer is not None:
+        writer.finalize()
+    message = f"{sum(sample_rows.values())} resistance gene hits in {len(sample_rows)} samples"
+    message += f" ({len(resumed)} resumed from {manifest.path})" if resumed else ""
+    message += f" written to {', '.join(writer.paths.values())}" if writer is not None else ""
+    if console is not None:
+        console.rule("Summary Table")
+        console.print(message)
+    else:
+        print(message)
+    if args.plot and writer is not None:
+        return read_report(combined_path, fmt).to_dict("records")
+    return []
+
+
 def main():
     parser = argparse.ArgumentParser(description="Antibiotic Resistance Gene Detector")
     # Read version from project VERSION file if available
@@ -135,21 +364,57 @@ def main():
                 version_str = vf.read().strip()
         except Exception:
             version_str = "0.0.0"
-    parser.add_argument("--input", required=True, help="Input FASTA file or directory")
+    parser.add_argument("--input", help="Input FASTA file or directory (required unless --refilter)")
     parser.add_argument("--db", default="AntibioticResistanceGeneDetector/data/resistance_genes.fasta", help="Resistance gene DB FASTA")
-    parser.add_argument("--map", default="AntibioticResistanceGeneDetector/data/gene_class_map.csv", help="Gene-to-class CSV mapping")
+    parser.add_argument("--map", default=DEFAULT_GENE_MAP, help="Gene-to-class CSV mapping")
     parser.add_argument("--outdir", dest='outdir', default="output", help="Directory for CSV, logs, and plots")
     parser.add_argument("--output", dest='output_name', default="results.csv", help="Combined CSV filename")
     parser.add_argument("--identity", type=float, default=90, help="Minimum percent identity (default: 90)")
-    parser.add_argument("--coverage", type=int, default=80, help="Minimum alignment coverage in bp (default: 80)")
-    parser.add_argument("--threads", type=int, default=1, help="Threads for batch processing (default: 1)")
+    parser.add_argument("--coverage", type=float, default=80, help="Minimum coverage: alignment length in bp, or percent of the reference gene with --coverage-mode percent (default: 80)")
+    parser.add_argument("--coverage-mode", dest='coverage_mode', choices=["bp", "percent"], default="bp", help="Interpret --coverage as aligned bp or as percent of reference length (default: bp)")
+    parser.add_argument("--threads", type=int, default=1, help="Concurrent batch workers (default: 1)")
+    parser.add_argument("--cpus", type=int, default=None, help="CPUs shared by DIAMOND/BLAST+ searches (default: all available)")
+    parser.add_argument("--tool-threads", type=int, default=None, help="Fixed DIAMOND --threads / BLAST+ -num_threads per search (default: derived from --cpus)")
+    parser.add_argument("--diamond-profile", choices=list(DIAMOND_PROFILES), default=None, help="DIAMOND tuning preset: fast, balanced (default), sensitive, or low-memory for small-RAM nodes")
+    parser.add_argument("--diamond-sensitivity", choices=DIAMOND_SENSITIVITIES, default=None, help="DIAMOND sensitivity mode, overriding the profile's")
+    parser.add_argument("--block-size", type=float, default=None, help="DIAMOND --block-size in billions of letters (memory use is roughly 6x this in GB), overriding the profile's")
+    parser.add_argument("--index-chunks", type=int, default=None, help="DIAMOND --index-chunks (more chunks use less memory), overriding the profile's")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread", help="Batch worker backend used with --threads (default: thread)")
+    parser.add_argument("--chunksize", type=int, default=1, help="Work items per worker process at a time (default: 1)")
+    parser.add_argument("--shard-size", type=float, default=DEFAULT_SHARD_MB, help=f"Single-input mode with --threads: split an input larger than this many MiB into record-aligned chunks searched in parallel (default: {DEFAULT_SHARD_MB})")
+    parser.add_argument("--timings", action="store_true", help=f"Batch mode: write per-sample wall time, search threads and input size to {TIMINGS_NAME}")
+    parser.add_argument("--tmpdir", default=None, help="Directory for per-search scratch files (default: system temp)")
+    parser.add_argument("--tool", choices=["diamond", "blastn", "blastp", "kmer", "mock"], default=None, help="Search tool; kmer is the built-in engine (default: auto-detect)")
+    parser.add_argument("--stream", action="store_true", help="Stream search output through a pipe instead of a scratch file")
+    parser.add_argument("--concat", action="store_true", help="Batch mode: search many samples per tool invocation")
+    parser.add_argument("--concat-batch", dest='concat_batch', type=int, default=256, help="Samples per concatenated search (default: 256)")
+    parser.add_argument("--cache-dir", dest='cache_dir', default=os.environ.get("ARG_RES_CACHE_DIR"), help="Reuse per-sample results cached in this directory for identical input, database, tool and thresholds (default: $ARG_RES_CACHE_DIR; disabled if unset)")
+    parser.add_argument("--cache-size", dest='cache_size', type=int, default=None, help="Maximum result cache size in bytes; least recently used entries are evicted (default: 256 MiB)")
+    parser.add_argument("--format", dest='format', choices=["csv", "parquet", "both"], default="csv", help="Combined report format; Parquet (requires pyarrow) is written next to the CSV path with a .parquet extension (default: csv)")
+    parser.add_argument("--stream-report", dest='stream_report', action="store_true", help="Batch mode: append each sample's rows to the combined CSV as it completes")
+    parser.add_argument("--resume", action="store_true", help="Batch mode: skip samples already completed in this output directory with the same inputs, database and thresholds (every batch run with per-sample reports records them in manifest.jsonl)")
+    parser.add_argument("--keep-raw", dest='keep_raw', action="store_true", help="Search without thresholds and keep every hit under <outdir>/raw so --refilter can re-apply new thresholds")
+    parser.add_argument("--refilter", action="store_true", help="Re-apply --identity/--coverage to the raw hits kept in --outdir and rebuild reports and plots without searching")
     parser.add_argument("--plot", action="store_true", help="Save heatmap/bar/network plots")
     parser.add_argument("--summary", action="store_true", help="Print summary only; skip saving CSVs")
+    parser.add_argument("--max-rows", dest='max_rows', type=int, default=DEFAULT_CONSOLE_ROWS, help=f"Rows printed before the console table is summarized as top hits plus per-class/per-sample counts (default: {DEFAULT_CONSOLE_ROWS})")
+    parser.add_argument("--full-table", dest='full_table', action="store_true", help="Print every result row to the console")
     parser.add_argument("--quiet", action="store_true", help="Show only errors (silence info logs)")
     parser.add_argument("--rich", dest='rich', action="store_true", help="Enable Rich terminal output")
     parser.add_argument("--no-rich", dest='rich', action="store_false", help="Disable Rich terminal output")
     parser.add_argument('--version', action='version', version=version_str, help='Show tool version and exit')
     args = parser.parse_args()
+    if not args.input and not args.refilter:
+        parser.error("--input is required unless --refilter is given")
+    if args.format != "csv" and not parquet_available():
+        parser.error("--format parquet/both requires pyarrow (pip install pyarrow)")
+    for flag, value in (("--cpus", args.cpus), ("--tool-threads", args.tool_threads)):
+        if value is not None and value < 1:
+            parser.error(f"{flag} must be at least 1")
+    try:
+        resolve_diamond_options(args.diamond_profile, block_size=args.block_size, index_chunks=args.index_chunks)
+    except ValueError as e:
+        parser.error(str(e))
     # Backwards compatibility: allow --output as full path when provided earlier
     if os.path.isabs(args.output_name) or os.path.dirname(args.output_name):
         args.outdir = os.path.dirname(args.output_name) or args.outdir
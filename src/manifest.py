@@ -0,0 +1,182 @@
+"""
+Per-sample completion manifest for resumable batch runs.
+
+Each sample whose report has been written is recorded as one JSON line in
+``<output_dir>/manifest.jsonl`` together with the SHA-256 of its input
+FASTA, the SHA-256 of the database and the search thresholds. A later run
+with the same parameters can then skip samples whose recorded report is
+still present and intact, and only process the remainder. The file is
+append-only, so a run killed mid-write loses at most the sample being
+recorded.
+"""
+
+import os
+import json
+import logging
+import threading
+from src.utils import file_sha256, fasta_sample_id, resolve_gene_map_path
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def run_parameters(db_fasta, identity, coverage, tool=None, coverage_mode="bp", sensitivity=None, gene_map=None):
+    """
+    Build the parameter record that must match for a sample to be reused.
+
+    Parameters
+    ----------
+    db_fasta : str
+        Path to the database FASTA (hashed by content).
+    identity : float
+        Minimum percent identity.
+    coverage : float
+        Minimum alignment coverage.
+    tool : str, optional
+        Search tool name.
+    coverage_mode : {"bp", "percent"}, optional
+        How ``coverage`` is interpreted (default: ``"bp"``).
+    sensitivity : str, optional
+        DIAMOND sensitivity mode, when one is set.
+    gene_map : str, optional
+        Gene-to-class map CSV used to annotate the per-sample reports
+        (recorded by path and content hash).
+
+    Returns
+    -------
+    dict
+        JSON-serializable parameters.
+    """
+    params = {
+        "db_sha256": file_sha256(db_fasta),
+        "identity": float(identity),
+        "coverage": float(coverage),
+        "tool": tool,
+        "coverage_mode": coverage_mode,
+    }
+    if sensitivity:
+        params["sensitivity"] = sensitivity
+    if gene_map:
+        resolved = resolve_gene_map_path(gene_map)
+        params["gene_map"] = gene_map
+        params["gene_map_sha256"] = file_sha256(resolved) if os.path.isfile(resolved) else None
+    return params
+
+
+class RunManifest:
+    """
+    Append-only record of completed samples in an output directory.
+
+    Parameters
+    ----------
+    output_dir : str
+        Directory holding the per-sample reports and the manifest.
+    params : dict
+        Run parameters (see :func:`run_parameters`); entries recorded with
+        different parameters are never reused.
+    name : str, optional
+        Manifest file name (default: ``manifest.jsonl``).
+    """
+
+    def __init__(self, output_dir, params, name=MANIFEST_NAME):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, name)
+        self.params = dict(params)
+        self.entries = {}
+        self._hashes = {}
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            with open(self.path) as fh:
+                for line in fh:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn final line from an interrupted run
+                        continue
+                    self.entries[entry["sample_id"]] = entry
+
+    def input_hash(self, fasta):
+        """
+        Return the (memoized) SHA-256 of an input FASTA.
+
+        Parameters
+        ----------
+        fasta : str
+            Input FASTA path.
+
+        Returns
+        -------
+        str
+            Hexadecimal digest.
+        """
+        if fasta not in self._hashes:
+            self._hashes[fasta] = file_sha256(fasta)
+        return self._hashes[fasta]
+
+    def lookup(self, fasta):
+        """
+        Return the manifest entry for ``fasta`` if its report can be reused.
+
+        An entry is valid when it was recorded with the same parameters and
+        input content, and its report file still exists with the recorded
+        number of rows.
+
+        Parameters
+        ----------
+        fasta : str
+            Input FASTA path.
+
+        Returns
+        -------
+        dict or None
+            The entry, or ``None`` if the sample must be (re)processed.
+        """
+        sample_id = fasta_sample_id(fasta)
+        entry = self.entries.get(sample_id)
+        if entry is None or entry.get("params") != self.params:
+            return None
+        report = os.path.join(self.output_dir, entry["output"])
+        if not os.path.isfile(report) or self.input_hash(fasta) != entry.get("input_sha256"):
+            return None
+        with open(report) as fh:
+            rows = sum(1 for _ in fh) - 1
+        if rows != entry.get("rows"):
+            logging.info(f"Report for {sample_id} is incomplete; reprocessing.")
+            return None
+        return entry
+
+    def record(self, sample_id, fasta, output, rows):
+        """
+        Append a completed sample to the manifest.
+
+        Parameters
+        ----------
+        sample_id : str
+            Sample identifier.
+        fasta : str
+            Input FASTA path.
+        output : str
+            Report file name, relative to ``output_dir``.
+        rows : int
+            Number of rows in the report.
+
+        Returns
+        -------
+        dict
+            The recorded entry.
+        """
+        entry = {
+            "sample_id": sample_id,
+            "input": fasta,
+            "input_sha256": self.input_hash(fasta),
+            "params": self.params,
+            "output": output,
+            "rows": int(rows),
+        }
+        with self._lock:
+            os.makedirs(self.output_dir, exist_ok=True)
+            with open(self.path, "a") as fh:
+                fh.write(json.dumps(entry) + "\n")
+                fh.flush()
+                os.fsync(fh.fileno())
+            self.entries[sample_id] = entry
+        return entry
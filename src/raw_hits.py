@@ -0,0 +1,223 @@
+"""
+Compact storage of unfiltered search hits for threshold re-filtering.
+
+When a run keeps its raw hits, the search is performed without identity
+or coverage thresholds and every hit of a sample is saved to
+``<output_dir>/raw/<sample_id>.npz``: query and gene identifiers are
+stored as integer codes into per-file name tables, numeric columns as
+fixed-width arrays, all zlib-compressed. Each run also lists its
+samples in ``<output_dir>/raw/samples.txt``, so files left by an earlier
+run into the same directory are ignored. :func:`refilter_hits` later
+re-applies any thresholds and best-hit selection to these files without
+running the search tool again.
+"""
+
+import os
+import logging
+import numpy as np
+from src.run_blast import HIT_COLUMNS
+
+RAW_DIRNAME = "raw"
+RUN_SAMPLES_NAME = "samples.txt"
+# Alignment coordinates and lengths; identity is kept as float64 so
+# threshold comparisons match the original parse exactly
+_INT_COLUMNS = ["length", "qstart", "qend", "sstart", "send"]
+
+
+def save_raw_hits(hits, path, sample_id, source_file="", ref_lengths=None):
+    """
+    Write unfiltered hits of one sample to a compressed ``.npz`` file.
+
+    Parameters
+    ----------
+    hits : iterable of dict or pandas.DataFrame
+        Normalized hits (keys :data:`src.run_blast.HIT_COLUMNS`).
+    path : str
+        Destination ``.npz`` path.
+    sample_id : str
+        Sample the hits belong to.
+    source_file : str, optional
+        Input FASTA the hits were searched from.
+    ref_lengths : dict, optional
+        Reference gene lengths (see
+        :func:`src.run_blast.get_reference_lengths`), stored per gene so
+        the hits can later be re-filtered by percent coverage.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The hits as a frame with columns ``HIT_COLUMNS`` plus
+        ``ref_length`` (0 where unknown).
+    """
+    import pandas as pd
+    df = hits if isinstance(hits, pd.DataFrame) else pd.DataFrame.from_records(list(hits), columns=HIT_COLUMNS)
+    arrays = {"sample_id": np.array(sample_id), "source_file": np.array(source_file)}
+    for col in ("query", "gene"):
+        codes, names = pd.factorize(df[col].astype(str))
+        arrays[f"{col}_codes"] = codes.astype(np.int32)
+        arrays[f"{col}_names"] = np.asarray(names, dtype=str)
+    lengths = ref_lengths or {}
+    arrays["gene_lengths"] = np.array([lengths.get(g, 0) for g in arrays["gene_names"]], dtype=np.int64)
+    arrays["identity"] = df["identity"].to_numpy(dtype=np.float64)
+    for col in _INT_COLUMNS:
+        arrays[col] = df[col].to_numpy(dtype=np.int32)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".partial.npz"
+    np.savez_compressed(tmp, **arrays)
+    os.replace(tmp, path)
+    return df.assign(ref_length=arrays["gene_lengths"][arrays["gene_codes"]])
+
+
+def load_raw_hits(path):
+    """
+    Read hits saved by :func:`save_raw_hits`.
+
+    Parameters
+    ----------
+    path : str
+        ``.npz`` file path.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Columns ``HIT_COLUMNS`` plus ``ref_length``, ``sample_id`` and
+        ``source_file``;
+        the sample identifier is also kept in ``attrs["sample_id"]`` so it
+        is available for samples without hits.
+    """
+    import pandas as pd
+    with np.load(path, allow_pickle=False) as data:
+        frame = {}
+        for col in HIT_COLUMNS:
+            if col in ("query", "gene"):
+                frame[col] = data[f"{col}_names"][data[f"{col}_codes"]].astype(object)
+            else:
+                frame[col] = data[col]
+        df = pd.DataFrame(frame, columns=HIT_COLUMNS)
+        df["ref_length"] = data["gene_lengths"][data["gene_codes"]] if "gene_lengths" in data else 0
+        df["sample_id"] = str(data["sample_id"])
+        df["source_file"] = str(data["source_file"])
+        df.attrs["sample_id"] = str(data["sample_id"])
+    return df
+
+
+def raw_hits_path(output_dir, sample_id):
+    """
+    Return the raw-hits file of a sample inside an output directory.
+
+    Parameters
+    ----------
+    output_dir : str
+        Run output directory.
+    sample_id : str
+        Sample identifier.
+
+    Returns
+    -------
+    str
+        ``<output_dir>/raw/<sample_id>.npz``.
+    """
+    return os.path.join(output_dir, RAW_DIRNAME, f"{sample_id}.npz")
+
+
+def write_run_samples(raw_dir, sample_ids):
+    """
+    Record the samples of the current run in a raw-hits directory.
+
+    Parameters
+    ----------
+    raw_dir : str
+        Raw-hits directory.
+    sample_ids : iterable of str
+        Samples the run searches, including any skipped because a previous
+        run already completed them.
+
+    Returns
+    -------
+    str
+        Path of the sample list.
+    """
+    os.makedirs(raw_dir, exist_ok=True)
+    path = os.path.join(raw_dir, RUN_SAMPLES_NAME)
+    tmp = path + ".partial"
+    with open(tmp, "w") as fh:
+        fh.writelines(f"{sample_id}\n" for sample_id in sample_ids)
+    os.replace(tmp, path)
+    return path
+
+
+def filter_hits(df, identity, coverage, coverage_mode="bp"):
+    """
+    Apply identity and coverage thresholds to a hit frame.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Hits with ``identity`` and ``length`` columns, plus ``sstart``,
+        ``send`` and ``ref_length`` for percent coverage.
+    identity : float
+        Minimum percent identity.
+    coverage : float
+        Minimum coverage.
+    coverage_mode : {"bp", "percent"}, optional
+        Compare ``coverage`` with the alignment length or with the percent
+        of the reference spanned (default: ``"bp"``). Hits with an unknown
+        reference length fail a percent threshold above zero.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Rows meeting both thresholds.
+    """
+    if coverage_mode == "percent":
+        ref_len = df["ref_length"].to_numpy(dtype=np.float64)
+        span = np.abs(df["send"].to_numpy(dtype=np.float64) - df["sstart"].to_numpy(dtype=np.float64)) + 1
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cov = np.where(ref_len > 0, 100.0 * span / ref_len, 0.0)
+    else:
+        cov = df["length"].to_numpy()
+    mask = (df["identity"].to_numpy() >= identity) & (cov >= coverage)
+    return df[mask].reset_index(drop=True)
+
+
+def refilter_hits(raw_dir, identity, coverage, coverage_mode="bp"):
+    """
+    Re-apply thresholds to all saved raw hits and select the best hits.
+
+    Parameters
+    ----------
+    raw_dir : str
+        Directory of ``.npz`` files written by :func:`save_raw_hits`. Only
+        the samples listed by :func:`write_run_samples` are read; without
+        a list (older runs), every file is.
+    identity : float
+        Minimum percent identity.
+    coverage : float
+        Minimum coverage.
+    coverage_mode : {"bp", "percent"}, optional
+        How ``coverage`` is interpreted (see :func:`filter_hits`).
+
+    Returns
+    -------
+    tuple
+        ``(best_hits, sample_ids)``: a DataFrame with the best hit per
+        ``(sample_id, gene)`` and the list of samples found, including
+        those left without hits.
+    """
+    import pandas as pd
+    from src.gene_detector import select_best_hits
+    if not os.path.isdir(raw_dir):
+        raise FileNotFoundError(f"No raw hits found in {raw_dir}; run with --keep-raw first")
+    listing = os.path.join(raw_dir, RUN_SAMPLES_NAME)
+    if os.path.isfile(listing):
+        with open(listing) as fh:
+            names = [f"{line.strip()}.npz" for line in fh if line.strip()]
+        paths = sorted(p for p in (os.path.join(raw_dir, name) for name in names) if os.path.isfile(p))
+    else:
+        paths = sorted(os.path.join(raw_dir, name) for name in os.listdir(raw_dir) if name.endswith(".npz") and not name.endswith(".partial.npz"))
+    frames = [load_raw_hits(p) for p in paths]
+    sample_ids = [f.attrs["sample_id"] for f in frames]
+    hits = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=HIT_COLUMNS + ["ref_length", "sample_id", "source_file"])
+    best = select_best_hits(filter_hits(hits, identity, coverage, coverage_mode=coverage_mode), keys=("sample_id", "gene"), as_frame=True)
+    logging.info(f"Re-filtered {len(hits)} raw hits from {len(paths)} samples: {len(best)} best hits")
+    return best, sample_ids
@@ -0,0 +1,349 @@
+"""
+Content-addressed on-disk cache of per-sample detection results.
+
+:func:`src.gene_detector.detect_genes` can consult a :class:`ResultCache`
+before launching a search. Entries are keyed on the SHA-256 of the input
+FASTA, the SHA-256 of the database FASTA, the search tool and its
+version, and the identity/coverage thresholds, so a resubmitted assembly
+is answered from disk while any change to its inputs or parameters
+misses. Each entry is a small JSON file; the cache is kept under a size
+limit by evicting the least recently used entries.
+
+Run ``python -m src.result_cache --help`` to inspect or purge a cache.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+from src.utils import file_sha256
+
+# 256 MiB; entries are typically a few KiB each
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+CACHE_DIR_ENV = "ARG_RES_CACHE_DIR"
+
+# Content hashes keyed on (path, size, mtime_ns) so a database is hashed once
+_HASHES = {}
+_HASH_LOCK = threading.Lock()
+
+
+def default_cache_dir():
+    """
+    Return the cache directory used when none is given.
+
+    Returns
+    -------
+    str
+        ``$ARG_RES_CACHE_DIR`` if set, otherwise
+        ``~/.cache/arg_res_detector``.
+    """
+    return os.environ.get(CACHE_DIR_ENV) or os.path.join(os.path.expanduser("~"), ".cache", "arg_res_detector")
+
+
+def content_hash(path):
+    """
+    Return the SHA-256 of a file, memoized until it changes on disk.
+
+    Parameters
+    ----------
+    path : str
+        File path.
+
+    Returns
+    -------
+    str
+        Hexadecimal digest.
+    """
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    digest = _HASHES.get(key)
+    if digest is None:
+        digest = file_sha256(path)
+        with _HASH_LOCK:
+            _HASHES[key] = digest
+    return digest
+
+
+class ResultCache:
+    """
+    Size-bounded LRU cache of detection results stored as JSON files.
+
+    Reads refresh an entry's modification time, which serves as its
+    last-use timestamp for eviction. Writes go through a temporary file
+    and :func:`os.replace`, so concurrent threads or processes sharing a
+    directory never observe partial entries. The total size is scanned
+    once and then tracked in memory, so the directory is only listed
+    again when a write pushes the cache over its limit. The tracked total
+    only counts this process's writes: a pickled copy (e.g. sent to a
+    worker process) rescans on its first write, and the caller that
+    shares a cache between processes should :meth:`evict` once they are
+    done.
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        Cache directory (default: :func:`default_cache_dir`).
+    max_bytes : int, optional
+        Total size the cache is trimmed to when a write exceeds it
+        (default: 256 MiB).
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = int(max_bytes)
+        # Running total of entry sizes; None until the first write scans the directory
+        self._total = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks cannot be pickled, and another process must scan for itself
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_total"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def key(self, input_fasta, db_fasta, tool, identity, coverage, raw=False, coverage_mode="bp", sensitivity=None):
+        """
+        Compute the cache key for a search.
+
+        Parameters
+        ----------
+        input_fasta : str
+            Query FASTA path (hashed by content).
+        db_fasta : str
+            Database FASTA path (hashed by content).
+        tool : str
+            Resolved search tool name.
+        identity : float
+            Minimum percent identity.
+        coverage : float
+            Minimum alignment coverage.
+        raw : bool, optional
+            Key for the unfiltered hits of a search rather than its best
+            hits (default: False).
+        coverage_mode : {"bp", "percent"}, optional
+            How ``coverage`` is interpreted (default: ``"bp"``).
+        sensitivity : str, optional
+            DIAMOND sensitivity mode, when one is set.
+
+        Returns
+        -------
+        str
+            Hexadecimal key.
+        """
+        from src.run_blast import tool_version
+        parts = {
+            "input": content_hash(input_fasta),
+            "db": content_hash(db_fasta),
+            "tool": tool,
+            "tool_version": tool_version(tool),
+            "identity": float(identity),
+            "coverage": float(coverage),
+        }
+        if raw:
+            parts["raw"] = True
+        if coverage_mode != "bp":
+            parts["coverage_mode"] = coverage_mode
+        if sensitivity:
+            parts["sensitivity"] = sensitivity
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, key):
+        """
+        Return the cached hits for ``key``, or ``None`` on a miss.
+
+        Parameters
+        ----------
+        key : str
+            Key from :meth:`key`.
+
+        Returns
+        -------
+        list of dict or None
+            Cached hit records.
+        """
+        path = self._path(key)
+        try:
+            with open(path) as fh:
+                hits = json.load(fh)["hits"]
+        except (OSError, ValueError, KeyError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        logging.info(f"Result cache hit {key[:12]}")
+        return hits
+
+    def put(self, key, hits):
+        """
+        Store hits under ``key`` and trim the cache to ``max_bytes``.
+
+        Eviction, which lists every entry, only runs when the tracked
+        total exceeds the limit.
+
+        Parameters
+        ----------
+        key : str
+            Key from :meth:`key`.
+        hits : list of dict
+            Hit records to cache.
+
+        Returns
+        -------
+        None
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as fh:
+                json.dump({"created": time.time(), "hits": hits}, fh)
+            size = os.path.getsize(tmp)
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        with self._lock:
+            if self._total is None:
+                self._total = sum(s for _, s, _ in self.entries())
+            else:
+                self._total += size - replaced
+            over = self._total > self.max_bytes
+        if over:
+            self.evict()
+
+    def entries(self):
+        """
+        List cache entries, least recently used first.
+
+        Returns
+        -------
+        list of tuple
+            ``(path, size_bytes, last_used)`` per entry.
+        """
+        found = []
+        if not os.path.isdir(self.cache_dir):
+            return found
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".json"):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    found.append((entry.path, st.st_size, st.st_mtime))
+        found.sort(key=lambda e: e[2])
+        return found
+
+    def evict(self, max_bytes=None):
+        """
+        Delete least recently used entries until the cache fits.
+
+        Parameters
+        ----------
+        max_bytes : int, optional
+            Size limit (default: the cache's ``max_bytes``).
+
+        Returns
+        -------
+        int
+            Number of entries removed.
+        """
+        limit = self.max_bytes if max_bytes is None else int(max_bytes)
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for path, size, _ in entries:
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self._total = total
+        return removed
+
+    def purge(self):
+        """
+        Remove every cache entry.
+
+        Returns
+        -------
+        int
+            Number of entries removed.
+        """
+        return self.evict(max_bytes=0)
+
+    def stats(self):
+        """
+        Summarize the cache contents.
+
+        Returns
+        -------
+        dict
+            ``cache_dir``, ``entries``, ``bytes`` and ``max_bytes``.
+        """
+        entries = self.entries()
+        return {
+            "cache_dir": self.cache_dir,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+def main(argv=None):
+    """
+    Command-line interface to inspect, trim or purge a result cache.
+
+    Parameters
+    ----------
+    argv : list of str, optional
+        Arguments (default: ``sys.argv[1:]``).
+
+    Returns
+    -------
+    None
+    """
+    parser = argparse.ArgumentParser(description="Inspect or purge the detection result cache")
+    parser.add_argument("--cache-dir", default=None, help=f"Cache directory (default: ${CACHE_DIR_ENV} or ~/.cache/arg_res_detector)")
+    parser.add_argument("--max-size", type=int, default=DEFAULT_MAX_BYTES, help="Size limit in bytes used by 'trim' (default: 256 MiB)")
+    parser.add_argument("action", choices=["info", "list", "trim", "purge"], help="info: totals; list: entries by last use; trim: evict down to --max-size; purge: remove all entries")
+    args = parser.parse_args(argv)
+    cache = ResultCache(args.cache_dir, max_bytes=args.max_size)
+    if args.action == "info":
+        for name, value in cache.stats().items():
+            print(f"{name}: {value}")
+    elif args.action == "list":
+        for path, size, last_used in cache.entries():
+            print(f"{os.path.basename(path)[:-5]}\t{size}\t{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last_used))}")
+    elif args.action == "trim":
+        print(f"Removed {cache.evict()} entries")
+    else:
+        print(f"Removed {cache.purge()} entries")
+
+
+if __name__ == "__main__":
+    main()
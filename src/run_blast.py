@@ -8,84 +8,658 @@ list-of-dicts structure consumed by the rest of the pipeline.
 """
 import logging
 import os
+import shutil
 import subprocess
+import tempfile
+import threading
+from src.error_handling import SearchFailedError
 try:
     from src.rich_utils import get_progress
     _HAS_RICH = True
 except Exception:
     _HAS_RICH = False
 
+# Tabular output columns requested from DIAMOND/BLAST (parsed by parse_blast_line)
+OUTFMT = "6 qseqid sseqid pident length qstart qend sstart send"
+# Normalized hit keys, in OUTFMT column order
+HIT_COLUMNS = ["query", "gene", "identity", "length", "qstart", "qend", "sstart", "send"]
 
-def run_blast(query_fasta, db_fasta, identity=90, coverage=80, max_targets=10, tool=None, console=None, rich_enabled: bool = True):
+# Process-wide registry: the resolved search tool and the databases already
+# verified/built for it, keyed on the DB FASTA's mtime so edits invalidate them.
+_REGISTRY_LOCK = threading.RLock()
+_UNRESOLVED = object()
+_resolved_tool = _UNRESOLVED
+_prepared_dbs = {}
+_kmer_indexes = {}
+_tool_versions = {}
+_reference_lengths = {}
+
+# Coverage threshold semantics: aligned length in bp/residues, or percent of
+# the reference gene length covered by the alignment
+COVERAGE_MODES = ("bp", "percent")
+REFERENCE_LENGTHS_SUFFIX = ".lengths.tsv"
+
+# DIAMOND tuning presets. block_size is billions of sequence letters per
+# block (DIAMOND needs roughly six times that in GB of RAM) and index_chunks
+# splits the seed index into more passes, trading speed for memory.
+DIAMOND_SENSITIVITIES = ("fast", "mid-sensitive", "sensitive", "more-sensitive", "very-sensitive", "ultra-sensitive")
+DIAMOND_PROFILES = {
+    "fast": {"sensitivity": "fast"},
+    "balanced": {},
+    "sensitive": {"sensitivity": "sensitive"},
+    "low-memory": {"block_size": 0.5, "index_chunks": 8},
+}
+
+
+def run_blast(query_fasta, db_fasta, identity=90, coverage=80, max_targets=10, tool=None, console=None, rich_enabled: bool = True, scratch_dir=None, stream: bool = False, coverage_mode: str = "bp", tool_threads=None, diamond_options=None):
     """
     Run DIAMOND (preferred), BLAST+, or a mock search and parse results.
 
     Parameters
     ----------
     query_fasta : str
-        Path to the query FASTA file.
+        Path to the query FASTA file. gzip/bgzip/zstd-compressed queries
+        are accepted: DIAMOND reads gzip natively, otherwise the query is
+        decompressed into the tool's stdin without a temporary copy.
     db_fasta : str
         Path to the resistance gene database FASTA.
     identity : float, optional
         Minimum percent identity for reported hits (default: 90).
-    coverage : int, optional
-        Minimum alignment length / coverage for reported hits (default: 80).
+    coverage : float, optional
+        Minimum coverage for reported hits, interpreted according to
+        ``coverage_mode`` (default: 80).
     max_targets : int, optional
         Maximum number of target hits to request from the search tool.
     tool : str or None, optional
-        Force a particular tool (e.g. 'diamond' or 'blastn'). When ``None``
-        the function will auto-detect an available search tool.
+        Force a particular tool: ``'diamond'``, ``'blastn'``, ``'blastp'``,
+        ``'kmer'`` (the built-in engine in :mod:`src.kmer_search`) or
+        ``'mock'``. When ``None`` the function will auto-detect an available
+        search tool and fall back to the mock search.
     console : object, optional
         Optional console-like object used to display Rich progress/status.
     rich_enabled : bool, optional
         Whether to attempt Rich-based output when available (default: True).
+    scratch_dir : str or None, optional
+        Directory in which the per-invocation tabular output is created.
+        When ``None`` the ``ARG_RES_TMPDIR`` environment variable is used,
+        falling back to the system temporary directory. The scratch file is
+        removed once it has been parsed.
+    stream : bool, optional
+        When True, read the tool's tabular output from its stdout pipe
+        instead of a scratch file and return a lazy iterator of hits (see
+        :func:`stream_blast_hits`). Default: False.
+    coverage_mode : {"bp", "percent"}, optional
+        ``"bp"`` compares ``coverage`` with the alignment length;
+        ``"percent"`` with the percentage of the reference gene covered,
+        using the length index from :func:`get_reference_lengths`
+        (default: ``"bp"``).
+    tool_threads : int, optional
+        Number of threads the search tool may use (DIAMOND ``--threads``,
+        BLAST+ ``-num_threads``). When ``None`` the tool's own default
+        applies. Ignored by the k-mer and mock searches.
+    diamond_options : dict, optional
+        DIAMOND sensitivity and memory settings from
+        :func:`resolve_diamond_options`; ignored by other tools.
 
     Returns
     -------
-    list of dict
-        Normalized list of hit dictionaries as produced by
-        :func:`parse_blast_results` or by the internal mock search.
+    list of dict or iterator of dict
+        Normalized hit dictionaries as produced by
+        :func:`parse_blast_results` or by the internal mock search. In
+        ``stream`` mode hits are yielded as the tool reports them.
+
+    Raises
+    ------
+    SearchFailedError
+        If DIAMOND/BLAST+ fails (in ``stream`` mode, once the hits it
+        reported have been consumed).
     """
-    out_file = "output/blast_results.tsv"
-    tool = detect_search_tool()
+    tool = tool or resolve_search_tool()
+    if coverage_mode not in COVERAGE_MODES:
+        raise ValueError(f"Unknown coverage mode {coverage_mode!r}; expected one of {', '.join(COVERAGE_MODES)}")
+    ref_lengths = get_reference_lengths(db_fasta) if coverage_mode == "percent" else None
+    if tool == "kmer":
+        from src.kmer_search import kmer_search
+        hits = kmer_search(query_fasta, db_fasta, identity, coverage if ref_lengths is None else 0, max_targets=max_targets, index=get_kmer_index(db_fasta))
+        if ref_lengths is not None:
+            hits = [hit for hit in hits if hit_coverage(hit, ref_lengths) >= coverage]
+        return iter(hits) if stream else hits
+    if tool not in ("diamond", "blastn", "blastp"):
+        if tool != "mock":
+            logging.warning("BLAST/DIAMOND not found, using mock search.")
+        return mock_search(query_fasta, db_fasta)
+    prepare_database(db_fasta, tool)
+    query_args, stdin_fasta = _query_arguments(query_fasta, tool)
     if tool == "diamond":
-        verify_diamond_db(db_fasta)
         cmd = [
             "diamond", "blastx",
-            "-q", query_fasta,
+            *query_args,
             "-d", db_fasta,
-            "-o", out_file,
-            "--outfmt", "6 qseqid sseqid pident length qstart qend sstart send",
-            "--max-target-seqs", str(max_targets)
+            "--outfmt", OUTFMT,
+            "--max-target-seqs", str(max_targets),
+            *diamond_tuning_args(diamond_options)
         ]
-    elif tool in ["blastn", "blastp"]:
-        verify_blast_db(db_fasta, tool)
+        out_flag = "-o"
+    else:
         cmd = [
             tool,
-            "-query", query_fasta,
+            *query_args,
             "-db", db_fasta,
-            "-outfmt", "6 qseqid sseqid pident length qstart qend sstart send",
-            "-max_target_seqs", str(max_targets),
-            "-out", out_file
+            "-outfmt", OUTFMT,
+            "-max_target_seqs", str(max_targets)
         ]
-    else:
-        logging.warning("BLAST/DIAMOND not found, using mock search.")
-        return mock_search(query_fasta, db_fasta)
+        out_flag = "-out"
+    if tool_threads:
+        cmd += ["--threads" if tool == "diamond" else "-num_threads", str(int(tool_threads))]
+    if stream:
+        # Both tools write tabular output to stdout when no output file is given
+        return stream_blast_hits(cmd, identity, coverage, tool=tool, ref_lengths=ref_lengths, stdin_fasta=stdin_fasta)
+    # Each invocation gets its own scratch file so concurrent searches never collide
+    out_file = make_scratch_file(query_fasta, scratch_dir=scratch_dir)
+    cmd += [out_flag, out_file]
     try:
         # If rich progress is available, show a spinner/status via console
         if console is not None and _HAS_RICH and rich_enabled:
             try:
                 with console.status(f"Running {tool} on {os.path.basename(query_fasta)}..."):
-                    subprocess.run(cmd, check=True)
+                    _run_search(cmd, stdin_fasta)
             except Exception:
-                subprocess.run(cmd, check=True)
+                _run_search(cmd, stdin_fasta)
         else:
-            subprocess.run(cmd, check=True)
+            _run_search(cmd, stdin_fasta)
         logging.info(f"{tool} search completed: {out_file}")
-        return parse_blast_results(out_file, identity, coverage)
+        return parse_blast_results(out_file, identity, coverage, ref_lengths=ref_lengths)
+    except Exception as e:
+        logging.error(f"{tool} search failed: {e}")
+        raise SearchFailedError(f"{tool} search failed: {e}") from e
+    finally:
+        try:
+            os.remove(out_file)
+        except OSError:
+            pass
+
+def stream_blast_hits(cmd, identity, coverage, tool=None, ref_lengths=None, stdin_fasta=None):
+    """
+    Run a search command and yield filtered hits from its stdout.
+
+    The tool is started with :class:`subprocess.Popen` and its tabular
+    output is consumed line by line, so hits reach the caller while the
+    search is still running and nothing is written to disk. If the
+    consumer stops early the process is terminated.
+
+    Parameters
+    ----------
+    cmd : list of str
+        Search command writing "outfmt 6" rows to stdout.
+    identity : float
+        Minimum percent identity threshold for accepting hits.
+    coverage : float
+        Minimum alignment length (coverage) in base pairs/residues, or
+        percent reference coverage when ``ref_lengths`` is given.
+    tool : str, optional
+        Tool name used in log messages (defaults to ``cmd[0]``).
+    ref_lengths : dict, optional
+        Reference gene lengths (see :func:`get_reference_lengths`);
+        switches ``coverage`` to percent of the reference length.
+    stdin_fasta : str, optional
+        FASTA file decompressed into the command's stdin while it runs.
+
+    Yields
+    ------
+    dict
+        Hit dictionaries in the same format as :func:`parse_blast_results`.
+
+    Raises
+    ------
+    SearchFailedError
+        After the last hit, if the tool exits with an error or its input
+        cannot be fed, so a failed search is never mistaken for one that
+        found nothing.
+    """
+    tool = tool or cmd[0]
+    proc = None
+    try:
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE if stdin_fasta else None, stdout=subprocess.PIPE, text=True, bufsize=1)
+        feeder = _StdinFeeder(proc, stdin_fasta) if stdin_fasta else None
+        n_hits = 0
+        for line in proc.stdout:
+            hit = parse_blast_line(line)
+            if hit is not None and hit["identity"] >= identity and hit_coverage(hit, ref_lengths) >= coverage:
+                n_hits += 1
+                yield hit
+        proc.stdout.close()
+        if feeder is not None:
+            feeder.check()
+        if proc.wait() != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+        logging.info(f"{tool} search completed: {n_hits} hits streamed")
     except Exception as e:
         logging.error(f"{tool} search failed: {e}")
-        return []
+        raise SearchFailedError(f"{tool} search failed: {e}") from e
+    finally:
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+def resolve_diamond_options(profile=None, sensitivity=None, block_size=None, index_chunks=None):
+    """
+    Resolve DIAMOND tuning settings from a preset and explicit overrides.
+
+    Parameters
+    ----------
+    profile : str, optional
+        One of :data:`DIAMOND_PROFILES` (``fast``, ``balanced``,
+        ``sensitive``, ``low-memory``); ``None`` means ``balanced``.
+    sensitivity : str, optional
+        DIAMOND sensitivity mode from :data:`DIAMOND_SENSITIVITIES`,
+        overriding the profile's.
+    block_size : float, optional
+        ``--block-size`` in billions of letters, overriding the profile's.
+    index_chunks : int, optional
+        ``--index-chunks``, overriding the profile's.
+
+    Returns
+    -------
+    dict
+        Settings with any of the keys ``sensitivity``, ``block_size`` and
+        ``index_chunks``; absent keys keep DIAMOND's defaults.
+
+    Raises
+    ------
+    ValueError
+        For an unknown profile or sensitivity, or a non-positive size.
+    """
+    if profile is not None and profile not in DIAMOND_PROFILES:
+        raise ValueError(f"Unknown DIAMOND profile {profile!r}; expected one of {', '.join(DIAMOND_PROFILES)}")
+    options = dict(DIAMOND_PROFILES.get(profile or "balanced"))
+    overrides = {"sensitivity": sensitivity, "block_size": block_size, "index_chunks": index_chunks}
+    options.update({key: value for key, value in overrides.items() if value is not None})
+    if options.get("sensitivity") not in (None,) + DIAMOND_SENSITIVITIES:
+        raise ValueError(f"Unknown DIAMOND sensitivity {options['sensitivity']!r}; expected one of {', '.join(DIAMOND_SENSITIVITIES)}")
+    if options.get("block_size") is not None and float(options["block_size"]) <= 0:
+        raise ValueError("DIAMOND block size must be positive")
+    if options.get("index_chunks") is not None and int(options["index_chunks"]) < 1:
+        raise ValueError("DIAMOND index chunks must be at least 1")
+    return options
+
+def diamond_tuning_args(options):
+    """
+    Translate :func:`resolve_diamond_options` settings into DIAMOND flags.
+
+    Parameters
+    ----------
+    options : dict or None
+        Settings from :func:`resolve_diamond_options`.
+
+    Returns
+    -------
+    list of str
+        Command-line arguments, e.g. ``["--sensitive", "--block-size",
+        "0.5"]``.
+    """
+    options = options or {}
+    args = []
+    if options.get("sensitivity"):
+        args.append("--" + options["sensitivity"])
+    if options.get("block_size") is not None:
+        args += ["--block-size", f"{float(options['block_size']):g}"]
+    if options.get("index_chunks") is not None:
+        args += ["--index-chunks", str(int(options["index_chunks"]))]
+    return args
+
+def _query_arguments(query_fasta, tool):
+    # Query options for the command line, and the file to pipe into stdin
+    # when the tool cannot read the compressed query itself
+    from src.utils import fasta_compression
+    compression = fasta_compression(query_fasta)
+    if tool == "diamond":
+        return ([], query_fasta) if compression not in (None, "gzip") else (["-q", query_fasta], None)
+    return (["-query", "-"], query_fasta) if compression is not None else (["-query", query_fasta], None)
+
+class _StdinFeeder(threading.Thread):
+    """
+    Decompress a FASTA file into a child process's stdin.
+
+    Runs as a daemon thread so the tool reads its query while the file is
+    being decompressed; nothing is written to disk.
+
+    Parameters
+    ----------
+    proc : subprocess.Popen
+        Process started with ``stdin=subprocess.PIPE``.
+    fasta : str
+        Plain or compressed FASTA path (see :func:`src.utils.open_fasta`).
+    """
+
+    def __init__(self, proc, fasta):
+        super().__init__(daemon=True)
+        self.proc = proc
+        self.fasta = fasta
+        self.error = None
+        self.start()
+
+    def run(self):
+        from src.utils import open_fasta
+        sink = getattr(self.proc.stdin, "buffer", self.proc.stdin)
+        try:
+            with open_fasta(self.fasta, "rb") as fh:
+                shutil.copyfileobj(fh, sink, 1 << 20)
+        except BrokenPipeError:
+            # The tool exited early; its return code reports the failure
+            pass
+        except Exception as e:
+            self.error = e
+        finally:
+            try:
+                self.proc.stdin.close()
+            except OSError:
+                pass
+
+    def check(self):
+        """
+        Wait for the copy to finish and re-raise any decompression error.
+
+        Returns
+        -------
+        None
+        """
+        self.join()
+        if self.error is not None:
+            raise self.error
+
+def _run_search(cmd, stdin_fasta=None):
+    # subprocess.run equivalent that optionally streams a query into stdin
+    if stdin_fasta is None:
+        subprocess.run(cmd, check=True)
+        return
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+    feeder = _StdinFeeder(proc, stdin_fasta)
+    returncode = proc.wait()
+    feeder.check()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
+
+def make_scratch_file(query_fasta, scratch_dir=None, suffix=".tsv"):
+    """
+    Create a unique scratch file for a single search invocation.
+
+    Each call returns a fresh path so concurrent searches (for example the
+    worker threads of :func:`src.gene_detector.batch_detect_genes`) never
+    write to or parse the same file. The caller owns the file and is
+    responsible for removing it.
+
+    Parameters
+    ----------
+    query_fasta : str
+        Query FASTA path; its basename is used as the file name prefix to
+        make scratch files easy to attribute while a search is running.
+    scratch_dir : str or None, optional
+        Directory in which to create the file. Defaults to
+        ``$ARG_RES_TMPDIR`` or the system temporary directory.
+    suffix : str, optional
+        File name suffix (default: ``.tsv``).
+
+    Returns
+    -------
+    str
+        Path to the newly created (empty) scratch file.
+    """
+    scratch_dir = scratch_dir or os.environ.get("ARG_RES_TMPDIR") or None
+    if scratch_dir:
+        os.makedirs(scratch_dir, exist_ok=True)
+    prefix = os.path.splitext(os.path.basename(query_fasta))[0] + "."
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=suffix, dir=scratch_dir)
+    os.close(fd)
+    return path
+
+def resolve_search_tool(refresh: bool = False):
+    """
+    Return the search tool for this process, detecting it only once.
+
+    The first call runs :func:`detect_search_tool`; later calls return the
+    cached answer so batch runs do not rescan ``PATH`` for every sample.
+
+    Parameters
+    ----------
+    refresh : bool, optional
+        Force a new PATH lookup (default: False).
+
+    Returns
+    -------
+    str or None
+        Same values as :func:`detect_search_tool`.
+    """
+    global _resolved_tool
+    if refresh or _resolved_tool is _UNRESOLVED:
+        with _REGISTRY_LOCK:
+            if refresh or _resolved_tool is _UNRESOLVED:
+                _resolved_tool = detect_search_tool()
+    return _resolved_tool
+
+def prepare_database(db_fasta, tool):
+    """
+    Verify (and build if needed) the search database once per process.
+
+    The database for ``(db_fasta, tool)`` is checked the first time it is
+    requested and again only when the FASTA's modification time changes.
+    Building is serialized with a lock so concurrent worker threads never
+    race ``diamond makedb``/``makeblastdb``.
+
+    Parameters
+    ----------
+    db_fasta : str
+        Path to the database FASTA.
+    tool : str
+        ``'diamond'``, ``'blastn'`` or ``'blastp'``.
+
+    Returns
+    -------
+    None
+    """
+    key = (os.path.abspath(db_fasta), tool)
+    mtime = os.path.getmtime(db_fasta)
+    if _prepared_dbs.get(key) == mtime:
+        return
+    with _REGISTRY_LOCK:
+        if _prepared_dbs.get(key) == mtime:
+            return
+        if tool == "diamond":
+            verify_diamond_db(db_fasta)
+        else:
+            verify_blast_db(db_fasta, tool)
+        _prepared_dbs[key] = mtime
+
+def get_kmer_index(db_fasta):
+    """
+    Return the process-wide :class:`~src.kmer_search.KmerIndex` for a DB.
+
+    The index is built on first use and rebuilt when the FASTA's
+    modification time changes.
+
+    Parameters
+    ----------
+    db_fasta : str
+        Path to the database FASTA.
+
+    Returns
+    -------
+    KmerIndex
+        Index shared by all searches against ``db_fasta``.
+    """
+    from src.kmer_search import KmerIndex
+    key = os.path.abspath(db_fasta)
+    mtime = os.path.getmtime(db_fasta)
+    cached = _kmer_indexes.get(key)
+    if cached is None or cached[0] != mtime:
+        with _REGISTRY_LOCK:
+            cached = _kmer_indexes.get(key)
+            if cached is None or cached[0] != mtime:
+                cached = (mtime, KmerIndex.from_fasta(db_fasta))
+                _kmer_indexes[key] = cached
+    return cached[1]
+
+def get_reference_lengths(db_fasta):
+    """
+    Return the length of every reference sequence in a database FASTA.
+
+    The lengths are read from ``<db_fasta>.lengths.tsv``, which is written
+    next to the FASTA (and its DIAMOND/BLAST database files) on first use
+    and rebuilt when it is older than the FASTA. The parsed mapping is
+    kept for the rest of the process, so percent coverage costs one dict
+    lookup per hit.
+
+    Parameters
+    ----------
+    db_fasta : str
+        Path to the database FASTA.
+
+    Returns
+    -------
+    dict
+        Sequence identifier (first word of the header) to length.
+    """
+    key = os.path.abspath(db_fasta)
+    mtime = os.path.getmtime(db_fasta)
+    cached = _reference_lengths.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with _REGISTRY_LOCK:
+        cached = _reference_lengths.get(key)
+        if cached is None or cached[0] != mtime:
+            index_path = db_fasta + REFERENCE_LENGTHS_SUFFIX
+            if not os.path.exists(index_path) or _is_stale([index_path], db_fasta):
+                lengths = _scan_reference_lengths(db_fasta)
+                tmp = None
+                try:
+                    # A private temp file per writer: concurrent processes or
+                    # runs on the same DB never publish each other's partial file
+                    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(index_path) or ".", prefix=os.path.basename(index_path) + ".", suffix=".tmp")
+                    with os.fdopen(fd, "w") as fh:
+                        fh.writelines(f"{gene}\t{length}\n" for gene, length in lengths.items())
+                    os.replace(tmp, index_path)
+                    logging.info(f"Reference length index written: {index_path}")
+                except OSError as e:
+                    if tmp is not None and os.path.exists(tmp):
+                        os.remove(tmp)
+                    # A read-only DB directory still works, the index is just not persisted
+                    logging.warning(f"Could not write reference length index {index_path}: {e}")
+            else:
+                with open(index_path) as fh:
+                    lengths = {gene: int(length) for gene, length in (line.rstrip("\n").split("\t") for line in fh if line.strip())}
+            cached = (mtime, lengths)
+            _reference_lengths[key] = cached
+    return cached[1]
+
+def _scan_reference_lengths(db_fasta):
+    # Single pass over the FASTA; identifiers match sseqid (first header word)
+    lengths = {}
+    gene = None
+    with open(db_fasta) as fh:
+        for line in fh:
+            if line.startswith(">"):
+                gene = line[1:].split(None, 1)[0] if line[1:].strip() else ""
+                lengths[gene] = 0
+            elif gene is not None:
+                lengths[gene] += len(line.strip())
+    return lengths
+
+def hit_coverage(hit, ref_lengths=None):
+    """
+    Return the coverage value of one hit for threshold comparison.
+
+    Parameters
+    ----------
+    hit : dict
+        Normalized hit.
+    ref_lengths : dict, optional
+        Reference gene lengths. When given, coverage is the percentage of
+        the reference spanned by the alignment (``sstart``..``send``);
+        otherwise the alignment length.
+
+    Returns
+    -------
+    float
+        Coverage; ``0.0`` for genes missing from ``ref_lengths``.
+    """
+    if ref_lengths is None:
+        return hit["length"]
+    ref_len = ref_lengths.get(hit["gene"])
+    if not ref_len:
+        return 0.0
+    return 100.0 * (abs(hit["send"] - hit["sstart"]) + 1) / ref_len
+
+def coverage_values(df, ref_lengths=None):
+    """
+    Vectorized :func:`hit_coverage` over a hit table.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Hits with ``length``, ``gene``, ``sstart`` and ``send`` columns.
+    ref_lengths : dict, optional
+        Reference gene lengths; switches to percent reference coverage.
+
+    Returns
+    -------
+    numpy.ndarray
+        Coverage per row.
+    """
+    if ref_lengths is None:
+        return df["length"].to_numpy()
+    import numpy as np
+    ref_len = df["gene"].map(ref_lengths).to_numpy(dtype="float64")
+    span = np.abs(df["send"].to_numpy(dtype="float64") - df["sstart"].to_numpy(dtype="float64")) + 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = 100.0 * span / ref_len
+    return np.nan_to_num(pct, nan=0.0, posinf=0.0)
+
+def reset_search_registry():
+    """
+    Forget the resolved tool, prepared databases and cached k-mer indexes.
+
+    Returns
+    -------
+    None
+    """
+    global _resolved_tool
+    with _REGISTRY_LOCK:
+        _resolved_tool = _UNRESOLVED
+        _prepared_dbs.clear()
+        _kmer_indexes.clear()
+        _tool_versions.clear()
+        _reference_lengths.clear()
+
+def tool_version(tool):
+    """
+    Return a version string for a search tool, queried once per process.
+
+    Parameters
+    ----------
+    tool : str
+        ``'diamond'``, ``'blastn'``, ``'blastp'``, ``'kmer'`` or ``'mock'``.
+
+    Returns
+    -------
+    str
+        First line of the tool's version output, a fixed identifier for
+        the built-in engines, or ``'unknown'`` if it cannot be queried.
+    """
+    if tool not in _tool_versions:
+        if tool == "kmer":
+            from src.kmer_search import DEFAULT_K
+            version = f"builtin-kmer-k{DEFAULT_K}"
+        elif tool in ("diamond", "blastn", "blastp"):
+            cmd = ["diamond", "version"] if tool == "diamond" else [tool, "-version"]
+            try:
+                out = subprocess.run(cmd, capture_output=True, text=True, timeout=30).stdout.strip()
+                version = out.splitlines()[0] if out else "unknown"
+            except Exception:
+                version = "unknown"
+        else:
+            version = str(tool)
+        with _REGISTRY_LOCK:
+            _tool_versions[tool] = version
+    return _tool_versions[tool]
 
 def detect_search_tool():
     """
@@ -110,7 +684,10 @@ def detect_search_tool():
 
 def verify_blast_db(db_fasta, tool):
     """
-    Ensure a BLAST+ database exists for ``db_fasta`` and create it if not.
+    Ensure an up-to-date BLAST+ database exists for ``db_fasta``.
+
+    The database is (re)built with ``makeblastdb`` when its files are
+    missing or older than the FASTA.
 
     Parameters
     ----------
@@ -129,15 +706,18 @@ def verify_blast_db(db_fasta, tool):
         If ``makeblastdb`` fails when invoked.
     """
     db_files = [db_fasta + ext for ext in [".nin", ".nhr", ".nsq"]] if tool == "blastn" else [db_fasta + ext for ext in [".pin", ".phr", ".psq"]]
-    if not all(os.path.exists(f) for f in db_files):
-        logging.info(f"BLAST DB not found for {db_fasta}, creating with makeblastdb.")
+    if not all(os.path.exists(f) for f in db_files) or _is_stale(db_files, db_fasta):
+        logging.info(f"BLAST DB not found or outdated for {db_fasta}, creating with makeblastdb.")
         db_type = "nucl" if tool == "blastn" else "prot"
         cmd = ["makeblastdb", "-in", db_fasta, "-dbtype", db_type]
         subprocess.run(cmd, check=True)
 
 def verify_diamond_db(db_fasta):
     """
-    Ensure a DIAMOND database exists for ``db_fasta`` and create it if not.
+    Ensure an up-to-date DIAMOND database exists for ``db_fasta``.
+
+    The ``.dmnd`` file is (re)built when it is missing or older than the
+    FASTA.
 
     Parameters
     ----------
@@ -149,11 +729,16 @@ def verify_diamond_db(db_fasta):
     None
     """
     dmnd_file = db_fasta + ".dmnd"
-    if not os.path.exists(dmnd_file):
-        logging.info(f"DIAMOND DB not found for {db_fasta}, creating with diamond makedb.")
+    if not os.path.exists(dmnd_file) or _is_stale([dmnd_file], db_fasta):
+        logging.info(f"DIAMOND DB not found or outdated for {db_fasta}, creating with diamond makedb.")
         cmd = ["diamond", "makedb", "--in", db_fasta, "-d", db_fasta]
         subprocess.run(cmd, check=True)
 
+def _is_stale(db_files, db_fasta):
+    # A built database older than its source FASTA must be rebuilt
+    source_mtime = os.path.getmtime(db_fasta)
+    return any(os.path.getmtime(f) < source_mtime for f in db_files)
+
 def is_tool_installed(tool_name):
     """
     Check whether an executable is available on the system PATH.
@@ -171,48 +756,108 @@ def is_tool_installed(tool_name):
     from shutil import which
     return which(tool_name) is not None
 
-def parse_blast_results(tsv_path, identity, coverage):
+def parse_blast_results(tsv_path, identity, coverage, as_frame: bool = False, ref_lengths=None):
     """
     Parse tabular BLAST/DIAMOND output into a list of result dictionaries.
 
+    The file is read column-wise by :func:`read_blast_table` and the
+    identity/coverage thresholds are applied as vectorized masks.
+
     Parameters
     ----------
     tsv_path : str
         Path to the tabular output file in BLAST/DIAMOND "outfmt 6" format.
     identity : float
         Minimum percent identity threshold for accepting hits.
-    coverage : int
-        Minimum alignment length (coverage) in base pairs/residues.
+    coverage : float
+        Minimum alignment length (coverage) in base pairs/residues, or
+        percent reference coverage when ``ref_lengths`` is given.
+    as_frame : bool, optional
+        Return the filtered :class:`pandas.DataFrame` instead of a list of
+        dicts (default: False).
+    ref_lengths : dict, optional
+        Reference gene lengths (see :func:`get_reference_lengths`).
 
     Returns
     -------
-    list of dict
-        Each dict contains keys: ``query``, ``gene``, ``identity``, ``length``,
-        ``qstart``, ``qend``, ``sstart``, ``send``.
+    list of dict or pandas.DataFrame
+        Each dict (or row) contains keys: ``query``, ``gene``, ``identity``,
+        ``length``, ``qstart``, ``qend``, ``sstart``, ``send``.
     """
-    results = []
     if not os.path.exists(tsv_path):
-        return results
-    with open(tsv_path) as f:
-        for line in f:
-            parts = line.strip().split('\t')
-            if len(parts) < 8:
-                continue
-            qseqid, sseqid, pident, length, qstart, qend, sstart, send = parts[:8]
-            pident = float(pident)
-            length = int(length)
-            if pident >= identity and length >= coverage:
-                results.append({
-                    "query": qseqid,
-                    "gene": sseqid,
-                    "identity": pident,
-                    "length": length,
-                    "qstart": int(qstart),
-                    "qend": int(qend),
-                    "sstart": int(sstart),
-                    "send": int(send)
-                })
-    return results
+        return read_blast_table(None) if as_frame else []
+    df = read_blast_table(tsv_path, identity, coverage, ref_lengths=ref_lengths)
+    if as_frame:
+        return df
+    # Column-wise tolist() yields native Python values and is much faster than to_dict("records")
+    return [dict(zip(HIT_COLUMNS, row)) for row in zip(*(df[col].tolist() for col in HIT_COLUMNS))]
+
+def read_blast_table(source, identity=0, coverage=0, ref_lengths=None):
+    """
+    Read "outfmt 6" rows into a typed DataFrame and filter them.
+
+    Parameters
+    ----------
+    source : str, file-like or None
+        Path or open handle with tabular output. ``None`` returns an empty
+        table with the expected columns and dtypes.
+    identity : float, optional
+        Minimum percent identity threshold (default: 0).
+    coverage : float, optional
+        Minimum alignment length threshold (default: 0), or percent
+        reference coverage when ``ref_lengths`` is given.
+    ref_lengths : dict, optional
+        Reference gene lengths (see :func:`get_reference_lengths`).
+
+    Returns
+    -------
+    pandas.DataFrame
+        Columns :data:`HIT_COLUMNS` with string IDs, float ``identity`` and
+        integer coordinates. Rows with fewer than eight fields are dropped.
+    """
+    import pandas as pd
+    dtypes = {col: ("float64" if col not in ("query", "gene") else str) for col in HIT_COLUMNS}
+    if source is None:
+        df = pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in dtypes.items()})
+    else:
+        try:
+            # Numeric columns are read as floats so short rows surface as NaN
+            df = pd.read_csv(source, sep="\t", header=None, names=HIT_COLUMNS, usecols=range(len(HIT_COLUMNS)), dtype=dtypes)
+        except pd.errors.EmptyDataError:
+            return read_blast_table(None)
+        df = df[df["send"].notna().to_numpy()]
+        mask = (df["identity"].to_numpy() >= identity) & (coverage_values(df, ref_lengths) >= coverage)
+        df = df[mask].reset_index(drop=True)
+    return df.astype({col: "int64" for col in HIT_COLUMNS[3:]})
+
+def parse_blast_line(line):
+    """
+    Parse one "outfmt 6" row into a hit dictionary.
+
+    Parameters
+    ----------
+    line : str
+        A tab-separated row with at least the eight :data:`OUTFMT` columns.
+
+    Returns
+    -------
+    dict or None
+        The normalized hit, or ``None`` for short or blank lines.
+    """
+    parts = line.strip().split('\t')
+    if len(parts) < 8:
+        return None
+    qseqid, sseqid, pident, length, qstart, qend, sstart, send = parts[:8]
+    return {
+        "query": qseqid,
+        "gene": sseqid,
+        "identity": float(pident),
+        "length": int(length),
+        "qstart": int(qstart),
+        "qend": int(qend),
+        "sstart": int(sstart),
+        "send": int(send)
+    }
 
 def mock_search(query_fasta, db_fasta):
     """
@@ -9,7 +9,7 @@ import time and validate external files robustly.
 
 import os
 import logging
-from Bio import SeqIO
+import threading
 
 try:
     from src.rich_utils import setup_rich_logging, get_console
@@ -60,24 +60,75 @@ def setup_logging(quiet: bool = False, log_dir: str = "output/logs"):
         ]
     )
 
-def validate_fasta(filepath):
+# Characters accepted as evidence of a nucleotide sequence, and whitespace
+# ignored inside sequence lines (newlines included)
+_NUCLEOTIDE_BYTES = b"ACGTNacgtn"
+_SEQUENCE_WHITESPACE = b" \t\r\n\v\f"
+
+# Recognized FASTA file extensions, optionally followed by a compression
+# suffix; bgzip output is multi-member gzip and reads with the gzip module
+FASTA_EXTENSIONS = (".fasta", ".fa", ".fna", ".fas")
+COMPRESSION_EXTENSIONS = {".gz": "gzip", ".bgz": "gzip", ".zst": "zstd"}
+# Rough expansion factor of compressed nucleotide FASTA, used to compare
+# compressed and plain inputs when scheduling work
+COMPRESSION_RATIO_ESTIMATE = 4
+
+# Process-wide validation results keyed on (absolute path, size, mtime), so
+# batch, per-sample and pipeline checks of the same file scan it only once
+_VALIDATION_CACHE = {}
+_VALIDATION_CACHE_MAX = 65536
+_VALIDATION_LOCK = threading.Lock()
+
+# Memoized gene-to-class maps: requested path -> resolved path, and
+# resolved path -> ((size, mtime), mapping)
+_GENE_MAP_PATHS = {}
+_GENE_MAP_CACHE = {}
+_GENE_MAP_LOCK = threading.Lock()
+
+
+def _resolve_project_path(p):
+    # Try the path as given
+    if os.path.exists(p):
+        return p
+    # Try relative to project root (one level up from src)
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    candidate = os.path.join(project_root, p)
+    if os.path.exists(candidate):
+        return candidate
+    # Try basename in project root
+    candidate2 = os.path.join(project_root, os.path.basename(p))
+    if os.path.exists(candidate2):
+        return candidate2
+    return p
+
+def validate_fasta(filepath, return_stats: bool = False, use_cache: bool = True):
     """
     Validate that a path points to a readable FASTA with plausible sequences.
 
     The function attempts several candidate locations for the provided
     path (the path as given, relative to the project root, and the basename
-    in the project root) before raising a ``MissingFileError``.
+    in the project root) before raising a ``MissingFileError``. The file is
+    checked in a single streaming pass by :func:`scan_fasta`, so memory use
+    does not grow with the size of the assembly. Outcomes are cached per
+    process on ``(path, size, mtime)``; a file that has not changed is not
+    scanned again.
 
     Parameters
     ----------
     filepath : str
         Path to the FASTA file to validate.
+    return_stats : bool, optional
+        When True, return the statistics collected by :func:`scan_fasta`
+        instead of ``True`` (default: False).
+    use_cache : bool, optional
+        Reuse a previous result for an unchanged file (default: True).
 
     Returns
     -------
-    bool
+    bool or dict
         ``True`` when the file appears to be a valid FASTA with at least one
-        reasonable sequence.
+        reasonable sequence, or the ``{"records", "total_length"}`` stats when
+        ``return_stats`` is set.
 
     Raises
     ------
@@ -89,38 +140,287 @@ def validate_fasta(filepath):
     """
     from src.error_handling import CorruptedInputError, MissingFileError
 
-    def _resolve_path(p):
-        # Try the path as given
-        if os.path.exists(p):
-            return p
-        # Try relative to project root (one level up from src)
-        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-        candidate = os.path.join(project_root, p)
-        if os.path.exists(candidate):
-            return candidate
-        # Try basename in project root
-        candidate2 = os.path.join(project_root, os.path.basename(p))
-        if os.path.exists(candidate2):
-            return candidate2
-        return p
-
-    filepath = _resolve_path(filepath)
+    filepath = _resolve_project_path(filepath)
     if not os.path.exists(filepath):
         raise MissingFileError(f"File not found: {filepath}")
+    st = os.stat(filepath)
+    key = (os.path.abspath(filepath), st.st_size, st.st_mtime_ns)
+    outcome = _VALIDATION_CACHE.get(key) if use_cache else None
+    if outcome is None:
+        try:
+            outcome = scan_fasta(filepath)
+        except Exception as e:
+            outcome = CorruptedInputError(f"FASTA validation failed: {e}")
+        with _VALIDATION_LOCK:
+            if len(_VALIDATION_CACHE) >= _VALIDATION_CACHE_MAX:
+                _VALIDATION_CACHE.pop(next(iter(_VALIDATION_CACHE)))
+            _VALIDATION_CACHE[key] = outcome
+    if isinstance(outcome, Exception):
+        raise CorruptedInputError(str(outcome))
+    return dict(outcome) if return_stats else True
+
+def clear_validation_cache():
+    """
+    Drop all cached :func:`validate_fasta` outcomes.
+
+    Returns
+    -------
+    None
+    """
+    with _VALIDATION_LOCK:
+        _VALIDATION_CACHE.clear()
+
+def scan_fasta(filepath, chunk_size: int = 1 << 20):
+    """
+    Check a FASTA file chunk by chunk and collect basic statistics.
+
+    The scanner works on raw bytes in constant memory: sequence blocks
+    between headers are stripped of whitespace and checked with
+    ``bytes.translate`` rather than being materialized as records. Every
+    record must contain at least one nucleotide letter (A/C/G/T/N).
+    Compressed files are decompressed on the fly (see :func:`open_fasta`).
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the FASTA file.
+    chunk_size : int, optional
+        Number of bytes read per chunk (default: 1 MiB).
+
+    Returns
+    -------
+    dict
+        ``{"records": int, "total_length": int}`` where ``total_length``
+        counts sequence characters excluding whitespace.
+
+    Raises
+    ------
+    CorruptedInputError
+        If the file is empty, has sequence data before the first header,
+        or contains a record without nucleotide letters.
+    """
+    from src.error_handling import CorruptedInputError
+
+    def _check_record():
+        # If sequence contains no valid nucleotide letters, treat as corrupted
+        if records and not record_valid:
+            raise CorruptedInputError("FASTA sequences do not appear to be valid nucleotides.")
+
+    records = 0
+    total_length = 0
+    record_valid = False
+    in_header = False
+    at_line_start = True
+    with open_fasta(filepath, "rb") as fh:
+        while True:
+            chunk = fh.read(chunk_size)
+            if not chunk:
+                break
+            pos = 0
+            n = len(chunk)
+            while pos < n:
+                if in_header:
+                    nl = chunk.find(b"\n", pos)
+                    if nl == -1:
+                        pos = n
+                        continue
+                    in_header = False
+                    at_line_start = True
+                    pos = nl + 1
+                    continue
+                if at_line_start and chunk[pos] == 0x3E:  # '>'
+                    _check_record()
+                    records += 1
+                    record_valid = False
+                    in_header = True
+                    pos += 1
+                    continue
+                # Sequence block: everything up to the next header line
+                nxt = chunk.find(b"\n>", pos)
+                end = n if nxt == -1 else nxt + 1
+                block = chunk[pos:end].translate(None, _SEQUENCE_WHITESPACE)
+                if block:
+                    if not records:
+                        raise CorruptedInputError("FASTA file has sequence data before the first header.")
+                    total_length += len(block)
+                    if not record_valid:
+                        record_valid = len(block.translate(None, _NUCLEOTIDE_BYTES)) < len(block)
+                at_line_start = chunk[end - 1] == 0x0A
+                pos = end
+    if not records:
+        raise CorruptedInputError("FASTA file is empty or invalid.")
+    _check_record()
+    return {"records": records, "total_length": total_length}
+
+def fasta_compression(filepath):
+    """
+    Return the compression format implied by a FASTA file name.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the FASTA file.
+
+    Returns
+    -------
+    str or None
+        ``"gzip"`` for ``.gz``/``.bgz``, ``"zstd"`` for ``.zst``, or ``None``
+        for an uncompressed file.
+    """
+    return COMPRESSION_EXTENSIONS.get(os.path.splitext(filepath)[1].lower())
+
+def is_fasta_file(filepath):
+    """
+    Check whether a file name has a FASTA extension.
+
+    Parameters
+    ----------
+    filepath : str
+        File name or path.
+
+    Returns
+    -------
+    bool
+        True for one of :data:`FASTA_EXTENSIONS`, optionally followed by a
+        compression suffix from :data:`COMPRESSION_EXTENSIONS`.
+    """
+    name = filepath.lower()
+    stem, ext = os.path.splitext(name)
+    if ext in COMPRESSION_EXTENSIONS:
+        name = stem
+    return name.endswith(FASTA_EXTENSIONS)
+
+def fasta_sample_id(filepath):
+    """
+    Derive a sample identifier from a FASTA path.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the FASTA file.
+
+    Returns
+    -------
+    str
+        The basename without compression and FASTA extensions, e.g.
+        ``"s1"`` for ``reads/s1.fna.gz``.
+    """
+    stem = os.path.basename(filepath)
+    if fasta_compression(stem) is not None:
+        stem = os.path.splitext(stem)[0]
+    return os.path.splitext(stem)[0]
+
+def open_fasta(filepath, mode: str = "rt"):
+    """
+    Open a plain or compressed FASTA file for streaming reads.
+
+    The file is decompressed incrementally; no decompressed copy is
+    written to disk. zstd input needs the optional ``zstandard`` package.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the FASTA file.
+    mode : {"rt", "rb"}, optional
+        Text or binary read mode (default: ``"rt"``).
+
+    Returns
+    -------
+    file object
+        A readable file object; use it as a context manager.
+
+    Raises
+    ------
+    ImportError
+        If the file is zstd-compressed and ``zstandard`` is not installed.
+    """
+    compression = fasta_compression(filepath)
+    if compression == "gzip":
+        import gzip
+        return gzip.open(filepath, mode)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("Reading .zst FASTA files requires the 'zstandard' package (pip install zstandard)") from e
+        return zstandard.open(filepath, mode)
+    return open(filepath, mode)
+
+def estimate_fasta_size(filepath, size=None):
+    """
+    Estimate the uncompressed size of a FASTA file from its metadata.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the FASTA file.
+    size : int, optional
+        On-disk size if already known (saves an ``os.stat``).
+
+    Returns
+    -------
+    int
+        The on-disk size, multiplied by :data:`COMPRESSION_RATIO_ESTIMATE`
+        for compressed files.
+    """
+    if size is None:
+        size = os.path.getsize(filepath)
+    return size * COMPRESSION_RATIO_ESTIMATE if fasta_compression(filepath) else size
+
+def find_fasta_files(folder):
+    """
+    Recursively discover FASTA files below a directory.
+
+    A single ``os.scandir`` pass collects every file accepted by
+    :func:`is_fasta_file` together with its size. Files are returned
+    largest first (see :func:`estimate_fasta_size`) so that the longest
+    searches start early and do not end up as the tail of a parallel
+    batch.
+
+    Parameters
+    ----------
+    folder : str
+        Directory to search.
+
+    Returns
+    -------
+    list of str
+        FASTA paths ordered by decreasing estimated size, ties broken by
+        path.
+    """
+    found = []
+    pending = [folder]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif entry.is_file() and is_fasta_file(entry.name):
+                            found.append((-estimate_fasta_size(entry.path, entry.stat().st_size), entry.path))
+                    except OSError as e:
+                        logging.warning(f"Skipping {entry.path}: {e}")
+        except OSError as e:
+            logging.warning(f"Cannot scan directory: {e}")
+    return [path for _, path in sorted(found)]
+
+def available_cpus():
+    """
+    Return the number of CPUs this process may run on.
+
+    Honours CPU affinity (e.g. ``taskset`` or container CPU sets) where the
+    platform reports it, falling back to ``os.cpu_count()``.
+
+    Returns
+    -------
+    int
+        Usable CPU count, at least 1.
+    """
     try:
-        records = list(SeqIO.parse(filepath, "fasta"))
-        if not records:
-            raise CorruptedInputError("FASTA file is empty or invalid.")
-        # Basic sanity check: ensure sequences look like nucleotides (A/C/G/T/N)
-        valid_chars = set(list("ACGTNacgtn"))
-        for rec in records:
-            seq_chars = set(str(rec.seq))
-            # If sequence contains no valid nucleotide letters, treat as corrupted
-            if seq_chars.isdisjoint(valid_chars):
-                raise CorruptedInputError("FASTA sequences do not appear to be valid nucleotides.")
-        return True
-    except Exception as e:
-        raise CorruptedInputError(f"FASTA validation failed: {e}")
+        return max(1, len(os.sched_getaffinity(0)))
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
 
 def format_table(rows, headers):
     """
@@ -142,48 +442,130 @@ def format_table(rows, headers):
     df = pd.DataFrame(rows)
     return df.to_string(index=False)
 
-def read_gene_class_map(map_path):
+def resolve_gene_map_path(p):
+    """
+    Locate a gene-to-class map CSV.
+
+    Tries the path as given, relative to the project root (also with a
+    leading ``AntibioticResistanceGeneDetector/`` stripped), and the
+    basename in the project root.
+
+    Parameters
+    ----------
+    p : str
+        Requested map path.
+
+    Returns
+    -------
+    str
+        The first existing candidate, or ``p`` unchanged.
+    """
+    if os.path.exists(p):
+        return p
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    candidate = os.path.join(project_root, p)
+    if os.path.exists(candidate):
+        return candidate
+    # Sometimes callers prefix with project folder; strip that
+    # Handle possible prefix using either separator
+    prefix = 'AntibioticResistanceGeneDetector' + os.sep
+    alt_prefix = 'AntibioticResistanceGeneDetector' + '/'
+    if p.startswith(prefix):
+        stripped = p.split(os.sep, 1)[1]
+        candidate2 = os.path.join(project_root, stripped)
+        if os.path.exists(candidate2):
+            return candidate2
+    if p.startswith(alt_prefix):
+        stripped = p.split('/', 1)[1]
+        candidate2 = os.path.join(project_root, stripped)
+        if os.path.exists(candidate2):
+            return candidate2
+    candidate3 = os.path.join(project_root, os.path.basename(p))
+    if os.path.exists(candidate3):
+        return candidate3
+    return p
+
+def read_gene_class_map(map_path, use_cache: bool = True):
     """
     Read a gene-to-class mapping CSV and return a lookup dictionary.
 
+    Resolved paths and parsed maps are memoized for the life of the process
+    (including a long-running job worker). A cached map is reused until the
+    CSV's size or modification time changes, so repeated calls cost a
+    single ``os.stat``.
+
     Parameters
     ----------
     map_path : str
         Path to the CSV file containing columns ``gene`` and ``class``.
+    use_cache : bool, optional
+        Reuse a previously parsed map for an unchanged file (default: True).
 
     Returns
     -------
     dict
-        Mapping from gene identifier to antibiotic class.
+        Mapping from gene identifier to antibiotic class. The cached dict is
+        shared between callers and must not be modified.
     """
     import pandas as pd
 
-    def _resolve_map(p):
-        if os.path.exists(p):
-            return p
-        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-        candidate = os.path.join(project_root, p)
-        if os.path.exists(candidate):
-            return candidate
-        # Sometimes callers prefix with project folder; strip that
-        # Handle possible prefix using either separator
-        prefix = 'AntibioticResistanceGeneDetector' + os.sep
-        alt_prefix = 'AntibioticResistanceGeneDetector' + '/'
-        if p.startswith(prefix):
-            stripped = p.split(os.sep, 1)[1]
-            candidate2 = os.path.join(project_root, stripped)
-            if os.path.exists(candidate2):
-                return candidate2
-        if p.startswith(alt_prefix):
-            stripped = p.split('/', 1)[1]
-            candidate2 = os.path.join(project_root, stripped)
-            if os.path.exists(candidate2):
-                return candidate2
-        candidate3 = os.path.join(project_root, os.path.basename(p))
-        if os.path.exists(candidate3):
-            return candidate3
-        return p
+    resolved = _GENE_MAP_PATHS.get(map_path) if use_cache else None
+    try:
+        st = os.stat(resolved) if resolved else None
+    except OSError:
+        st = None
+    if st is None:
+        resolved = resolve_gene_map_path(map_path)
+        st = os.stat(resolved) if os.path.exists(resolved) else None
+    version = (st.st_size, st.st_mtime_ns) if st is not None else None
+    cached = _GENE_MAP_CACHE.get(resolved) if use_cache else None
+    if cached is not None and version is not None and cached[0] == version:
+        return cached[1]
+    df = pd.read_csv(resolved)
+    mapping = dict(zip(df['gene'], df['class']))
+    with _GENE_MAP_LOCK:
+        _GENE_MAP_PATHS[map_path] = resolved
+        _GENE_MAP_CACHE[resolved] = (version, mapping)
+    return mapping
+
+def clear_gene_class_map_cache():
+    """
+    Drop all memoized gene-to-class maps and resolved map paths.
+
+    Returns
+    -------
+    None
+    """
+    with _GENE_MAP_LOCK:
+        _GENE_MAP_PATHS.clear()
+        _GENE_MAP_CACHE.clear()
 
-    map_path = _resolve_map(map_path)
-    df = pd.read_csv(map_path)
-    return dict(zip(df['gene'], df['class']))
+def file_sha256(filepath, chunk_size: int = 1 << 20):
+    """
+    Compute the SHA-256 digest of a file's contents.
+
+    Parameters
+    ----------
+    filepath : str or file-like
+        Path to the file, or a seekable binary file object (such as an
+        uploaded file), which is read from the start and rewound.
+    chunk_size : int, optional
+        Bytes read per iteration (default: 1 MiB).
+
+    Returns
+    -------
+    str
+        Hexadecimal digest.
+    """
+    import hashlib
+    digest = hashlib.sha256()
+    if hasattr(filepath, "read"):
+        filepath.seek(0)
+        for chunk in iter(lambda: filepath.read(chunk_size), b""):
+            digest.update(chunk)
+        filepath.seek(0)
+        return digest.hexdigest()
+    with open(filepath, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
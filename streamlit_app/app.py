@@ -20,7 +20,7 @@ if str(PROJECT_PKG_PATH) not in sys.path:
     sys.path.insert(0, str(PROJECT_PKG_PATH))
 
 from layout import render_sidebar, render_main_area
-from handlers import run_detection_and_collect
+from handlers import run_detection_and_collect, refilter_and_collect
 from utils import read_version_safe
 from job_manager import create_job, list_jobs, update_job
 import threading
@@ -47,6 +47,40 @@ APP_TEMP.mkdir(parents=True, exist_ok=True)
 VERSION = read_version_safe(PROJECT_ROOT / "AntibioticResistanceGeneDetector" / "VERSION")
 
 
+def input_signature(uploaded_files=None, fasta_dir=None):
+    """
+    Identify the detection inputs for the re-filter check without reading them.
+
+    Upload names and sizes are not enough: a file edited and re-uploaded
+    under the same name would be answered from stale raw hits. Uploads
+    are identified by Streamlit's per-upload ``file_id`` (content-hashed
+    only on versions without one) and folder inputs by path, size and
+    modification time, so a run never re-reads multi-GB inputs.
+
+    Parameters
+    ----------
+    uploaded_files : list, optional
+        Streamlit uploaded file objects.
+    fasta_dir : str, optional
+        Server-side folder of FASTA inputs.
+
+    Returns
+    -------
+    tuple
+        One identifying tuple per input file.
+    """
+    from src.utils import file_sha256, find_fasta_files
+    signature = []
+    for u in uploaded_files or []:
+        file_id = getattr(u, "file_id", None)
+        signature.append((getattr(u, "name", ""), getattr(u, "size", None), file_id or file_sha256(u)))
+    if fasta_dir and os.path.isdir(fasta_dir):
+        for p in sorted(find_fasta_files(fasta_dir)):
+            info = os.stat(p)
+            signature.append((os.path.abspath(p), info.st_size, info.st_mtime_ns))
+    return tuple(signature)
+
+
 def main():
     st.title("Antibiotic Resistance Gene Detector — Streamlit UI")
 
@@ -78,6 +112,9 @@ def main():
                     "identity": inputs.get("identity"),
                     "coverage": inputs.get("coverage"),
                     "threads": inputs.get("threads"),
+                    "diamond_profile": inputs.get("diamond_profile"),
+                    "block_size": inputs.get("block_size"),
+                    "index_chunks": inputs.get("index_chunks"),
                     "plot": bool(inputs.get("plot")),
                     "summary": bool(inputs.get("summary")),
                     "quiet": bool(inputs.get("quiet")),
@@ -133,6 +170,9 @@ def main():
                             identity=inputs_local.get("identity"),
                             coverage=inputs_local.get("coverage"),
                             threads=inputs_local.get("threads"),
+                            diamond_profile=inputs_local.get("diamond_profile"),
+                            block_size=inputs_local.get("block_size"),
+                            index_chunks=inputs_local.get("index_chunks"),
                             outdir=str(job_dir / "out"),
                             temp_dir=job_dir / "temp",
                             plot=bool(inputs_local.get("plot")),
@@ -173,6 +213,9 @@ def main():
                     "identity": inputs.get("identity"),
                     "coverage": inputs.get("coverage"),
                     "threads": inputs.get("threads"),
+                    "diamond_profile": inputs.get("diamond_profile"),
+                    "block_size": inputs.get("block_size"),
+                    "index_chunks": inputs.get("index_chunks"),
                     "plot": inputs.get("plot"),
                     "summary": inputs.get("summary"),
                     "quiet": inputs.get("quiet"),
@@ -201,24 +244,49 @@ def main():
                     except Exception:
                         pass
 
-                with st.spinner("Running detection pipeline — this may take a while"):
-                    results = run_detection_and_collect(
-                        uploaded_files=inputs.get("uploaded_files"),
-                        fasta_dir=inputs.get("fasta_dir"),
-                        db_path=inputs.get("db_path"),
-                        gene_map=inputs.get("gene_map"),
-                        identity=inputs.get("identity"),
-                        coverage=inputs.get("coverage"),
-                        threads=inputs.get("threads"),
-                        outdir=inputs.get("outdir"),
-                        temp_dir=APP_TEMP,
-                        plot=bool(inputs.get("plot")),
-                        summary=bool(inputs.get("summary")),
-                        quiet=bool(inputs.get("quiet")),
-                        rich=bool(inputs.get("rich")),
-                        mock_mode=bool(inputs.get("mock_mode")),
-                        progress_callback=progress_cb,
-                    )
+                # Same inputs as the previous run: only the thresholds changed, so
+                # re-filter the raw hits kept in its output dir instead of searching again
+                run_signature = (
+                    input_signature(inputs.get("uploaded_files"), inputs.get("fasta_dir")), inputs.get("db_path"), inputs.get("outdir"), bool(inputs.get("mock_mode")), bool(inputs.get("summary")),
+                    inputs.get("diamond_profile"), inputs.get("block_size"), inputs.get("index_chunks"),
+                )
+                last_run = st.session_state.get("last_run")
+                if last_run and last_run["signature"] == run_signature and not inputs.get("summary") and not inputs.get("mock_mode"):
+                    with st.spinner("Re-filtering hits with the new thresholds"):
+                        results = refilter_and_collect(
+                            outdir=last_run["outdir"],
+                            gene_map=inputs.get("gene_map"),
+                            identity=inputs.get("identity"),
+                            coverage=inputs.get("coverage"),
+                            plot=bool(inputs.get("plot")),
+                            quiet=bool(inputs.get("quiet")),
+                            rich=bool(inputs.get("rich")),
+                            progress_callback=progress_cb,
+                        )
+                else:
+                    with st.spinner("Running detection pipeline — this may take a while"):
+                        results = run_detection_and_collect(
+                            uploaded_files=inputs.get("uploaded_files"),
+                            fasta_dir=inputs.get("fasta_dir"),
+                            db_path=inputs.get("db_path"),
+                            gene_map=inputs.get("gene_map"),
+                            identity=inputs.get("identity"),
+                            coverage=inputs.get("coverage"),
+                            threads=inputs.get("threads"),
+                            diamond_profile=inputs.get("diamond_profile"),
+                            block_size=inputs.get("block_size"),
+                            index_chunks=inputs.get("index_chunks"),
+                            outdir=inputs.get("outdir"),
+                            temp_dir=APP_TEMP,
+                            plot=bool(inputs.get("plot")),
+                            summary=bool(inputs.get("summary")),
+                            quiet=bool(inputs.get("quiet")),
+                            rich=bool(inputs.get("rich")),
+                            mock_mode=bool(inputs.get("mock_mode")),
+                            progress_callback=progress_cb,
+                        )
+                    if results.get("status") == "COMPLETED" and not results.get("fallback_to_mock"):
+                        st.session_state["last_run"] = {"signature": run_signature, "outdir": inputs.get("outdir") or str(APP_TEMP / "out")}
 
                 results_progress = results.get("progress_updates") or []
                 if results_progress:
@@ -5,6 +5,7 @@ This minimal implementation is intentionally conservative so it is easy to
 maintain while we finalize worker/job_manager changes.
 """
 
+import os
 from pathlib import Path
 from typing import List, Callable, Optional
 import argparse
@@ -17,14 +18,23 @@ from utils import save_uploaded_files, find_results_csv, find_plot_files, zip_fi
 HERE = Path(__file__).resolve().parent
 LOGS_DIR = HERE / "temp" / "logs"
 LOGS_DIR.mkdir(parents=True, exist_ok=True)
+# Resubmitted uploads are answered from the result cache
+CACHE_DIR = Path(os.environ.get("ARG_RES_CACHE_DIR") or HERE / "temp" / "cache")
 
 # Import pipeline entrypoint if available
 try:
-    from src.main import run_pipeline
+    from src.main import run_pipeline, DEFAULT_GENE_MAP
+    from src.interpret_results import read_report, parquet_available
+    from src.utils import resolve_gene_map_path
 except Exception:
     run_pipeline = None
 
 
+def _gene_map_path(gene_map):
+    """Resolve the selected gene map, falling back to the CLI default map."""
+    return resolve_gene_map_path(str(gene_map) if gene_map else DEFAULT_GENE_MAP)
+
+
 def _failure(message: str, tb: Optional[str] = None, fallback_to_mock: bool = False):
     return {
         "status": "FAILED",
@@ -36,9 +46,15 @@ def _failure(message: str, tb: Optional[str] = None, fallback_to_mock: bool = Fa
     }
 
 
-def run_detection_and_collect(uploaded_files, fasta_dir, db_path, gene_map, identity, coverage, threads, outdir, temp_dir: Path, plot: bool = True, summary: bool = False, quiet: bool = False, rich: bool = True, mock_mode: bool = False, progress_callback: Optional[Callable[[str], None]] = None):
+def run_detection_and_collect(uploaded_files, fasta_dir, db_path, gene_map, identity, coverage, threads, outdir, temp_dir: Path, plot: bool = True, summary: bool = False, quiet: bool = False, rich: bool = True, mock_mode: bool = False, progress_callback: Optional[Callable[[str], None]] = None, output_format: Optional[str] = None, diamond_profile: Optional[str] = None, block_size: Optional[float] = None, index_chunks: Optional[int] = None):
     """Save uploads, optionally run pipeline, and collect outputs.
 
+    The combined report is written as Parquet when pyarrow is available
+    (``output_format`` overrides this) and loaded back directly, keeping
+    its column dtypes, instead of re-parsing the CSV. ``diamond_profile``,
+    ``block_size`` and ``index_chunks`` tune DIAMOND as the matching CLI
+    flags do.
+
     Returns a standardized dict with keys: status, message, results_object, and
     optional artifacts (dataframe, csv_bytes, plots, plots_zip, logs).
     """
@@ -74,16 +90,25 @@ def run_detection_and_collect(uploaded_files, fasta_dir, db_path, gene_map, iden
     args = argparse.Namespace()
     args.input = str(input_dir)
     args.db = str(db_path) if db_path else None
-    args.map = str(gene_map) if gene_map else None
+    args.map = _gene_map_path(gene_map)
     args.outdir = str(outdir) if outdir else str(temp_dir / "out")
     args.output_name = "results.csv"
     args.identity = float(identity) if identity is not None else 90.0
-    args.coverage = int(coverage) if coverage is not None else 80
+    args.coverage = float(coverage) if coverage is not None else 80.0
+    # The sidebar asks for percent coverage of the reference gene
+    args.coverage_mode = "percent"
     args.threads = int(threads) if threads is not None else 1
+    args.diamond_profile = diamond_profile or None
+    args.block_size = float(block_size) if block_size else None
+    args.index_chunks = int(index_chunks) if index_chunks else None
     args.plot = bool(plot)
     args.summary = bool(summary)
     args.quiet = bool(quiet)
     args.rich = bool(rich)
+    args.format = output_format or ("parquet" if parquet_available() else "csv")
+    args.cache_dir = str(CACHE_DIR)
+    # Keep unfiltered hits so threshold changes can be re-filtered without searching
+    args.keep_raw = not args.summary
 
     # Execute pipeline
     try:
@@ -92,6 +117,42 @@ def run_detection_and_collect(uploaded_files, fasta_dir, db_path, gene_map, iden
         tb = traceback.format_exc()
         return _failure("Pipeline execution failed", tb=tb)
 
+    return _collect_outputs(args, results, "Run completed")
+
+
+def refilter_and_collect(outdir, gene_map, identity, coverage, plot: bool = True, summary: bool = False, quiet: bool = False, rich: bool = True, output_format: Optional[str] = None, progress_callback: Optional[Callable[[str], None]] = None):
+    """Re-apply new thresholds to the raw hits kept by an earlier run in ``outdir``.
+
+    No search is run; interpretation, reports and plots are rebuilt from
+    ``<outdir>/raw``. Returns the same dict as :func:`run_detection_and_collect`.
+    """
+    if run_pipeline is None:
+        return _failure("Pipeline unavailable")
+    args = argparse.Namespace()
+    args.input = None
+    args.refilter = True
+    args.map = _gene_map_path(gene_map)
+    args.outdir = str(outdir)
+    args.output_name = "results.csv"
+    args.identity = float(identity) if identity is not None else 90.0
+    args.coverage = float(coverage) if coverage is not None else 80.0
+    # The sidebar asks for percent coverage of the reference gene
+    args.coverage_mode = "percent"
+    args.threads = 1
+    args.plot = bool(plot)
+    args.summary = bool(summary)
+    args.quiet = bool(quiet)
+    args.rich = bool(rich)
+    args.format = output_format or ("parquet" if parquet_available() else "csv")
+    try:
+        results = run_pipeline(args, progress=progress_callback)
+    except Exception:
+        tb = traceback.format_exc()
+        return _failure("Re-filtering failed", tb=tb)
+    return _collect_outputs(args, results, "Re-filter completed")
+
+
+def _collect_outputs(args, results, message: str):
     # Collect outputs
     outdir_path = Path(args.outdir)
     csvs = find_results_csv(outdir_path)
@@ -99,7 +160,13 @@ def run_detection_and_collect(uploaded_files, fasta_dir, db_path, gene_map, iden
 
     df = None
     csv_bytes = None
-    if csvs:
+    if args.format != "csv" and not args.summary:
+        try:
+            df = read_report(str(outdir_path / args.output_name), args.format)
+            csv_bytes = df.to_csv(index=False).encode("utf-8")
+        except Exception:
+            df = None
+    if df is None and csvs:
         try:
             df = pd.read_csv(csvs[0])
             csv_bytes = df.to_csv(index=False).encode("utf-8")
@@ -118,7 +185,7 @@ def run_detection_and_collect(uploaded_files, fasta_dir, db_path, gene_map, iden
 
     return {
         "status": "COMPLETED",
-        "message": "Run completed",
+        "message": message,
         "dataframe": df,
         "csv_bytes": csv_bytes,
         "plots": [str(p) for p in plot_files] if plot_files else [],
@@ -246,8 +246,11 @@ def run_worker_loop(poll_interval=2):
                         db_path=params.get("db_path") or job.get("db_path"),
                         gene_map=params.get("gene_map") or job.get("gene_map"),
                         identity=float(params.get("identity", job.get("identity", 0.0))),
-                        coverage=int(params.get("coverage", job.get("coverage", 0))),
+                        coverage=float(params.get("coverage", job.get("coverage", 0))),
                         threads=int(params.get("threads", job.get("threads", 1))),
+                        diamond_profile=params.get("diamond_profile"),
+                        block_size=params.get("block_size"),
+                        index_chunks=params.get("index_chunks"),
                         outdir=str(job_dir / "output"),
                         temp_dir=job_dir,
                         plot=bool(params.get("plot", job.get("plot", False))),
@@ -1,7 +1,7 @@
 # streamlit_app/layout.py
 """
 Page layout helpers for the Streamlit app.
-- Sidebar controls: upload FASTA, set identity, coverage, threads, outdir
+- Sidebar controls: upload FASTA, set identity, coverage, threads, DIAMOND tuning, outdir
 - Main area renderer: results table, plots, download buttons, logs.
 """
 from pathlib import Path
@@ -20,7 +20,8 @@ def render_sidebar(default_temp_dir: Optional[str] = None) -> dict:
     Returns
     -------
     dict
-        keys: uploaded_files, fasta_dir, db_path, gene_map, identity, coverage, threads, outdir, run
+        keys: uploaded_files, fasta_dir, db_path, gene_map, identity, coverage, threads,
+        diamond_profile, block_size, index_chunks, outdir, run
     """
     st.sidebar.header("Inputs")
 
@@ -37,6 +38,12 @@ def render_sidebar(default_temp_dir: Optional[str] = None) -> dict:
     coverage = st.sidebar.number_input("Minimum percent coverage", min_value=10.0, max_value=100.0, value=80.0, help="Minimum percent coverage (10-100)")
     threads = st.sidebar.number_input("Threads", min_value=1, max_value=32, value=1, help="CPU threads to use (1-32)")
 
+    # DIAMOND tuning (0 keeps the profile's value)
+    with st.sidebar.expander("DIAMOND tuning"):
+        diamond_profile = st.selectbox("Profile", ["balanced", "fast", "sensitive", "low-memory"], help="low-memory caps block size and splits the index for small-RAM nodes")
+        block_size = st.number_input("Block size (billions of letters, 0 = profile)", min_value=0.0, max_value=20.0, value=0.0, step=0.5, help="Memory use is roughly 6x this in GB")
+        index_chunks = st.number_input("Index chunks (0 = profile)", min_value=0, max_value=64, value=0, help="More chunks use less memory")
+
     # run_pipeline flags
     plot = st.sidebar.checkbox("Generate plots (plot)", value=True)
     summary = st.sidebar.checkbox("Summary mode (no CSVs written)", value=False)
@@ -56,6 +63,9 @@ def render_sidebar(default_temp_dir: Optional[str] = None) -> dict:
         "identity": float(identity),
         "coverage": float(coverage),
         "threads": int(threads),
+        "diamond_profile": diamond_profile,
+        "block_size": float(block_size) or None,
+        "index_chunks": int(index_chunks) or None,
         "plot": bool(plot),
         "summary": bool(summary),
         "quiet": bool(quiet),
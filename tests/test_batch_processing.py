@@ -10,3 +10,67 @@ def test_batch_processing():
         for hit in hits:
             assert "gene" in hit
             assert "sample_id" in hit
+
+
+def test_batch_process_backend_matches_threads(tmp_path):
+    kwargs = dict(identity=90, coverage=0, threads=2, output_dir=str(tmp_path), tool="kmer")
+    threaded = batch_detect_genes("input", "data/resistance_genes.fasta", **kwargs)
+    processed = batch_detect_genes("input", "data/resistance_genes.fasta", executor="process", chunksize=2, **kwargs)
+    assert threaded == processed
+    assert all(hits for hits in processed.values())
+    with pytest.raises(ValueError):
+        batch_detect_genes("input", "data/resistance_genes.fasta", executor="fibers")
+
+
+def test_batch_reads_compressed_and_alternate_extensions(tmp_path):
+    import gzip
+    with open("input/example.fasta", "rb") as fh:
+        data = fh.read()
+    (tmp_path / "plain.fa").write_bytes(data)
+    (tmp_path / "packed.fna.gz").write_bytes(gzip.compress(data))
+    kwargs = dict(identity=90, coverage=0, output_dir=str(tmp_path / "out"), tool="kmer")
+    results = batch_detect_genes(str(tmp_path), "data/resistance_genes.fasta", **kwargs)
+    assert sorted(results) == ["packed", "plain"]
+    strip = lambda hits: [{k: v for k, v in h.items() if k != "source_file" and k != "sample_id"} for h in hits]
+    assert strip(results["packed"]) == strip(results["plain"]) != []
+    concat = batch_detect_genes(str(tmp_path), "data/resistance_genes.fasta", concat=True, **kwargs)
+    assert strip(concat["packed"]) == strip(results["plain"])
+
+
+def test_cpu_budget_shares_threads_by_outstanding_work():
+    from src.gene_detector import CpuBudget
+    budget = CpuBudget(8, total_work=100)
+    big = budget.acquire(50)
+    assert big == 4
+    small = [budget.acquire(10) for _ in range(4)]
+    assert small == [1, 1, 1, 1]
+    budget.release(big, 50)
+    for n in small[:3]:
+        budget.release(n, 10)
+    # The last sample is half of the outstanding work: half the CPUs
+    assert budget.acquire(10) == 4
+
+
+def test_batch_records_per_sample_timings(tmp_path):
+    timings = {}
+    results = batch_detect_genes("input", "data/resistance_genes.fasta", identity=90, coverage=0, threads=2, output_dir=str(tmp_path), tool="kmer", timings=timings)
+    assert set(timings) == set(results)
+    assert all(t["seconds"] >= 0 and t["input_bytes"] > 0 and t["tool_threads"] is None for t in timings.values())
+
+
+def test_cpu_budget_gives_each_worker_an_even_share():
+    from src.gene_detector import CpuBudget
+    budget = CpuBudget(8, total_work=40, workers=2)
+    assert [budget.acquire(10), budget.acquire(10)] == [4, 4]
+
+
+def test_batch_passes_cpu_budget_to_search_tool(tmp_path, monkeypatch):
+    from src import gene_detector as gd
+    seen = []
+    monkeypatch.setattr(gd, "run_blast", lambda *a, tool_threads=None, **kw: seen.append(tool_threads) or [])
+    kwargs = dict(coverage=0, output_dir=str(tmp_path), tool="blastn")
+    gd.batch_detect_genes("input", "data/resistance_genes.fasta", threads=2, cpus=6, **kwargs)
+    assert len(seen) == 3 and all(n >= 3 for n in seen)
+    seen.clear()
+    gd.batch_detect_genes("input", "data/resistance_genes.fasta", threads=2, tool_threads=2, **kwargs)
+    assert seen == [2, 2, 2]
@@ -20,3 +20,36 @@ def test_parse_blast_results_real_and_mock():
     assert results[0]["qend"] == 100
     assert results[0]["sstart"] == 1
     assert results[0]["send"] == 100
+
+
+def test_parse_blast_results_columnar_frame(tmp_path):
+    tsv = tmp_path / "out.tsv"
+    tsv.write_text("q1\tgeneA\t99.5\t100\t1\t100\t1\t100\textra\n\nq2\tshort\t99\n7\t42\t95.0\t90\t3\t92\t1\t90\n")
+    df = parse_blast_results(str(tsv), identity=90, coverage=80, as_frame=True)
+    assert list(df["gene"]) == ["geneA", "42"]
+    assert str(df["length"].dtype) == "int64"
+    hits = parse_blast_results(str(tsv), identity=90, coverage=80)
+    assert hits[1] == {"query": "7", "gene": "42", "identity": 95.0, "length": 90, "qstart": 3, "qend": 92, "sstart": 1, "send": 90}
+    empty = tmp_path / "empty.tsv"
+    empty.write_text("")
+    assert parse_blast_results(str(empty), identity=90, coverage=80) == []
+
+
+def test_percent_coverage_uses_reference_length_index(tmp_path):
+    from src.run_blast import get_reference_lengths, parse_blast_results, reset_search_registry
+    db = tmp_path / 'db.fasta'
+    db.write_text('>geneA desc\nACGTACGTAC\nACGTACGTAC\n>geneB\n' + 'A' * 200 + '\n')
+    # Another writer's temp file is neither reused nor published
+    (tmp_path / 'db.fasta.lengths.tsv.tmp').write_text('geneA\t1\n')
+    reset_search_registry()
+    lengths = get_reference_lengths(str(db))
+    assert lengths == {'geneA': 20, 'geneB': 200}
+    assert (tmp_path / 'db.fasta.lengths.tsv').read_text().splitlines() == ['geneA\t20', 'geneB\t200']
+    assert [p.name for p in tmp_path.glob('*.tmp')] == ['db.fasta.lengths.tsv.tmp']
+    tsv = tmp_path / 'hits.tsv'
+    # 15/20 bp of geneA (75%) and 60/200 bp of geneB (30%), geneB on the minus strand
+    tsv.write_text('q1\tgeneA\t99.0\t15\t1\t15\t1\t15\nq1\tgeneB\t99.0\t60\t1\t60\t160\t101\n')
+    assert [h['gene'] for h in parse_blast_results(str(tsv), 90, 50)] == ['geneB']
+    assert [h['gene'] for h in parse_blast_results(str(tsv), 90, 50, ref_lengths=lengths)] == ['geneA']
+    assert parse_blast_results(str(tsv), 90, 80, ref_lengths=lengths) == []
+    reset_search_registry()
@@ -0,0 +1,40 @@
+import sys
+import types
+import pytest
+from src.run_blast import stream_blast_hits
+
+
+def _emit(*rows, exit_code=0):
+    script = "import sys\n" + "".join(f"print({row!r})\n" for row in rows) + f"sys.exit({exit_code})\n"
+    return [sys.executable, "-c", script]
+
+
+def test_stream_blast_hits_filters_on_the_fly():
+    cmd = _emit("q1\tgeneA\t99.5\t100\t1\t100\t1\t100", "q2\tgeneB\t85.0\t90\t5\t94\t10\t99", "")
+    hits = stream_blast_hits(cmd, identity=90, coverage=80)
+    assert isinstance(hits, types.GeneratorType)
+    hits = list(hits)
+    assert [h["gene"] for h in hits] == ["geneA"]
+    assert hits[0]["identity"] == 99.5 and hits[0]["send"] == 100
+
+
+def test_stream_blast_hits_failed_tool_raises_after_reported_hits():
+    from src.error_handling import SearchFailedError
+    cmd = _emit("q1\tgeneA\t99.5\t100\t1\t100\t1\t100", exit_code=2)
+    hits = stream_blast_hits(cmd, identity=0, coverage=0)
+    assert next(hits)["gene"] == "geneA"
+    with pytest.raises(SearchFailedError):
+        next(hits)
+
+
+def test_stream_blast_hits_pipes_compressed_query_into_stdin(tmp_path):
+    import gzip
+    query = tmp_path / "q.fasta.gz"
+    with gzip.open(query, "wt") as fh:
+        fh.write(">q1\nACGT\n>q2\nACGT\n")
+    script = ("import sys\n"
+              "for line in sys.stdin:\n"
+              "    if line.startswith('>'):\n"
+              "        print(line[1:].strip() + '\\tgeneA\\t100\\t4\\t1\\t4\\t1\\t4')\n")
+    hits = stream_blast_hits([sys.executable, "-c", script], identity=0, coverage=0, stdin_fasta=str(query))
+    assert [h["query"] for h in hits] == ["q1", "q2"]
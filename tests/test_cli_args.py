@@ -1,3 +1,4 @@
+import pytest
 import types
 import os
 from src.main import run_pipeline
@@ -41,3 +42,288 @@ def test_run_pipeline_plot_mode(tmp_path):
     plots_dir = os.path.join(str(tmp_path), 'plots')
     # If no data, visualization may warn but should not crash
     assert os.path.exists(str(tmp_path))
+
+
+def test_run_pipeline_batch_writes_per_sample_and_combined(tmp_path):
+    import pandas as pd
+    args = types.SimpleNamespace(
+        input='input',
+        db='data/resistance_genes.fasta',
+        map='data/gene_class_map.csv',
+        outdir=str(tmp_path),
+        output_name='results.csv',
+        identity=90,
+        coverage=0,
+        threads=1,
+        plot=False,
+        summary=False,
+        quiet=True,
+        tool='kmer'
+    )
+    res = run_pipeline(args)
+    combined = pd.read_csv(tmp_path / 'results.csv')
+    assert len(combined) == len(res) == 6
+    assert set(combined['sample_id']) == {'example', 'test_batch1', 'test_batch2'}
+    assert set(res[0]) >= {'sample_id', 'gene', 'antibiotic_class', 'class', 'coverage'}
+    per_sample = pd.read_csv(tmp_path / 'example_results.csv')
+    assert sorted(per_sample['antibiotic_class']) == ['Beta-lactam', 'Tetracycline']
+
+
+def test_run_pipeline_stream_report_matches_batch(tmp_path):
+    import pandas as pd
+    args = types.SimpleNamespace(
+        input='input',
+        db='data/resistance_genes.fasta',
+        map='data/gene_class_map.csv',
+        outdir=str(tmp_path),
+        output_name='results.csv',
+        identity=90,
+        coverage=0,
+        threads=2,
+        plot=False,
+        summary=False,
+        quiet=True,
+        tool='kmer',
+        stream_report=True
+    )
+    assert run_pipeline(args) == []
+    combined = pd.read_csv(tmp_path / 'results.csv')
+    assert len(combined) == 6
+    assert set(combined['sample_id']) == {'example', 'test_batch1', 'test_batch2'}
+    assert not (tmp_path / 'results.csv.partial').exists()
+    assert (tmp_path / 'test_batch1_results.csv').exists()
+
+
+def test_run_pipeline_parquet_format(tmp_path):
+    pd = pytest.importorskip('pandas')
+    pytest.importorskip('pyarrow')
+    args = types.SimpleNamespace(
+        input='input',
+        db='data/resistance_genes.fasta',
+        map='data/gene_class_map.csv',
+        outdir=str(tmp_path),
+        output_name='results.csv',
+        identity=90,
+        coverage=0,
+        threads=1,
+        plot=False,
+        summary=False,
+        quiet=True,
+        tool='kmer',
+        format='both'
+    )
+    run_pipeline(args)
+    table = pd.read_parquet(tmp_path / 'results.parquet')
+    assert len(table) == len(pd.read_csv(tmp_path / 'results.csv')) == 6
+    assert str(table['gene'].dtype) == 'category'
+    assert table['coverage'].dtype == 'int64'
+
+
+def test_run_pipeline_resume_skips_completed_samples(tmp_path, monkeypatch):
+    import json
+    import shutil
+    import pandas as pd
+    import src.gene_detector as gd
+    inputs = tmp_path / 'in'
+    shutil.copytree('input', inputs)
+    args = types.SimpleNamespace(
+        input=str(inputs),
+        db='data/resistance_genes.fasta',
+        map='data/gene_class_map.csv',
+        outdir=str(tmp_path / 'out'),
+        output_name='results.csv',
+        identity=90,
+        coverage=0,
+        threads=1,
+        plot=False,
+        summary=False,
+        quiet=True,
+        tool='kmer',
+        resume=True
+    )
+    run_pipeline(args)
+    first = pd.read_csv(tmp_path / 'out' / 'results.csv')
+    entries = [json.loads(line) for line in (tmp_path / 'out' / 'manifest.jsonl').read_text().splitlines()]
+    assert sorted(e['sample_id'] for e in entries) == ['example', 'test_batch1', 'test_batch2']
+
+    processed = []
+    original = gd._process_sample
+    monkeypatch.setattr(gd, '_process_sample', lambda fasta, **kw: processed.append(os.path.basename(fasta)) or original(fasta, **kw))
+    run_pipeline(args)
+    assert processed == []
+    second = pd.read_csv(tmp_path / 'out' / 'results.csv')
+    assert sorted(second['gene']) == sorted(first['gene'])
+
+    # Changed input content or thresholds invalidate the entry
+    with open(inputs / 'example.fasta', 'a') as fh:
+        fh.write('>extra\nACGTACGTACGT\n')
+    run_pipeline(args)
+    assert processed == ['example.fasta']
+    args.identity = 95
+    run_pipeline(args)
+    assert len(processed) == 4
+
+    # So does a changed gene-class map: reports carry its annotations
+    gene_map = tmp_path / 'map.csv'
+    shutil.copy('data/gene_class_map.csv', gene_map)
+    args.map = str(gene_map)
+    run_pipeline(args)
+    assert len(processed) == 7
+    run_pipeline(args)
+    assert len(processed) == 7
+    gene_map.write_text(gene_map.read_text().replace('Beta-lactam', 'Penicillin'))
+    run_pipeline(args)
+    assert len(processed) == 10
+    assert 'Penicillin' in set(pd.read_csv(tmp_path / 'out' / 'results.csv')['antibiotic_class'])
+
+
+def test_run_pipeline_default_batch_records_manifest_for_resume(tmp_path, monkeypatch):
+    import json
+    import pandas as pd
+    import src.gene_detector as gd
+    args = types.SimpleNamespace(
+        input='input',
+        db='data/resistance_genes.fasta',
+        map='data/gene_class_map.csv',
+        outdir=str(tmp_path / 'out'),
+        output_name='results.csv',
+        identity=90,
+        coverage=0,
+        threads=1,
+        plot=False,
+        summary=False,
+        quiet=True,
+        tool='kmer'
+    )
+    real_search = gd.run_blast
+    searched = []
+
+    def _crash_on_third(query, *a, **kw):
+        searched.append(os.path.basename(query))
+        if len(searched) == 3:
+            raise KeyboardInterrupt
+        return real_search(query, *a, **kw)
+    monkeypatch.setattr(gd, 'run_blast', _crash_on_third)
+    with pytest.raises(KeyboardInterrupt):
+        run_pipeline(args)
+    entries = [json.loads(line) for line in (tmp_path / 'out' / 'manifest.jsonl').read_text().splitlines()]
+    assert sorted(e['sample_id'] + '.fasta' for e in entries) == sorted(searched[:2])
+
+    searched.clear()
+    monkeypatch.setattr(gd, 'run_blast', lambda query, *a, **kw: searched.append(os.path.basename(query)) or real_search(query, *a, **kw))
+    args.resume = True
+    run_pipeline(args)
+    assert len(searched) == 1
+    assert sorted(set(pd.read_csv(tmp_path / 'out' / 'results.csv')['sample_id'])) == ['example', 'test_batch1', 'test_batch2']
+
+
+def test_run_pipeline_resume_retries_failed_searches_only(tmp_path, monkeypatch):
+    import json
+    import src.gene_detector as gd
+    from src.error_handling import SearchFailedError
+    args = types.SimpleNamespace(
+        input='input',
+        db='data/resistance_genes.fasta',
+        map='data/gene_class_map.csv',
+        outdir=str(tmp_path / 'out'),
+        output_name='results.csv',
+        identity=90,
+        coverage=0,
+        threads=1,
+        plot=False,
+        summary=False,
+        quiet=True,
+        tool='kmer',
+        resume=True
+    )
+    real_search = gd.run_blast
+
+    def _flaky(query, *a, **kw):
+        if os.path.basename(query) == 'example.fasta':
+            raise SearchFailedError('diamond exited with status 137')
+        return real_search(query, *a, **kw)
+    monkeypatch.setattr(gd, 'run_blast', _flaky)
+    run_pipeline(args)
+    entries = [json.loads(line) for line in (tmp_path / 'out' / 'manifest.jsonl').read_text().splitlines()]
+    assert sorted(e['sample_id'] for e in entries) == ['test_batch1', 'test_batch2']
+
+    processed = []
+    monkeypatch.setattr(gd, 'run_blast', lambda query, *a, **kw: processed.append(os.path.basename(query)) or real_search(query, *a, **kw))
+    run_pipeline(args)
+    assert processed == ['example.fasta']
+
+
+def test_run_pipeline_refilter_matches_fresh_search(tmp_path, monkeypatch):
+    import shutil
+    import pandas as pd
+    import src.gene_detector as gd
+    inputs = tmp_path / 'in'
+    shutil.copytree('input', inputs)
+    # A partial gene copy (40 bp alignment) so thresholds split the hits
+    (inputs / 'partial.fasta').write_text('>contig1\nATGCGTACGTAGCTAGCTAGCTAGCTAGCTAGCTAGCTAGC\n')
+    args = types.SimpleNamespace(
+        input=str(inputs),
+        db='data/resistance_genes.fasta',
+        map='data/gene_class_map.csv',
+        outdir=str(tmp_path / 'raw_run'),
+        output_name='results.csv',
+        identity=90,
+        coverage=0,
+        threads=1,
+        plot=False,
+        summary=False,
+        quiet=True,
+        tool='kmer',
+        keep_raw=True
+    )
+    kept = run_pipeline(args)
+    assert sorted(os.listdir(tmp_path / 'raw_run' / 'raw')) == ['example.npz', 'partial.npz', 'samples.txt', 'test_batch1.npz', 'test_batch2.npz']
+    key = lambda r: (r['sample_id'], r['gene'], r['identity'], r['coverage'])
+    fresh = {}
+    for coverage in (30, 50):
+        fresh[coverage] = run_pipeline(types.SimpleNamespace(**dict(vars(args), outdir=str(tmp_path / f'fresh{coverage}'), keep_raw=False, coverage=coverage)))
+
+    monkeypatch.setattr(gd, 'run_blast', lambda *a, **kw: (_ for _ in ()).throw(AssertionError('no search on refilter')))
+    refilter = dict(vars(args), input=None, keep_raw=False, refilter=True)
+    for coverage, expected in fresh.items():
+        rows = run_pipeline(types.SimpleNamespace(**dict(refilter, coverage=coverage)))
+        assert rows
+        assert sorted(map(key, rows)) == sorted(map(key, expected))
+        report = pd.read_csv(tmp_path / 'raw_run' / 'results.csv')
+        assert sorted(zip(report['sample_id'], report['gene'])) == sorted((r['sample_id'], r['gene']) for r in expected)
+    # 30 bp keeps the partial copy, 50 bp drops it
+    assert 'partial' in {r['sample_id'] for r in fresh[30]}
+    assert 'partial' not in {r['sample_id'] for r in fresh[50]}
+    assert run_pipeline(types.SimpleNamespace(**dict(refilter, coverage=58))) == []
+    assert sorted(map(key, run_pipeline(types.SimpleNamespace(**refilter)))) == sorted(map(key, kept))
+
+
+def test_run_pipeline_refilter_ignores_samples_of_earlier_runs(tmp_path):
+    import shutil
+    first, second = tmp_path / 'first', tmp_path / 'second'
+    first.mkdir()
+    second.mkdir()
+    shutil.copy('input/example.fasta', first)
+    shutil.copy('input/test_batch1.fasta', second)
+    shutil.copy('input/test_batch2.fasta', second)
+    args = types.SimpleNamespace(
+        input=str(first),
+        db='data/resistance_genes.fasta',
+        map='data/gene_class_map.csv',
+        outdir=str(tmp_path / 'out'),
+        output_name='results.csv',
+        identity=90,
+        coverage=0,
+        threads=1,
+        plot=False,
+        summary=False,
+        quiet=True,
+        tool='kmer',
+        keep_raw=True
+    )
+    run_pipeline(args)
+    args.input = str(second)
+    current = run_pipeline(args)
+    assert {r['sample_id'] for r in current} == {'test_batch1', 'test_batch2'}
+    refiltered = run_pipeline(types.SimpleNamespace(**dict(vars(args), input=None, keep_raw=False, refilter=True)))
+    assert {r['sample_id'] for r in refiltered} == {'test_batch1', 'test_batch2'}
@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+# Modules that must not be imported just to parse arguments
+HEAVY_MODULES = {'pandas', 'numpy', 'matplotlib', 'seaborn', 'networkx', 'Bio', 'pyarrow'}
+REPO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def _imported_modules(*argv):
+    # ``-X importtime`` writes one "import time: self | cumulative | name" line per module to stderr
+    res = subprocess.run([sys.executable, '-X', 'importtime', *argv], capture_output=True, text=True, cwd=REPO)
+    modules = {}
+    for line in res.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line.split('|', 2)
+            if cumulative.strip().isdigit():
+                modules[name.strip()] = int(cumulative)
+    return res, modules
+
+
+def test_cli_startup_defers_heavy_imports():
+    res, modules = _imported_modules('-c', 'import src.main')
+    assert res.returncode == 0, res.stderr
+    assert 'src.main' in modules
+    loaded = {name.split('.')[0] for name in modules}
+    assert not HEAVY_MODULES & loaded, f"heavy imports on startup: {sorted(HEAVY_MODULES & loaded)}"
+
+
+def test_version_flag_defers_heavy_imports():
+    res, modules = _imported_modules(os.path.join('src', 'main.py'), '--version')
+    assert res.returncode == 0
+    assert not HEAVY_MODULES & {name.split('.')[0] for name in modules}
@@ -0,0 +1,19 @@
+from src.gene_detector import batch_detect_genes
+
+
+def test_concatenated_batch_matches_per_sample(tmp_path):
+    gene = "ATGCGTACGTAGCTAGCTAGCTAGCTAGCTAGCTAGCTAGCTAGCTAGCTAGCTAGC"
+    inp = tmp_path / "in"
+    inp.mkdir()
+    (inp / "s1.fasta").write_text(f">contig1\n{gene}\n")
+    (inp / "s2.fasta").write_text(f">c1 some description\nTTTTTTTTTTTTTTTTTTTT\n>c2\n{gene}")
+    (inp / "s3.fasta").write_text(">empty\nGGGGGGGGGGGGGGGGGGGG\n")
+    kwargs = dict(identity=90, coverage=0, output_dir=str(tmp_path), tool="kmer")
+    single = batch_detect_genes(str(inp), "data/resistance_genes.fasta", **kwargs)
+    concat = batch_detect_genes(str(inp), "data/resistance_genes.fasta", concat=True, concat_batch=2, **kwargs)
+    assert set(concat) == {"s1", "s2", "s3"}
+    assert concat["s3"] == []
+    for sample_id, hits in single.items():
+        key = lambda h: h["gene"]
+        assert sorted(concat[sample_id], key=key) == sorted(hits, key=key)
+    assert {h["query"] for h in concat["s2"]} == {"c2"}
@@ -1,4 +1,5 @@
 import pytest
+import os
 from src.gene_detector import detect_genes
 
 def test_detect_genes_valid():
@@ -17,3 +18,40 @@ def test_detect_genes_empty_fasta(tmp_path):
     empty_fasta.write_text("")
     with pytest.raises(CorruptedInputError):
         detect_genes(str(empty_fasta), "data/resistance_genes.fasta")
+
+
+def test_select_best_hits_tie_breaks_and_keys():
+    from src.gene_detector import select_best_hits
+    hits = [
+        {"sample_id": "s1", "gene": "geneA", "identity": 95.0, "length": 80},
+        {"sample_id": "s1", "gene": "geneB", "identity": 99.0, "length": 60},
+        {"sample_id": "s1", "gene": "geneA", "identity": 98.0, "length": 70},
+        {"sample_id": "s1", "gene": "geneA", "identity": 98.0, "length": 90},
+        {"sample_id": "s2", "gene": "geneB", "identity": 91.0, "length": 60},
+    ]
+    best = select_best_hits(hits)
+    assert [(h["gene"], h["identity"], h["length"]) for h in best] == [("geneA", 98.0, 90), ("geneB", 99.0, 60)]
+    per_sample = select_best_hits(iter(hits), keys=("sample_id", "gene"), chunk_size=2)
+    assert [(h["sample_id"], h["gene"], h["length"]) for h in per_sample] == [("s1", "geneA", 90), ("s1", "geneB", 60), ("s2", "geneB", 60)]
+    assert select_best_hits(iter([])) == []
+
+
+def test_split_fasta_keeps_records_whole(tmp_path):
+    from src.gene_detector import split_fasta
+    fasta = tmp_path / "big.fasta"
+    fasta.write_text("".join(f">r{i} desc\nACGTACGTAC\nGGCC\n" for i in range(10)))
+    chunks = split_fasta(str(fasta), 3, scratch_dir=str(tmp_path / "scratch"))
+    assert len(chunks) == 3
+    assert "".join(open(c).read() for c in chunks) == fasta.read_text()
+    assert all(open(c).read().startswith(">") for c in chunks)
+
+
+def test_sharded_single_input_matches_unsplit_search(tmp_path):
+    from src.gene_detector import detect_genes
+    fasta = tmp_path / "multi.fasta"
+    fasta.write_text(open("input/example.fasta").read() + open("input/test_batch1.fasta").read().replace(">", ">b_"))
+    kwargs = dict(identity=90, coverage=0, output_dir=str(tmp_path), tool="kmer", scratch_dir=str(tmp_path / "scratch"))
+    whole = detect_genes(str(fasta), "data/resistance_genes.fasta", **kwargs)
+    sharded = detect_genes(str(fasta), "data/resistance_genes.fasta", threads=4, shard_bytes=1, **kwargs)
+    assert whole and sharded == whole
+    assert os.listdir(tmp_path / "scratch") == []
@@ -10,3 +10,41 @@ def test_interpret_hits_unknown_gene():
     hits = [{"gene": "unknownGene", "identity": 99.0, "length": 50}]
     results = interpret_hits(hits, "data/gene_class_map.csv")
     assert results[0]["class"] == "Unknown"
+
+
+def test_streaming_report_writer_keeps_partial_on_error(tmp_path):
+    from src.interpret_results import StreamingReportWriter
+    path = tmp_path / 'combined.csv'
+    rows = [{'sample_id': 's1', 'gene': 'blaTEM-1', 'identity': 99.0}]
+    try:
+        with StreamingReportWriter(str(path)) as writer:
+            writer.write(rows, sample_id='s1')
+            raise RuntimeError('worker crashed')
+    except RuntimeError:
+        pass
+    assert not path.exists()
+    partial = (tmp_path / 'combined.csv.partial').read_text().splitlines()
+    assert partial[0].startswith('sample_id,gene')
+    assert len(partial) == 2
+    with StreamingReportWriter(str(path)) as writer:
+        writer.write(rows, sample_id='s1')
+        writer.write([dict(rows[0], sample_id='s2')], sample_id='s2')
+    assert writer.rows == 2 and writer.sample_rows == {'s1': 1, 's2': 1}
+    assert len(path.read_text().splitlines()) == 3
+
+
+def test_write_report_summarizes_large_results(tmp_path, capsys):
+    from src.interpret_results import write_report, report_counts
+    rows = [{'sample_id': f's{i % 3}', 'gene': f'gene{i}', 'identity': 90.0 + i / 100, 'coverage': 100,
+             'antibiotic_class': 'Beta-lactam' if i % 2 else 'Tetracycline', 'source_file': ''} for i in range(200)]
+    write_report(rows, str(tmp_path / 'r.csv'), rich_enabled=False, max_rows=5)
+    out = capsys.readouterr().out
+    assert 'Showing top 5 of 200 hits' in out
+    assert 'gene199' in out and 'gene0 ' not in out
+    assert 'Hits per antibiotic class' in out and 'Hits per sample' in out
+    assert len((tmp_path / 'r.csv').read_text().splitlines()) == 201
+    by_class, by_sample = report_counts(__import__('pandas').DataFrame(rows))
+    assert by_class['hits'].tolist() == [100, 100]
+    assert dict(zip(by_sample['sample_id'], by_sample['hits'])) == {'s0': 67, 's1': 67, 's2': 66}
+    write_report(rows, str(tmp_path / 'r.csv'), save=False, rich_enabled=False, max_rows=5, full_table=True)
+    assert 'gene0 ' in capsys.readouterr().out
@@ -0,0 +1,61 @@
+import random
+from src.kmer_search import KmerIndex, kmer_search
+from src.run_blast import run_blast
+
+_COMP = {"A": "T", "C": "G", "G": "C", "T": "A"}
+
+
+def _random_seq(rng, n):
+    return "".join(rng.choice("ACGT") for _ in range(n))
+
+
+def test_kmer_search_finds_mutated_and_reverse_hits(tmp_path):
+    rng = random.Random(7)
+    gene_a, gene_b = _random_seq(rng, 600), _random_seq(rng, 400)
+    db = tmp_path / "db.fasta"
+    db.write_text(f">geneA\n{gene_a}\n>geneB\n{gene_b}\n")
+    # geneA[100:500] with 9 interior substitutions, and the reverse complement of geneB;
+    # N runs stop the extension from drifting into the random flanks
+    mutated = list(gene_a[100:500])
+    for i in range(20, 400, 45):
+        mutated[i] = "A" if mutated[i] != "A" else "C"
+    rc_b = "".join(_COMP[c] for c in reversed(gene_b))
+    query = tmp_path / "query.fasta"
+    query.write_text(
+        f">c1\n{_random_seq(rng, 295)}NNNNN{''.join(mutated)}NNNNN{_random_seq(rng, 200)}\n"
+        f">c2\n{_random_seq(rng, 45)}NNNNN{rc_b}NNNNN{_random_seq(rng, 50)}\n"
+        f">c3\n{_random_seq(rng, 800)}\n"
+    )
+    hits = {h["query"]: h for h in kmer_search(str(query), str(db), identity=90, coverage=80)}
+    assert set(hits) == {"c1", "c2"}
+    assert hits["c1"]["gene"] == "geneA"
+    assert 97.0 <= hits["c1"]["identity"] < 100.0
+    assert (hits["c1"]["qstart"], hits["c1"]["qend"]) == (301, 700)
+    assert (hits["c1"]["sstart"], hits["c1"]["send"]) == (101, 500)
+    assert hits["c2"]["gene"] == "geneB" and hits["c2"]["identity"] == 100.0
+    assert (hits["c2"]["qstart"], hits["c2"]["qend"]) == (51, 450)
+    assert (hits["c2"]["sstart"], hits["c2"]["send"]) == (400, 1)
+
+
+def test_kmer_search_skips_isolated_seeds(tmp_path, monkeypatch):
+    import src.kmer_search as km
+    rng = random.Random(3)
+    db = tmp_path / "db.fasta"
+    db.write_text("".join(f">g{i}\n{''.join(rng.choices('ACGT', k=1000))}\n" for i in range(500)))
+    gene = db.read_text().split("\n")[1]
+    query = tmp_path / "query.fasta"
+    query.write_text(f">random\n{''.join(rng.choices('ACGT', k=200000))}\n>planted\n{gene[200:700]}\n")
+    calls = []
+    extend = km._extend
+    monkeypatch.setattr(km, "_extend", lambda *a: calls.append(a) or extend(*a))
+    hits = kmer_search(str(query), str(db), identity=90, coverage=80)
+    assert [(h["query"], h["gene"], h["length"]) for h in hits] == [("planted", "g0", 500)]
+    # ~24,000 random seeds on distinct diagonals; only two-hit diagonals are extended
+    assert len(calls) < 50
+
+
+def test_run_blast_kmer_tool_matches_hit_structure():
+    hits = run_blast("input/example.fasta", "data/resistance_genes.fasta", identity=90, coverage=0, tool="kmer")
+    assert {h["gene"] for h in hits} == {"geneA", "geneB"}
+    assert set(hits[0]) == {"query", "gene", "identity", "length", "qstart", "qend", "sstart", "send"}
+    assert len(KmerIndex.from_fasta("data/resistance_genes.fasta")) == 2
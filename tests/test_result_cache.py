@@ -0,0 +1,104 @@
+import pytest
+from src.result_cache import ResultCache, main
+from src.gene_detector import detect_genes
+import src.gene_detector as gd
+
+
+def test_detect_genes_reuses_cached_results(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    first = detect_genes('input/example.fasta', 'data/resistance_genes.fasta', 90, 0, sample_id='a', tool='kmer', cache=cache)
+    assert cache.stats()['entries'] == 1
+
+    def _no_search(*args, **kwargs):
+        raise AssertionError('search should be served from the cache')
+    monkeypatch.setattr(gd, 'run_blast', _no_search)
+    second = detect_genes('input/example.fasta', 'data/resistance_genes.fasta', 90, 0, sample_id='b', tool='kmer', cache=str(tmp_path / 'cache'))
+    assert [h['gene'] for h in second] == [h['gene'] for h in first]
+    assert {h['sample_id'] for h in second} == {'b'}
+    # Different thresholds are a different key
+    with pytest.raises(AssertionError):
+        detect_genes('input/example.fasta', 'data/resistance_genes.fasta', 95, 0, tool='kmer', cache=cache)
+
+
+def test_cache_evicts_least_recently_used(tmp_path, capsys):
+    import os
+    cache = ResultCache(str(tmp_path), max_bytes=10 ** 6)
+    for i, key in enumerate(('aa' + '0' * 62, 'bb' + '0' * 62, 'cc' + '0' * 62)):
+        cache.put(key, [{'gene': f'g{i}'}])
+        os.utime(cache._path(key), (1000 + i, 1000 + i))
+    assert cache.get('aa' + '0' * 62) == [{'gene': 'g0'}]  # refreshes its last use
+    size = cache.stats()['bytes']
+    assert cache.evict(max_bytes=size - 1) == 1
+    assert cache.get('bb' + '0' * 62) is None
+    assert cache.get('aa' + '0' * 62) is not None
+    main(['--cache-dir', str(tmp_path), 'purge'])
+    assert 'Removed 2 entries' in capsys.readouterr().out
+    assert cache.stats()['entries'] == 0
+
+
+def test_cache_put_only_scans_when_over_limit(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path), max_bytes=10 ** 6)
+    scans = []
+    original = cache.entries
+    monkeypatch.setattr(cache, 'entries', lambda: scans.append(1) or original())
+    for i in range(20):
+        cache.put(f'{i:02d}' + '0' * 62, [{'gene': f'g{i}'}])
+    assert len(scans) == 1  # initial size scan only
+    size = cache.stats()['bytes']
+    assert cache._total == size
+    cache.max_bytes = size
+    scans.clear()
+    cache.put('ff' + '0' * 62, [{'gene': 'g20'}])
+    assert len(scans) == 1
+    assert cache.stats()['bytes'] <= size
+    assert cache._total == cache.stats()['bytes']
+
+
+def test_process_executor_shares_cache(tmp_path):
+    import pickle
+    from src.gene_detector import batch_detect_genes
+    cache = ResultCache(str(tmp_path / 'cache'), max_bytes=10 ** 6)
+    cache.put('aa' + '0' * 62, [])
+    clone = pickle.loads(pickle.dumps(cache))
+    assert clone._total is None and clone.cache_dir == cache.cache_dir
+    kwargs = dict(threads=2, executor='process', tool='kmer', write_per_sample=False, rich_enabled=False, output_dir=str(tmp_path / 'out'))
+    first = batch_detect_genes('input', 'data/resistance_genes.fasta', 90, 0, cache=cache, **kwargs)
+    assert cache.stats()['entries'] == 4
+    second = batch_detect_genes('input', 'data/resistance_genes.fasta', 90, 0, cache=str(tmp_path / 'cache'), **kwargs)
+    assert cache.stats()['entries'] == 4
+    assert {s: [h['gene'] for h in hits] for s, hits in second.items()} == {s: [h['gene'] for h in hits] for s, hits in first.items()}
+    # The parent trims the cache after the batch, whatever the workers saw
+    cache.max_bytes = 1
+    batch_detect_genes('input', 'data/resistance_genes.fasta', 95, 0, cache=cache, **kwargs)
+    assert cache.stats()['entries'] <= 1
+
+
+def test_cache_key_depends_on_diamond_sensitivity(tmp_path):
+    from src.result_cache import ResultCache
+    cache = ResultCache(str(tmp_path))
+    args = ("input/example.fasta", "data/resistance_genes.fasta", "diamond", 90, 80)
+    assert cache.key(*args) != cache.key(*args, sensitivity="sensitive")
+    assert cache.key(*args) == cache.key(*args, sensitivity=None)
+
+
+def test_failed_search_is_not_cached(tmp_path, monkeypatch):
+    import subprocess
+    from src import run_blast as rb
+    cache = ResultCache(str(tmp_path / 'cache'))
+
+    def _killed(cmd, check=True):
+        raise subprocess.CalledProcessError(137, cmd)
+
+    def _works(cmd, check=True):
+        with open(cmd[cmd.index('-out') + 1], 'w') as fh:
+            fh.write('q1\tgeneA\t99.0\t100\t1\t100\t1\t100\n')
+
+    monkeypatch.setattr(rb, 'verify_blast_db', lambda db, tool: None)
+    monkeypatch.setattr(rb, 'tool_version', lambda tool: 'test')
+    kwargs = dict(identity=90, coverage=0, tool='blastn', cache=cache, output_dir=str(tmp_path), fail_silently=True, scratch_dir=str(tmp_path))
+    monkeypatch.setattr(rb.subprocess, 'run', _killed)
+    assert detect_genes('input/example.fasta', 'data/resistance_genes.fasta', **kwargs) == []
+    assert cache.stats()['entries'] == 0
+    monkeypatch.setattr(rb.subprocess, 'run', _works)
+    assert [h['gene'] for h in detect_genes('input/example.fasta', 'data/resistance_genes.fasta', **kwargs)] == ['geneA']
+    assert cache.stats()['entries'] == 1
@@ -0,0 +1,90 @@
+import os
+import pytest
+from src import run_blast as rb
+
+
+@pytest.fixture(autouse=True)
+def _fresh_registry():
+    rb.reset_search_registry()
+    yield
+    rb.reset_search_registry()
+
+
+def test_run_blast_uses_unique_scratch_files(tmp_path, monkeypatch):
+    seen = []
+
+    def fake_run(cmd, check=True):
+        out_path = cmd[cmd.index("-out") + 1]
+        seen.append(out_path)
+        with open(out_path, "w") as f:
+            f.write("q1\tgeneA\t99.0\t100\t1\t100\t1\t100\n")
+
+    monkeypatch.setattr(rb, "detect_search_tool", lambda: "blastn")
+    monkeypatch.setattr(rb, "verify_blast_db", lambda db, tool: None)
+    monkeypatch.setattr(rb.subprocess, "run", fake_run)
+    first = rb.run_blast("input/example.fasta", "data/resistance_genes.fasta", scratch_dir=str(tmp_path))
+    second = rb.run_blast("input/example.fasta", "data/resistance_genes.fasta", scratch_dir=str(tmp_path))
+    assert first[0]["gene"] == "geneA" and second[0]["gene"] == "geneA"
+    assert len(set(seen)) == 2
+    assert all(os.path.dirname(p) == str(tmp_path) for p in seen)
+    # scratch output is removed once parsed
+    assert not any(os.path.exists(p) for p in seen)
+
+
+def test_run_blast_passes_tool_threads(tmp_path, monkeypatch):
+    commands = []
+
+    def fake_run(cmd, check=True):
+        commands.append(cmd)
+        open(cmd[cmd.index("-out") + 1], "w").close()
+
+    monkeypatch.setattr(rb, "verify_blast_db", lambda db, tool: None)
+    monkeypatch.setattr(rb.subprocess, "run", fake_run)
+    rb.run_blast("input/example.fasta", "data/resistance_genes.fasta", tool="blastn", scratch_dir=str(tmp_path), tool_threads=3)
+    rb.run_blast("input/example.fasta", "data/resistance_genes.fasta", tool="blastn", scratch_dir=str(tmp_path))
+    assert commands[0][commands[0].index("-num_threads") + 1] == "3"
+    assert "-num_threads" not in commands[1]
+
+
+def test_tool_and_database_resolved_once_per_process(tmp_path, monkeypatch):
+    calls = {"detect": 0, "verify": 0}
+
+    def fake_detect():
+        calls["detect"] += 1
+        return "diamond"
+
+    def fake_verify(db):
+        calls["verify"] += 1
+
+    db = tmp_path / "db.fasta"
+    db.write_text(">geneA\nATGC\n")
+    monkeypatch.setattr(rb, "detect_search_tool", fake_detect)
+    monkeypatch.setattr(rb, "verify_diamond_db", fake_verify)
+    for _ in range(3):
+        assert rb.resolve_search_tool() == "diamond"
+        rb.prepare_database(str(db), "diamond")
+    assert calls == {"detect": 1, "verify": 1}
+    # touching the FASTA invalidates the prepared database
+    os.utime(db, (os.path.getatime(db), os.path.getmtime(db) + 10))
+    rb.prepare_database(str(db), "diamond")
+    assert calls["verify"] == 2
+
+
+def test_diamond_profiles_and_overrides_reach_the_command(tmp_path, monkeypatch):
+    commands = []
+
+    def fake_run(cmd, check=True):
+        commands.append(cmd)
+        open(cmd[cmd.index("-o") + 1], "w").close()
+
+    monkeypatch.setattr(rb, "verify_diamond_db", lambda db: None)
+    monkeypatch.setattr(rb.subprocess, "run", fake_run)
+    options = rb.resolve_diamond_options("low-memory", sensitivity="sensitive", index_chunks=4)
+    rb.run_blast("input/example.fasta", "data/resistance_genes.fasta", tool="diamond", scratch_dir=str(tmp_path), diamond_options=options)
+    cmd = commands[0]
+    assert "--sensitive" in cmd
+    assert cmd[cmd.index("--block-size") + 1] == "0.5" and cmd[cmd.index("--index-chunks") + 1] == "4"
+    assert rb.diamond_tuning_args(rb.resolve_diamond_options()) == []
+    assert rb.diamond_tuning_args(rb.resolve_diamond_options("fast")) == ["--fast"]
+    with pytest.raises(ValueError):
+        rb.resolve_diamond_options("turbo")
@@ -8,3 +8,64 @@ def test_read_gene_class_map():
     mapping = read_gene_class_map("data/gene_class_map.csv")
     assert mapping["geneA"] == "Beta-lactam"
     assert mapping["geneB"] == "Tetracycline"
+
+def test_scan_fasta_stats_independent_of_chunk_size(tmp_path):
+    from src.utils import scan_fasta
+    fasta = tmp_path / "multi.fasta"
+    fasta.write_text(">a desc\nACGT\nAC\n>b\r\nNNNN\r\n>c\nacgtacgt")
+    for chunk_size in (1, 3, 7, 1 << 20):
+        assert scan_fasta(str(fasta), chunk_size=chunk_size) == {"records": 3, "total_length": 18}
+    assert validate_fasta(str(fasta), return_stats=True)["records"] == 3
+
+
+def test_validate_fasta_scans_each_file_version_once(tmp_path, monkeypatch):
+    import os
+    from src import utils
+    calls = []
+    real_scan = utils.scan_fasta
+    monkeypatch.setattr(utils, "scan_fasta", lambda p: calls.append(p) or real_scan(p))
+    fasta = tmp_path / "cached.fasta"
+    fasta.write_text(">a\nACGT\n")
+    for _ in range(3):
+        assert validate_fasta(str(fasta)) is True
+    assert len(calls) == 1
+    fasta.write_text(">a\nACGTACGT\n")
+    os.utime(fasta, ns=(os.stat(fasta).st_atime_ns, os.stat(fasta).st_mtime_ns + 10**9))
+    assert validate_fasta(str(fasta), return_stats=True)["total_length"] == 8
+    assert len(calls) == 2
+
+
+def test_read_gene_class_map_memoized_until_changed(tmp_path, monkeypatch):
+    import os
+    import pandas as pd
+    calls = []
+    real_read_csv = pd.read_csv
+    monkeypatch.setattr(pd, "read_csv", lambda *a, **k: calls.append(a) or real_read_csv(*a, **k))
+    csv = tmp_path / "map.csv"
+    csv.write_text("gene,class\ngeneA,Beta-lactam\n")
+    for _ in range(3):
+        assert read_gene_class_map(str(csv)) == {"geneA": "Beta-lactam"}
+    assert len(calls) == 1
+    csv.write_text("gene,class\ngeneA,Aminoglycoside\n")
+    os.utime(csv, ns=(os.stat(csv).st_atime_ns, os.stat(csv).st_mtime_ns + 10**9))
+    assert read_gene_class_map(str(csv))["geneA"] == "Aminoglycoside"
+    assert len(calls) == 2
+
+
+def test_find_fasta_files_all_extensions_largest_first(tmp_path):
+    import gzip
+    import os
+    from src.utils import find_fasta_files, fasta_sample_id, scan_fasta, estimate_fasta_size
+    (tmp_path / "sub" / "deeper").mkdir(parents=True)
+    (tmp_path / "a.fa").write_text(">a\nACGT\n")
+    (tmp_path / "sub" / "b.fna").write_text(">b\n" + "ACGT" * 50 + "\n")
+    with gzip.open(tmp_path / "sub" / "deeper" / "c.fasta.gz", "wt") as fh:
+        fh.write(">c\nACGTAC\n")
+    (tmp_path / "notes.txt").write_text("not a fasta")
+    (tmp_path / "d.fas.bgz").write_bytes(gzip.compress(b">d\nACGT\n" * 400))
+    found = find_fasta_files(str(tmp_path))
+    assert sorted(fasta_sample_id(f) for f in found) == ["a", "b", "c", "d"]
+    sizes = [estimate_fasta_size(f) for f in found]
+    assert sizes == sorted(sizes, reverse=True)
+    assert estimate_fasta_size(found[-1]) == os.path.getsize(tmp_path / "a.fa")
+    assert scan_fasta(str(tmp_path / "sub" / "deeper" / "c.fasta.gz")) == {"records": 1, "total_length": 6}